@@ -1,6 +1,8 @@
 from django.contrib import admin
 from .models import Post, Categoria, Tag, Comentario
-from .models import Notification
+from .models import EnvioNewsletter, Notification, Usuario
+from .comentarios import invalidar_contagem
+from .fragmentos import invalidar_posts
 
 
 @admin.register(Categoria)
@@ -35,7 +37,11 @@ class ComentarioAdmin(admin.ModelAdmin):
     actions = ['aprovar_comentarios']
 
     def aprovar_comentarios(self, request, queryset):
+        post_ids = set(queryset.values_list('post_id', flat=True))
         queryset.update(aprovado=True)
+        # update() não dispara sinais: invalida as contagens aqui
+        invalidar_contagem(*post_ids)
+        invalidar_posts(post_ids)
     aprovar_comentarios.short_description = "Aprovar comentários selecionados"
 
 
@@ -43,4 +49,23 @@ class ComentarioAdmin(admin.ModelAdmin):
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('user', 'actor', 'title', 'verb', 'read', 'timestamp')
     list_filter = ('read', 'timestamp')
-    search_fields = ('title', 'verb', 'message', 'user__username', 'actor__username')
\ No newline at end of file
+    search_fields = ('title', 'verb', 'message', 'user__username', 'actor__username')
+
+
+@admin.register(Usuario)
+class UsuarioAdmin(admin.ModelAdmin):
+    list_display = ('email', 'nome', 'criado_em', 'descadastrado_em')
+    list_filter = ('descadastrado_em',)
+    search_fields = ('email', 'nome')
+    # Centenas de milhares de linhas: sem COUNT(*) extra a cada busca
+    show_full_result_count = False
+
+
+@admin.register(EnvioNewsletter)
+class EnvioNewsletterAdmin(admin.ModelAdmin):
+    list_display = ('post', 'enviados', 'falhas', 'ultimo_usuario_id', 'iniciado_em', 'concluido_em')
+    list_filter = ('concluido_em',)
+    readonly_fields = (
+        'post', 'ultimo_usuario_id', 'enviados', 'falhas', 'reservado_por', 'reservado_ate',
+        'iniciado_em', 'atualizado_em', 'concluido_em',
+    )
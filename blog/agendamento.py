@@ -0,0 +1,87 @@
+"""Publicação agendada.
+
+Um post com `publicado_em` no futuro é gravado sem os efeitos da publicação
+(`publicacao_processada=False`) e só aparece nas listagens quando a data
+chega, porque elas filtram `publicado_em <= agora`. O comando
+`publicar_agendados` pega os posts que venceram e os grava de novo: os
+sinais de Post veem a transição e registram o evento da timeline, atualizam
+o arquivo, marcam feeds e sitemaps, recalculam os relacionados e invalidam
+as páginas em cache. Em seguida as páginas afetadas são renderizadas, para
+que os primeiros leitores já encontrem o cache quente.
+"""
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.http import Http404
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .arquivo import mes_de
+from .models import Post
+
+
+def vencidos(agora=None):
+    return Post.objects.filter(
+        publicacao_processada=False, publicado_em__lte=agora or timezone.now()
+    ).order_by('publicado_em')
+
+
+def publicar_vencidos(agora=None, lote=100):
+    """Aplica os efeitos da publicação dos posts vencidos. Retorna os posts.
+
+    Cada post é processado na sua própria transação, com a linha travada:
+    dois agendadores rodando juntos não publicam o mesmo post duas vezes.
+    """
+    publicados = []
+    for pk in list(vencidos(agora).values_list('pk', flat=True)[:lote]):
+        with transaction.atomic():
+            post = (
+                Post.objects.select_for_update(skip_locked=True)
+                .filter(pk=pk, publicacao_processada=False)
+                .select_related('categoria')
+                .first()
+            )
+            if post is None:
+                continue
+            # O pre_save marca publicacao_processada; atualizado_em avisa a
+            # exportação estática e o lastmod do sitemap
+            post.save(update_fields=['publicacao_processada', 'atualizado_em'])
+        publicados.append(post)
+    return publicados
+
+
+def paginas_afetadas(posts):
+    """URLs que mostram os posts: o próprio post, a home, categoria, tags e arquivo."""
+    urls = {reverse('blog:lista_posts')}
+    for post in posts:
+        ano, mes = mes_de(post.publicado_em)
+        urls.add(post.get_absolute_url())
+        urls.add(reverse('blog:arquivo_ano', args=[ano]))
+        urls.add(reverse('blog:arquivo_mes', args=[ano, mes]))
+        if post.categoria_id:
+            urls.add(post.categoria.get_absolute_url())
+        urls.update(tag.get_absolute_url() for tag in post.tags.all())
+    return sorted(urls)
+
+
+def aquecer_paginas(urls):
+    """Renderiza as páginas como visitante anônimo só para gravar as cascas.
+
+    Só adianta com um cache compartilhado entre processos (Redis, Memcached):
+    com o LocMemCache padrão a casca fica no processo do comando.
+    Retorna quantas páginas foram aquecidas.
+    """
+    aquecidas = 0
+    fabrica = RequestFactory()
+    for url in urls:
+        request = fabrica.get(url)
+        request.user = AnonymousUser()
+        request.aquecendo = True
+        match = resolve(url)
+        try:
+            response = match.func(request, *match.args, **match.kwargs)
+        except Http404:
+            continue
+        if response.status_code == 200:
+            aquecidas += 1
+    return aquecidas
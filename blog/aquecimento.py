@@ -0,0 +1,145 @@
+"""Aquecimento do worker, chamado por velora/wsgi.py e velora/asgi.py.
+
+Sem isso as primeiras requisições de cada worker novo pagam a compilação
+dos templates, a montagem do resolver de URLs e o carregamento dos metadados
+do ORM. O aquecimento faz tudo isso ao carregar a aplicação, antes de o
+servidor entregar requisições ao worker:
+
+- compila todos os templates de `templates/` (ficam no cached loader);
+- resolve todas as URLs `blog:` (reverse e resolve);
+- carrega os metadados de todos os models e o cache de categorias/tags;
+- opcionalmente (desligado por padrão) faz uma requisição a
+  `WARMUP_REQUEST_PATH`, montada à mão e entregue a um `WSGIHandler`, sem
+  o cliente de testes do Django.
+
+Falhas são registradas no log e nunca impedem o worker de subir.
+"""
+import io
+import logging
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.apps import apps
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import URLPattern, get_resolver, resolve, reverse
+
+from . import conexoes, fragmentos, taxonomia
+from .urls import urlpatterns
+
+logger = logging.getLogger(__name__)
+
+VALORES_EXEMPLO = {'int': 1, 'slug': 'a', 'str': 'a', 'path': 'a', 'uuid': '00000000-0000-0000-0000-000000000000'}
+
+
+def compilar_templates():
+    compilados = 0
+    for diretorio in settings.TEMPLATES[0]['DIRS']:
+        for caminho in sorted(Path(diretorio).rglob('*')):
+            if not caminho.is_file() or caminho.name.startswith('.'):
+                continue
+            try:
+                get_template(caminho.relative_to(diretorio).as_posix())
+            except (TemplateDoesNotExist, TemplateSyntaxError, UnicodeDecodeError):
+                logger.warning('Template não compilado no aquecimento: %s', caminho)
+                continue
+            compilados += 1
+    return compilados
+
+
+def resolver_urls():
+    """Faz reverse + resolve de cada URL `blog:` com argumentos de exemplo."""
+    get_resolver()  # popula o resolver raiz (e os includes) uma vez
+    resolvidas = 0
+    for padrao in urlpatterns:
+        if not isinstance(padrao, URLPattern) or not padrao.name:
+            continue
+        conversores = padrao.pattern.converters
+        kwargs = {
+            nome: VALORES_EXEMPLO.get(type(conversor).__name__.replace('Converter', '').lower(), 'a')
+            for nome, conversor in conversores.items()
+        }
+        resolve(reverse(f'blog:{padrao.name}', kwargs=kwargs))
+        resolvidas += 1
+    return resolvidas
+
+
+def carregar_metadados():
+    modelos = apps.get_models()
+    for modelo in modelos:
+        modelo._meta.get_fields()
+    taxonomia.categorias()
+    taxonomia.tags()
+    fragmentos.versao_paginas()
+    return len(modelos)
+
+
+def requisicao_de_aquecimento(caminho):
+    # Passa por todos os middlewares, como uma requisição de verdade
+    host = settings.ALLOWED_HOSTS[0].lstrip('.') if settings.ALLOWED_HOSTS else 'localhost'
+    if host == '*':
+        host = 'localhost'
+    partes = urlsplit(caminho)
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': partes.path or '/',
+        'QUERY_STRING': partes.query,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': host,
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    status = []
+    corpo = WSGIHandler()(environ, lambda linha, cabecalhos, exc_info=None: status.append(linha))
+    try:
+        for _ in corpo:
+            pass
+    finally:
+        corpo.close()
+    return int(status[0].split()[0])
+
+
+def aquecer(requisicao=None):
+    """Executa as etapas e retorna {etapa: segundos}. `requisicao` sobrepõe
+    WARMUP_REQUEST_PATH ('' desliga a requisição)."""
+    caminho = settings.WARMUP_REQUEST_PATH if requisicao is None else requisicao
+    etapas = [
+        ('templates', compilar_templates),
+        ('urls', resolver_urls),
+        ('metadados', carregar_metadados),
+    ]
+    if caminho:
+        etapas.append(('requisicao', lambda: requisicao_de_aquecimento(caminho)))
+
+    tempos = {}
+    for nome, etapa in etapas:
+        inicio = time.perf_counter()
+        try:
+            resultado = etapa()
+        except Exception:
+            logger.exception('Falha na etapa %s do aquecimento', nome)
+            resultado = None
+        tempos[nome] = time.perf_counter() - inicio
+        logger.info('Aquecimento %s: %s em %.3fs', nome, resultado, tempos[nome])
+    # Nada aberto no aquecimento passa para os workers de um fork
+    conexoes.liberar()
+    return tempos
+
+
+def aquecer_se_configurado():
+    if settings.WARMUP_ON_START:
+        return aquecer()
+    return {}
@@ -0,0 +1,185 @@
+"""Armazenamento de mídia endereçado por conteúdo.
+
+Cada arquivo enviado vai para `blobs/<aa>/<bb>/<sha256><ext>` dentro de
+MEDIA_ROOT: a mesma imagem enviada por vários autores ocupa o disco uma vez
+só. `BlobMidia` guarda, por hash, quantos posts usam o arquivo; os sinais de
+Post ajustam a contagem e o arquivo só é apagado quando ninguém mais aponta
+para ele (e não foi enviado há pouco, ver `MEDIA_ORPHAN_GRACE`).
+
+O `UploadComHash` grava o upload em blocos (em memória se for pequeno, em
+arquivo temporário se não) calculando o sha256 no caminho; o storage usa esse
+hash e só move o arquivo temporário para o lugar, sem ler tudo de novo.
+Arquivos antigos, fora de `blobs/`, continuam sendo servidos como sempre.
+"""
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+from io import BytesIO
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+PREFIXO_BLOBS = 'blobs'
+TAMANHO_BLOCO = 64 * 1024
+
+
+def nome_do_blob(digest, extensao):
+    return f'{PREFIXO_BLOBS}/{digest[:2]}/{digest[2:4]}/{digest}{extensao}'
+
+
+def hash_do_arquivo(caminho):
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        while bloco := arquivo.read(TAMANHO_BLOCO):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+class ArmazenamentoConteudo(FileSystemStorage):
+    """FileSystemStorage que ignora o nome enviado e grava pelo hash."""
+
+    def get_available_name(self, name, max_length=None):
+        # O nome final sai do conteúdo em _save; não há colisão a evitar
+        return name
+
+    def _save(self, name, content):
+        extensao = Path(name).suffix.lower()
+        if hasattr(content, 'temporary_file_path'):
+            return self.guardar_arquivo_local(
+                content.temporary_file_path(), extensao, getattr(content, 'sha256', None)
+            )
+        # Conteúdo em memória ou arquivo qualquer: copia em blocos calculando o hash
+        temporario = self._temporario()
+        sha256 = hashlib.sha256()
+        with open(temporario, 'wb') as destino:
+            for bloco in content.chunks():
+                sha256.update(bloco)
+                destino.write(bloco)
+        return self.guardar_arquivo_local(temporario, extensao, sha256.hexdigest())
+
+    def _temporario(self):
+        pasta = Path(self.path(PREFIXO_BLOBS))
+        pasta.mkdir(parents=True, exist_ok=True)
+        return pasta / f'.{uuid.uuid4().hex}.tmp'
+
+    def guardar_arquivo_local(self, caminho, extensao, digest=None):
+        """Move o arquivo em `caminho` para o blob do seu conteúdo e retorna o nome.
+
+        Se o blob já existe o arquivo é descartado. A linha de `BlobMidia`
+        fica travada durante a troca, em série com a remoção de órfãos.
+        """
+        BlobMidia = apps.get_model('blog', 'BlobMidia')
+        digest = digest or hash_do_arquivo(caminho)
+        tamanho = os.path.getsize(caminho)
+        with transaction.atomic():
+            blob, _ = BlobMidia.objects.select_for_update().get_or_create(
+                hash=digest,
+                defaults={'arquivo': nome_do_blob(digest, extensao), 'tamanho': tamanho},
+            )
+            destino = Path(self.path(blob.arquivo))
+            if destino.exists():
+                Path(caminho).unlink(missing_ok=True)
+            else:
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                if Path(caminho).stat().st_dev == destino.parent.stat().st_dev:
+                    os.replace(caminho, destino)
+                else:
+                    temporario = self._temporario()
+                    with open(caminho, 'rb') as origem, open(temporario, 'wb') as copia:
+                        while bloco := origem.read(TAMANHO_BLOCO):
+                            copia.write(bloco)
+                    os.replace(temporario, destino)
+                    Path(caminho).unlink(missing_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(destino, self.file_permissions_mode)
+            BlobMidia.objects.filter(pk=blob.pk).update(enviado_em=timezone.now())
+        return blob.arquivo
+
+
+_armazenamento = ArmazenamentoConteudo()
+
+
+def armazenamento_midia():
+    # Callable: as migrações guardam a referência, não a configuração
+    return _armazenamento
+
+
+class UploadComHash(FileUploadHandler):
+    """Recebe o upload em blocos calculando o sha256 enquanto grava.
+
+    Até FILE_UPLOAD_MAX_MEMORY_SIZE o arquivo fica em memória; acima disso
+    vai direto para um arquivo temporário, sem acumular a requisição inteira.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.em_memoria = content_length <= settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        if self.em_memoria:
+            self.arquivo = BytesIO()
+        else:
+            self.arquivo = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        self.arquivo.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.arquivo.seek(0)
+        if self.em_memoria:
+            arquivo = InMemoryUploadedFile(
+                self.arquivo, self.field_name, self.file_name, self.content_type,
+                file_size, self.charset, self.content_type_extra,
+            )
+        else:
+            arquivo = self.arquivo
+            arquivo.size = file_size
+        arquivo.sha256 = self.sha256.hexdigest()
+        return arquivo
+
+    def upload_interrupted(self):
+        if not getattr(self, 'em_memoria', True) and hasattr(self, 'arquivo'):
+            self.arquivo.close()
+
+
+def referenciar(nome):
+    """Soma uma referência ao blob `nome` (arquivos fora de blobs/ são ignorados)."""
+    if nome and nome.startswith(f'{PREFIXO_BLOBS}/'):
+        apps.get_model('blog', 'BlobMidia').objects.filter(arquivo=nome).update(referencias=F('referencias') + 1)
+
+
+def soltar(nome):
+    """Tira uma referência do blob `nome`; se zerar, tenta apagá-lo após o commit."""
+    if not nome or not nome.startswith(f'{PREFIXO_BLOBS}/'):
+        return
+    BlobMidia = apps.get_model('blog', 'BlobMidia')
+    BlobMidia.objects.filter(arquivo=nome, referencias__gt=0).update(referencias=F('referencias') - 1)
+    transaction.on_commit(lambda: remover_se_orfao(nome))
+
+
+def remover_se_orfao(nome):
+    """Apaga o blob se não tem referências nem upload recente. Retorna True se apagou."""
+    BlobMidia = apps.get_model('blog', 'BlobMidia')
+    limite = timezone.now() - timedelta(seconds=settings.MEDIA_ORPHAN_GRACE)
+    with transaction.atomic():
+        blob = (
+            BlobMidia.objects.select_for_update()
+            .filter(arquivo=nome, referencias=0, enviado_em__lt=limite)
+            .first()
+        )
+        if blob is None:
+            return False
+        # Dentro da trava: um upload do mesmo conteúdo espera e grava de novo
+        _armazenamento.delete(blob.arquivo)
+        blob.delete()
+    return True
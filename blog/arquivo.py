@@ -0,0 +1,97 @@
+"""Arquivo de posts por ano/mês.
+
+O widget lê `ArquivoMensal`, uma linha por mês com o total de posts
+publicados, mantida pelos sinais de Post a cada publicação, despublicação,
+mudança de data ou remoção. As páginas do arquivo filtram um intervalo de
+`publicado_em` e paginam por keyset sobre o índice (publicado_em, id).
+"""
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import ArquivoMensal, Post
+from .paginacao import pagina_keyset
+
+CHAVE_HISTOGRAMA = 'arquivo:histograma'
+
+
+def mes_de(momento):
+    local = timezone.localtime(momento)
+    return local.year, local.month
+
+
+def _ajustar(ano, mes, delta):
+    if ArquivoMensal.objects.filter(ano=ano, mes=mes).update(total=F('total') + delta):
+        if delta < 0:
+            ArquivoMensal.objects.filter(ano=ano, mes=mes, total__lte=0).delete()
+        return
+    if delta > 0:
+        try:
+            with transaction.atomic():
+                ArquivoMensal.objects.create(ano=ano, mes=mes, total=delta)
+        except IntegrityError:
+            # Outra transação criou o mês no meio tempo
+            ArquivoMensal.objects.filter(ano=ano, mes=mes).update(total=F('total') + delta)
+
+
+def registrar_mudanca(anterior, atual):
+    """Atualiza o histograma quando `publicado_em` passa de `anterior` para `atual`."""
+    antes = mes_de(anterior) if anterior else None
+    depois = mes_de(atual) if atual else None
+    if antes == depois:
+        return
+    if antes:
+        _ajustar(*antes, -1)
+    if depois:
+        _ajustar(*depois, 1)
+    transaction.on_commit(lambda: cache.delete(CHAVE_HISTOGRAMA))
+
+
+def reconstruir():
+    """Recalcula o histograma inteiro a partir dos posts. Retorna o número de meses."""
+    meses = (
+        Post.objects.filter(publicacao_processada=True)
+        .annotate(mes=TruncMonth('publicado_em', tzinfo=timezone.get_current_timezone()))
+        .values('mes')
+        .annotate(total=Count('id'))
+    )
+    linhas = [ArquivoMensal(ano=linha['mes'].year, mes=linha['mes'].month, total=linha['total']) for linha in meses]
+    with transaction.atomic():
+        ArquivoMensal.objects.all().delete()
+        ArquivoMensal.objects.bulk_create(linhas)
+    cache.delete(CHAVE_HISTOGRAMA)
+    return len(linhas)
+
+
+def histograma():
+    """[{'ano', 'total', 'meses': [(date do dia 1º, total), ...]}], do mais recente ao mais antigo."""
+    def montar():
+        anos = []
+        for linha in ArquivoMensal.objects.order_by('-ano', '-mes'):
+            if not anos or anos[-1]['ano'] != linha.ano:
+                anos.append({'ano': linha.ano, 'total': 0, 'meses': []})
+            anos[-1]['meses'].append((date(linha.ano, linha.mes, 1), linha.total))
+            anos[-1]['total'] += linha.total
+        return anos
+    return cache.get_or_set(CHAVE_HISTOGRAMA, montar, settings.ARCHIVE_CACHE_TIMEOUT)
+
+
+def intervalo(ano, mes=None):
+    """Início e fim (exclusivo) do ano ou mês, no fuso do site."""
+    inicio = datetime(ano, mes or 1, 1)
+    if mes is None or mes == 12:
+        fim = datetime(ano + 1, 1, 1)
+    else:
+        fim = datetime(ano, mes + 1, 1)
+    return timezone.make_aware(inicio), timezone.make_aware(fim)
+
+
+def posts_do_periodo(ano, mes=None, depois_de=None, limite=None):
+    inicio, fim = intervalo(ano, mes)
+    consulta = Post.objects.publicados().filter(publicado_em__gte=inicio, publicado_em__lt=fim).select_related('autor')
+    return pagina_keyset(consulta, 'publicado_em', depois_de, limite or settings.ARCHIVE_PAGE_SIZE)
@@ -0,0 +1,83 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+
+
+class BufferLocal(ABC):
+    """Acumula itens na memória do processo até a hora de descarregar.
+
+    `adicionar` devolve True quando o buffer passou de `limite` itens ou
+    quando o último descarregamento foi há mais de `intervalo` segundos;
+    quem chamou decide então chamar `drenar` e gravar o lote. Subclasses
+    dizem como os itens são guardados (`_novo`) e somados (`_acumular`).
+    """
+
+    def __init__(self, intervalo, limite):
+        self.intervalo = intervalo
+        self.limite = limite
+        self._lock = threading.Lock()
+        self._itens = self._novo()
+        self._tamanho = 0
+        self._drenado_em = time.monotonic()
+
+    @abstractmethod
+    def _novo(self):
+        """Estrutura vazia que recebe os itens."""
+
+    @abstractmethod
+    def _acumular(self, itens, item, quantidade):
+        """Junta `item` (com `quantidade`) aos `itens`."""
+
+    def adicionar(self, item, quantidade=1):
+        with self._lock:
+            self._acumular(self._itens, item, quantidade)
+            self._tamanho += 1
+            return (
+                self._tamanho >= self.limite
+                or time.monotonic() - self._drenado_em >= self.intervalo
+            )
+
+    def drenar(self):
+        with self._lock:
+            itens = self._itens
+            self._itens = self._novo()
+            self._tamanho = 0
+            self._drenado_em = time.monotonic()
+        return itens
+
+
+class ContadorLocal(BufferLocal):
+    """Buffer de contagens por chave (ex.: visualizações por post)."""
+
+    def _novo(self):
+        return Counter()
+
+    def _acumular(self, itens, item, quantidade):
+        itens[item] += quantidade
+
+    def devolver(self, contagens):
+        """Reincorpora contagens que não puderam ser gravadas."""
+        with self._lock:
+            self._itens.update(contagens)
+            self._tamanho += len(contagens)
+
+
+class ListaLocal(BufferLocal):
+    """Buffer de itens em ordem de chegada (ex.: comentários a inserir)."""
+
+    def _novo(self):
+        return []
+
+    def _acumular(self, itens, item, quantidade):
+        itens.append(item)
+
+    def vencido(self):
+        """True se há itens esperando há mais de `intervalo` segundos."""
+        with self._lock:
+            return bool(self._itens) and time.monotonic() - self._drenado_em >= self.intervalo
+
+    def devolver(self, itens):
+        with self._lock:
+            self._itens[:0] = itens
+            self._tamanho += len(itens)
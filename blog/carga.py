@@ -0,0 +1,336 @@
+"""Gerador de carga HTTP para medir o limite da pilha inteira.
+
+Cada usuário virtual é uma corrotina com a própria conexão keep-alive e os
+próprios cookies (sessão e CSRF); em laço, sorteia um cenário pelos pesos do
+mix e executa os passos dele. O cliente HTTP/1.1 é mínimo, sobre
+`asyncio.open_connection`, para não depender de bibliotecas fora do
+requirements.txt e para que o custo do gerador fique pequeno perto do
+servidor medido.
+
+A concorrência sobe em estágios (`Carga.executar`). Cada resposta vira uma
+`Amostra`; o relatório por intervalo e por estágio sai de `resumir`. O
+ponto de saturação é o primeiro estágio em que mais usuários não trazem
+mais vazão ou começam a gerar erros (`saturacao`).
+"""
+import asyncio
+import json
+import random
+import ssl
+import time
+from collections import namedtuple
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+Amostra = namedtuple('Amostra', 'fim passo status duracao')
+
+# status 0: a requisição não chegou a ter resposta (conexão, timeout)
+SEM_RESPOSTA = 0
+LIMITADO = 429
+# Estágio seguinte precisa de pelo menos 5% mais vazão para não ser saturação
+GANHO_MINIMO = 1.05
+ERROS_MAXIMOS = 0.01
+
+
+class ErroHTTP(Exception):
+    pass
+
+
+class ConexaoHTTP:
+    """Uma conexão HTTP/1.1 reaproveitada entre requisições."""
+
+    def __init__(self, url_base, timeout):
+        partes = urlsplit(url_base)
+        self.host = partes.hostname
+        self.tls = partes.scheme == 'https'
+        self.porta = partes.port or (443 if self.tls else 80)
+        self.cabecalho_host = partes.netloc
+        self.timeout = timeout
+        self.leitor = self.escritor = None
+
+    async def _abrir(self):
+        contexto = ssl.create_default_context() if self.tls else None
+        self.leitor, self.escritor = await asyncio.open_connection(self.host, self.porta, ssl=contexto)
+
+    def fechar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+        self.leitor = self.escritor = None
+
+    async def pedir(self, metodo, caminho, cabecalhos, corpo=b''):
+        """Retorna (status, cabeçalhos em minúsculas, corpo); reconecta uma vez."""
+        for tentativa in range(2):
+            reaproveitada = self.escritor is not None
+            try:
+                if not reaproveitada:
+                    await self._abrir()
+                return await asyncio.wait_for(self._trocar(metodo, caminho, cabecalhos, corpo), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError, ErroHTTP):
+                self.fechar()
+                # Conexão ociosa fechada pelo servidor: tenta de novo numa nova
+                if not reaproveitada or tentativa:
+                    raise
+            except BaseException:
+                self.fechar()
+                raise
+
+    async def _trocar(self, metodo, caminho, cabecalhos, corpo):
+        linhas = [f'{metodo} {caminho} HTTP/1.1', f'Host: {self.cabecalho_host}', f'Content-Length: {len(corpo)}']
+        linhas += [f'{nome}: {valor}' for nome, valor in cabecalhos.items()]
+        self.escritor.write(('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1') + corpo)
+        await self.escritor.drain()
+
+        linha_status = await self.leitor.readline()
+        if not linha_status:
+            raise ErroHTTP('conexão fechada')
+        status = int(linha_status.split()[1])
+        resposta = []
+        while (linha := await self.leitor.readline()) not in (b'\r\n', b'\n', b''):
+            nome, _, valor = linha.decode('latin-1').partition(':')
+            resposta.append((nome.strip().lower(), valor.strip()))
+        cabecalhos_resposta = dict(resposta)
+
+        if metodo == 'HEAD' or status in (204, 304):
+            conteudo = b''
+        elif cabecalhos_resposta.get('transfer-encoding', '').lower() == 'chunked':
+            conteudo = await self._ler_chunked()
+        elif 'content-length' in cabecalhos_resposta:
+            conteudo = await self.leitor.readexactly(int(cabecalhos_resposta['content-length']))
+        else:
+            conteudo = await self.leitor.read()
+            cabecalhos_resposta['connection'] = 'close'
+        if cabecalhos_resposta.get('connection', '').lower() == 'close':
+            self.fechar()
+        return status, resposta, conteudo
+
+    async def _ler_chunked(self):
+        partes = []
+        while True:
+            tamanho = int((await self.leitor.readline()).split(b';')[0], 16)
+            if not tamanho:
+                while await self.leitor.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(partes)
+            partes.append(await self.leitor.readexactly(tamanho))
+            await self.leitor.readline()
+
+
+class UsuarioVirtual:
+    def __init__(self, carga):
+        self.carga = carga
+        self.conexao = ConexaoHTTP(carga.url_base, carga.timeout)
+        self.cookies = {}
+        self.logado = False
+        self.rascunho = None
+
+    async def pedir(self, passo, metodo, caminho, corpo=b'', cabecalhos=None):
+        cabecalhos = dict(cabecalhos or {})
+        if self.cookies:
+            cabecalhos['Cookie'] = '; '.join(f'{nome}={valor}' for nome, valor in self.cookies.items())
+        if metodo != 'GET' and 'csrftoken' in self.cookies:
+            cabecalhos['X-CSRFToken'] = self.cookies['csrftoken']
+            cabecalhos['Referer'] = self.carga.url_base + caminho
+        inicio = time.perf_counter()
+        try:
+            status, resposta, conteudo = await self.conexao.pedir(metodo, caminho, cabecalhos, corpo)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ErroHTTP, ValueError, IndexError):
+            self.carga.registrar(passo, SEM_RESPOSTA, time.perf_counter() - inicio)
+            return SEM_RESPOSTA, b''
+        self.carga.registrar(passo, status, time.perf_counter() - inicio)
+        for nome, valor in resposta:
+            if nome == 'set-cookie':
+                for morsel in SimpleCookie(valor).values():
+                    self.cookies[morsel.key] = morsel.value
+        return status, conteudo
+
+    async def formulario(self, passo, caminho, campos):
+        if 'csrftoken' not in self.cookies:
+            await self.pedir(f'{passo}:csrf', 'GET', caminho)
+        corpo = urlencode({'csrfmiddlewaretoken': self.cookies.get('csrftoken', ''), **campos}).encode()
+        return await self.pedir(passo, 'POST', caminho, corpo, {'Content-Type': 'application/x-www-form-urlencoded'})
+
+    async def enviar_json(self, passo, caminho, dados):
+        if 'csrftoken' not in self.cookies:
+            await self.pedir(f'{passo}:csrf', 'GET', '/login/')
+        status, conteudo = await self.pedir(
+            passo, 'POST', caminho, json.dumps(dados).encode(), {'Content-Type': 'application/json'},
+        )
+        try:
+            return status, json.loads(conteudo or b'{}')
+        except ValueError:
+            return status, {}
+
+    async def entrar(self):
+        if not self.logado:
+            await self.pedir('login:csrf', 'GET', '/login/')
+            status, _ = await self.formulario('login', '/login/', {
+                'username': self.carga.usuario, 'password': self.carga.senha,
+            })
+            self.logado = status == 302
+        return self.logado
+
+    async def rodar(self):
+        try:
+            while True:
+                cenario = random.choices(self.carga.cenarios, self.carga.pesos)[0]
+                await CENARIOS[cenario](self, self.carga.dados)
+                if self.carga.pausa:
+                    await asyncio.sleep(random.uniform(0, 2 * self.carga.pausa))
+        finally:
+            self.conexao.fechar()
+
+
+async def cenario_lista(usuario, dados):
+    await usuario.pedir('lista', 'GET', '/')
+
+
+async def cenario_profunda(usuario, dados):
+    pagina = random.randint(min(2, dados['paginas']), dados['paginas'])
+    await usuario.pedir('lista:profunda', 'GET', f'/?page={pagina}')
+
+
+async def cenario_post(usuario, dados):
+    await usuario.pedir('post', 'GET', f"/post/{random.choice(dados['slugs'])}/")
+
+
+async def cenario_comentario(usuario, dados):
+    caminho = f"/post/{random.choice(dados['slugs'])}/"
+    await usuario.pedir('post', 'GET', caminho)
+    await usuario.formulario('comentario', caminho, {
+        'nome': 'Teste de carga',
+        'email': 'carga@velora.local',
+        'mensagem': f'Comentário de teste de carga {random.getrandbits(48):x}',
+    })
+
+
+async def cenario_painel(usuario, dados):
+    if await usuario.entrar():
+        await usuario.pedir('painel', 'GET', '/dashboard/')
+        await usuario.pedir('notificacoes', 'GET', '/notificacoes/')
+
+
+async def cenario_editor(usuario, dados):
+    if not await usuario.entrar():
+        return
+    texto = f'Rascunho de teste de carga {random.getrandbits(48):x}'
+    if usuario.rascunho is None:
+        status, resposta = await usuario.enviar_json('editor:criar', '/api/rascunhos/', {'campos': {'titulo': 'Teste de carga'}})
+        if status == 200:
+            usuario.rascunho = resposta
+        return
+    status, resposta = await usuario.enviar_json('editor:salvar', usuario.rascunho['autosave_url'], {
+        'versao': usuario.rascunho['versao'], 'campos': {'conteudo': texto},
+    })
+    if status == 200:
+        usuario.rascunho['versao'] = resposta['versao']
+    elif status == 409:
+        usuario.rascunho['versao'] = resposta.get('versao')
+
+
+CENARIOS = {
+    'lista': cenario_lista,
+    'profunda': cenario_profunda,
+    'post': cenario_post,
+    'comentario': cenario_comentario,
+    'painel': cenario_painel,
+    'editor': cenario_editor,
+}
+MIX_PADRAO = {'lista': 35, 'profunda': 15, 'post': 30, 'comentario': 5, 'painel': 10, 'editor': 5}
+LOGADOS = {'painel', 'editor'}
+
+
+def ler_mix(texto):
+    """'lista=40,post=30' -> {'lista': 40, 'post': 30}."""
+    mix = {}
+    for item in filter(None, (parte.strip() for parte in texto.split(','))):
+        nome, _, peso = item.partition('=')
+        if nome not in CENARIOS:
+            raise ValueError(f'Cenário desconhecido: {nome} (use {", ".join(CENARIOS)})')
+        mix[nome] = float(peso or 1)
+    return mix
+
+
+def percentil(ordenadas, fracao):
+    if not ordenadas:
+        return 0.0
+    return ordenadas[min(len(ordenadas) - 1, int(fracao * len(ordenadas)))]
+
+
+def resumir(amostras, segundos):
+    """Vazão, latências (ms) e taxas de erro de um conjunto de amostras."""
+    duracoes = sorted(amostra.duracao for amostra in amostras)
+    total = len(amostras)
+    erros = sum(1 for amostra in amostras if amostra.status == SEM_RESPOSTA or (amostra.status >= 400 and amostra.status != LIMITADO))
+    limitados = sum(1 for amostra in amostras if amostra.status == LIMITADO)
+    return {
+        'requisicoes': total,
+        'por_segundo': total / segundos if segundos else 0.0,
+        'p50': percentil(duracoes, 0.50) * 1000,
+        'p95': percentil(duracoes, 0.95) * 1000,
+        'p99': percentil(duracoes, 0.99) * 1000,
+        'erros': erros / total if total else 0.0,
+        'limitados': limitados / total if total else 0.0,
+    }
+
+
+def saturacao(estagios):
+    """Índice do primeiro estágio saturado em [(usuarios, resumo)], ou None."""
+    for indice in range(1, len(estagios)):
+        anterior, atual = estagios[indice - 1][1], estagios[indice][1]
+        if atual['erros'] > ERROS_MAXIMOS or atual['por_segundo'] < anterior['por_segundo'] * GANHO_MINIMO:
+            return indice
+    return None
+
+
+class Carga:
+    """Roda os estágios de concorrência e acumula as amostras."""
+
+    def __init__(self, url_base, dados, mix, usuario=None, senha=None, pausa=0.0, timeout=30.0):
+        self.url_base = url_base.rstrip('/')
+        self.dados = dados
+        self.usuario = usuario
+        self.senha = senha
+        self.pausa = pausa
+        self.timeout = timeout
+        self.cenarios = list(mix)
+        self.pesos = [mix[nome] for nome in self.cenarios]
+        self.amostras = []
+
+    def registrar(self, passo, status, duracao):
+        self.amostras.append(Amostra(time.monotonic(), passo, status, duracao))
+
+    async def executar(self, estagios, duracao, intervalo, ao_intervalo=None):
+        """Sobe para cada número de usuários em `estagios` por `duracao` segundos.
+
+        `ao_intervalo(usuarios, segundos_decorridos, resumo)` recebe o
+        resumo de cada intervalo. Retorna [(usuarios, resumo do estágio)].
+        """
+        tarefas = []
+        resultado = []
+        inicio_geral = time.monotonic()
+        try:
+            for usuarios in estagios:
+                while len(tarefas) < usuarios:
+                    tarefas.append(asyncio.create_task(UsuarioVirtual(self).rodar()))
+                inicio = time.monotonic()
+                primeira = len(self.amostras)
+                while (decorrido := time.monotonic() - inicio) < duracao:
+                    marca = len(self.amostras)
+                    await asyncio.sleep(min(intervalo, duracao - decorrido))
+                    if ao_intervalo:
+                        ao_intervalo(
+                            usuarios,
+                            time.monotonic() - inicio_geral,
+                            resumir(self.amostras[marca:], time.monotonic() - inicio - decorrido),
+                        )
+                resultado.append((usuarios, resumir(self.amostras[primeira:], time.monotonic() - inicio)))
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+            await asyncio.gather(*tarefas, return_exceptions=True)
+        return resultado
+
+    def por_passo(self):
+        passos = {}
+        for amostra in self.amostras:
+            passos.setdefault(amostra.passo, []).append(amostra)
+        return {passo: resumir(amostras, 0) for passo, amostras in sorted(passos.items())}
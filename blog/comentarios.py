@@ -0,0 +1,130 @@
+"""Comentários: leitura paginada, contagem em cache e caminho de escrita.
+
+A escrita passa por três etapas antes do banco: limite de taxa por IP e por
+post (no cache), um filtro barato de spam/duplicados e, com
+`COMMENTS_BUFFERED`, um buffer em memória gravado com `bulk_create` a cada
+`COMMENTS_FLUSH_SIZE` comentários ou `COMMENTS_FLUSH_INTERVAL` segundos. Cada
+lote invalida a contagem de cada post uma única vez.
+"""
+import atexit
+import hashlib
+import logging
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+
+from .buffers import ListaLocal
+from .fragmentos import invalidar_posts
+from .models import Comentario
+from .paginacao import pagina_keyset
+from .throttling import BaldeTokens
+
+logger = logging.getLogger(__name__)
+
+CHAVE_CONTAGEM = 'comentarios:aprovados:{}'
+CHAVE_VISTO = 'comentarios:visto:{}'
+PADRAO_LINK = re.compile(r'https?://|www\.', re.IGNORECASE)
+
+
+def contar_aprovados(post_id):
+    """Número de comentários aprovados do post, lido do cache quando possível."""
+    return cache.get_or_set(
+        CHAVE_CONTAGEM.format(post_id),
+        lambda: Comentario.objects.filter(post_id=post_id, aprovado=True).count(),
+        settings.COMMENTS_COUNT_CACHE_TIMEOUT,
+    )
+
+
+def invalidar_contagem(*post_ids):
+    cache.delete_many([CHAVE_CONTAGEM.format(post_id) for post_id in post_ids])
+
+
+def _aprovados(post_id):
+    return Comentario.objects.filter(post_id=post_id, aprovado=True).only('id', 'nome', 'mensagem', 'criado_em')
+
+
+def pagina_comentarios(post_id, depois_de=None, limite=None):
+    """Comentários aprovados do mais novo para o mais antigo, por keyset.
+
+    Retorna (comentarios, cursor da próxima página ou None). A consulta usa o
+    índice (post, aprovado, criado_em) e nunca faz OFFSET.
+    """
+    return pagina_keyset(_aprovados(post_id), 'criado_em', depois_de, limite or settings.COMMENTS_PAGE_SIZE)
+
+
+def todos_comentarios(post_id):
+    """Todos os aprovados, na mesma ordem das páginas; só para a exportação."""
+    return list(_aprovados(post_id).order_by('-criado_em', '-pk'))
+
+limite_por_ip = BaldeTokens('comentario:ip', settings.COMMENTS_RATE_PER_IP)
+limite_por_post = BaldeTokens('comentario:post', settings.COMMENTS_RATE_PER_POST)
+
+_buffer = ListaLocal(
+    intervalo=settings.COMMENTS_FLUSH_INTERVAL,
+    limite=settings.COMMENTS_FLUSH_SIZE,
+)
+
+
+def motivo_rejeicao(post_id, mensagem):
+    """Filtro que roda antes do banco; retorna o motivo ou None se passou.
+
+    Duplicados são a mesma mensagem (normalizada) no mesmo post dentro de
+    `COMMENTS_DUPLICATE_WINDOW` segundos, independente do e-mail informado.
+    """
+    if len(mensagem) > settings.COMMENTS_MAX_LENGTH:
+        return 'longo'
+    if len(PADRAO_LINK.findall(mensagem)) > settings.COMMENTS_MAX_LINKS:
+        return 'spam'
+    normalizada = ' '.join(mensagem.lower().split())
+    if any(palavra in normalizada for palavra in settings.COMMENTS_BLOCKED_WORDS):
+        return 'spam'
+    impressao = hashlib.sha1(f'{post_id}:{normalizada}'.encode()).hexdigest()
+    if not cache.add(CHAVE_VISTO.format(impressao), 1, settings.COMMENTS_DUPLICATE_WINDOW):
+        return 'duplicado'
+    return None
+
+
+def receber_comentario(post_id, nome, email, mensagem):
+    """Grava o comentário já filtrado, direto ou via buffer."""
+    comentario = Comentario(post_id=post_id, nome=nome, email=email, mensagem=mensagem, aprovado=True)
+    if not settings.COMMENTS_BUFFERED:
+        comentario.save()
+        return
+    if _buffer.adicionar(comentario):
+        descarregar_comentarios()
+
+
+def descarregar_se_vencido():
+    if _buffer.vencido():
+        descarregar_comentarios()
+
+
+def descarregar_comentarios():
+    """Insere o buffer deste processo em lote. Retorna quantos foram gravados."""
+    comentarios = _buffer.drenar()
+    if not comentarios:
+        return 0
+    try:
+        with transaction.atomic():
+            Comentario.objects.bulk_create(comentarios, batch_size=settings.COMMENTS_FLUSH_SIZE)
+    except DatabaseError:
+        logger.exception('Falha ao gravar lote de comentários')
+        _buffer.devolver(comentarios)
+        return 0
+    # bulk_create não dispara post_save: invalida cada post uma vez só
+    post_ids = {comentario.post_id for comentario in comentarios}
+    invalidar_contagem(*post_ids)
+    invalidar_posts(post_ids)
+    return len(comentarios)
+
+
+def _descarregar_ao_sair():
+    try:
+        descarregar_comentarios()
+    except Exception:
+        logger.exception('Falha ao descarregar comentários no encerramento')
+
+
+atexit.register(_descarregar_ao_sair)
@@ -0,0 +1,87 @@
+"""Métricas das conexões com o banco, por worker.
+
+Com `DB_POOL=True` cada alias tem um pool do psycopg (ver DATABASES em
+settings.py) e as métricas vêm de `pool.get_stats()`:
+
+- `checkouts` e `espera_ms_media`: quantas vezes uma requisição pegou uma
+  conexão e quanto esperou por ela;
+- `enfileirados` e `timeouts`: pedidos que acharam o pool esgotado e os que
+  desistiram depois de `DB_POOL_TIMEOUT`; se crescem, falta conexão;
+- `conexoes_abertas`, `perdidas` e `devolvidas_ruins`: conexões abertas no
+  total (inclusive as recicladas por `max_lifetime`), as que caíram e as que
+  voltaram ao pool em estado inválido.
+
+Sem pool só há `obtidas`, o número de vezes que o Django abriu conexão:
+perto do número de requisições quer dizer uma conexão nova por requisição.
+Os valores são do processo que responde; cada worker tem os seus.
+"""
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+_lock = threading.Lock()
+_obtidas = {}
+
+
+def registrar_conexao(alias):
+    with _lock:
+        _obtidas[alias] = _obtidas.get(alias, 0) + 1
+
+
+def modo(alias):
+    configuracao = settings.DATABASES[alias]
+    if configuracao.get('OPTIONS', {}).get('pool'):
+        return 'pool'
+    return 'persistente' if configuracao.get('CONN_MAX_AGE') else 'por_requisicao'
+
+
+def _metricas_pool(pool):
+    estatisticas = pool.get_stats()
+    checkouts = estatisticas.get('requests_num', 0)
+    espera = estatisticas.get('requests_wait_ms', 0)
+    return {
+        'minimo': estatisticas.get('pool_min', 0),
+        'maximo': estatisticas.get('pool_max', 0),
+        'tamanho': estatisticas.get('pool_size', 0),
+        'disponiveis': estatisticas.get('pool_available', 0),
+        'aguardando': estatisticas.get('requests_waiting', 0),
+        'checkouts': checkouts,
+        'espera_ms_total': espera,
+        'espera_ms_media': espera / checkouts if checkouts else 0.0,
+        'enfileirados': estatisticas.get('requests_queued', 0),
+        'timeouts': estatisticas.get('requests_errors', 0),
+        'conexoes_abertas': estatisticas.get('connections_num', 0),
+        'conexao_ms_total': estatisticas.get('connections_ms', 0),
+        'erros_conexao': estatisticas.get('connections_errors', 0),
+        'perdidas': estatisticas.get('connections_lost', 0),
+        'devolvidas_ruins': estatisticas.get('returns_bad', 0),
+    }
+
+
+def metricas():
+    """{alias: métricas} deste processo."""
+    resultado = {}
+    for alias in settings.DATABASES:
+        dados = {'modo': modo(alias), 'obtidas': _obtidas.get(alias, 0)}
+        pool = getattr(connections[alias], 'pool', None) if dados['modo'] == 'pool' else None
+        # Fechado: o processo ainda não pediu conexão a este banco
+        if pool is not None and not pool.closed:
+            dados.update(_metricas_pool(pool))
+        resultado[alias] = dados
+    return {'pid': os.getpid(), 'bancos': resultado}
+
+
+def liberar():
+    """Fecha as conexões e os pools abertos até aqui neste processo.
+
+    Chamado depois do aquecimento: se o servidor carrega a aplicação antes
+    do fork (gunicorn --preload), os workers não herdam sockets nem as
+    threads do pool do processo mestre.
+    """
+    connections.close_all()
+    for alias in settings.DATABASES:
+        fechar_pool = getattr(connections[alias], 'close_pool', None)
+        if fechar_pool and modo(alias) == 'pool':
+            fechar_pool()
@@ -1,15 +1,41 @@
+import hashlib
+from functools import lru_cache
+
+from django.contrib.staticfiles import finders
+
 from .models import Notification
 
 
 def notifications_unread_count(request):
     """Adiciona `notifications_unread_count` ao contexto das templates.
 
-    Retorna 0 para usuários anônimos.
+    Retorna 0 para usuários anônimos e ao renderizar cascas compartilhadas,
+    em que o contador vem do fragmento `navbar` (ver blog/fragmentos.py).
     """
     count = 0
+    if getattr(request, 'renderizando_casca', False):
+        return {'notifications_unread_count': count}
     try:
         if request.user and request.user.is_authenticated:
             count = Notification.objects.filter(user=request.user, read=False).count()
     except Exception:
         count = 0
     return {'notifications_unread_count': count}
+
+
+@lru_cache(maxsize=None)
+def _hash_do_css():
+    caminho = finders.find('css/style.css')
+    if not caminho:
+        return ''
+    with open(caminho, 'rb') as arquivo:
+        return hashlib.sha256(arquivo.read()).hexdigest()[:12]
+
+
+def versao_estaticos(request):
+    """`versao_estaticos`: muda só quando o style.css muda (lido uma vez por processo).
+
+    Mantém o cache do navegador entre requisições e deixa as páginas
+    exportadas idênticas enquanto o CSS não muda.
+    """
+    return {'versao_estaticos': _hash_do_css()}
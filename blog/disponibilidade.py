@@ -0,0 +1,91 @@
+"""Disponibilidade de e-mail e nome de usuário no cadastro.
+
+Usada pela API da página de cadastro (a cada campo preenchido) e pelo
+formulário. As consultas comparam `LOWER(campo)` e usam os índices
+funcionais criados na migração 0015; e-mails e nomes diferentes só na
+caixa contam como o mesmo.
+
+Quase toda checagem é de um valor livre, então só a resposta "livre" vai
+para o cache, por `SIGNUP_CHECK_CACHE_TIMEOUT` segundos; cadastrar ou trocar
+o e-mail de um usuário apaga a entrada. O formulário, que é quem decide o
+cadastro, consulta sempre o banco. A API ainda passa por um limite de taxa
+por IP antes de chegar ao cache.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from .throttling import BaldeTokens
+
+CAMPOS = ('email', 'username')
+CHAVE_LIVRE = 'disponibilidade:{}:{}'
+
+limite_por_ip = BaldeTokens('disponibilidade:ip', settings.SIGNUP_CHECK_RATE_PER_IP)
+
+
+def normalizar(valor):
+    return (valor or '').strip().lower()
+
+
+def _chave(campo, valor):
+    # E-mails podem ter caracteres que o memcached não aceita em chaves
+    return CHAVE_LIVRE.format(campo, hashlib.sha1(valor.encode()).hexdigest())
+
+
+def ocupados(campo, valores, usar_cache=True):
+    """Retorna o conjunto dos `valores` (já normalizados) em uso.
+
+    Os que estão no cache como livres não vão ao banco; os demais são
+    conferidos numa única consulta.
+    """
+    assert campo in CAMPOS
+    valores = {valor for valor in valores if valor}
+    if usar_cache:
+        livres = cache.get_many([_chave(campo, valor) for valor in valores])
+        valores = {valor for valor in valores if _chave(campo, valor) not in livres}
+    if not valores:
+        return set()
+    encontrados = set(
+        User.objects.annotate(normalizado=Lower(campo))
+        .filter(normalizado__in=valores)
+        .values_list('normalizado', flat=True)
+    )
+    if usar_cache:
+        cache.set_many(
+            {_chave(campo, valor): 1 for valor in valores - encontrados},
+            settings.SIGNUP_CHECK_CACHE_TIMEOUT,
+        )
+    return encontrados
+
+
+def email_em_uso(email, usar_cache=True):
+    email = normalizar(email)
+    return email in ocupados('email', [email], usar_cache)
+
+
+def username_em_uso(username, usar_cache=True):
+    username = normalizar(username)
+    return username in ocupados('username', [username], usar_cache)
+
+
+def verificar_emails(emails):
+    """{e-mail como enviado: em uso?} para vários e-mails de uma vez."""
+    emails = list(dict.fromkeys(email.strip() for email in emails if email and email.strip()))
+    em_uso = ocupados('email', [normalizar(email) for email in emails])
+    return {email: normalizar(email) in em_uso for email in emails}
+
+
+def esquecer(usuario):
+    """Tira do cache as respostas "livre" para o e-mail e o nome do usuário."""
+    chaves = [
+        _chave(campo, normalizar(getattr(usuario, campo)))
+        for campo in CAMPOS
+        if getattr(usuario, campo)
+    ]
+    if chaves:
+        # Depois do commit: antes dele outra checagem ainda veria o valor livre
+        transaction.on_commit(lambda: cache.delete_many(chaves))
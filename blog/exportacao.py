@@ -0,0 +1,225 @@
+"""Exportação do site público para uma árvore de arquivos estáticos.
+
+Cada página vira `<caminho>/index.html`; as páginas seguintes das listagens
+(`?page=N`) viram `<caminho>/pagina/N/index.html` (ver o README para a
+regra de rewrite). O manifesto (`.manifesto.json` no destino) guarda o hash
+de cada arquivo gerado, os posts de cada página de listagem e o instante da
+última exportação. Com ele uma nova exportação só renderiza:
+
+- os posts alterados desde então, os que receberam comentários e os que
+  mostram um post alterado entre os relacionados;
+- as páginas de listagem cujos posts mudaram (comparando os ids de cada
+  página com os do manifesto) ou que contêm um post alterado;
+- a primeira página da home, que tem os rankings de visualizações.
+
+Arquivos cujo conteúdo não mudou não são reescritos, então rsync e CDN só
+veem o que de fato mudou. Para isso o HTML exportado não pode ter partes
+que mudam a cada renderização: o formulário de comentário (com o token
+CSRF) fica de fora e o `?v=` do CSS é o hash do arquivo, não a hora. Sem
+servidor por trás, o post exportado traz todos os comentários aprovados em
+vez do botão "Carregar mais".
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles import finders
+from django.http import Http404
+from django.test import RequestFactory
+from django.urls import resolve
+
+from .armazenamento import PREFIXO_BLOBS
+from .midia import PREFIXO_POSTS
+from .models import Categoria, Comentario, Post, PostRelacionado, Tag
+from .views import PostListView, PostsPorCategoriaView, PostsPorTagView
+
+NOME_MANIFESTO = '.manifesto.json'
+
+
+def arquivo_da_url(url):
+    """'/categoria/x/?page=3' -> 'categoria/x/pagina/3/index.html'."""
+    partes = urlsplit(url)
+    caminho = partes.path.strip('/')
+    if partes.query.startswith('page='):
+        caminho = f'{caminho}/pagina/{partes.query[5:]}'.lstrip('/')
+    return f'{caminho}/index.html' if caminho else 'index.html'
+
+
+def sha256(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def renderizar(url):
+    """HTML da página para um visitante anônimo, ou None se não existe mais."""
+    partes = urlsplit(url)
+    request = RequestFactory().get(url)
+    request.user = AnonymousUser()
+    # Sem cache de páginas e sem contar visualização (ver CachedShellMixin)
+    request.exportando = True
+    match = resolve(partes.path)
+    try:
+        response = match.func(request, *match.args, **match.kwargs)
+    except Http404:
+        return None
+    if response.status_code != 200:
+        return None
+    if hasattr(response, 'render'):
+        response.render()
+    return response.content
+
+
+def exportar_paginas(destino, urls, hashes_anteriores):
+    """Renderiza e grava as páginas; roda dentro dos workers do pool.
+
+    Retorna [(arquivo, hash ou None se a página deixou de existir)].
+    """
+    resultados = []
+    for url in urls:
+        arquivo = arquivo_da_url(url)
+        conteudo = renderizar(url)
+        if conteudo is None:
+            resultados.append((arquivo, None))
+            continue
+        digest = sha256(conteudo)
+        if digest != hashes_anteriores.get(arquivo) or not (Path(destino) / arquivo).exists():
+            gravar(Path(destino) / arquivo, conteudo)
+        resultados.append((arquivo, digest))
+    return resultados
+
+
+def gravar(caminho, conteudo):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(f'.{caminho.name}.{os.getpid()}.tmp')
+    temporario.write_bytes(conteudo)
+    os.replace(temporario, caminho)
+
+
+def carregar_manifesto(destino):
+    try:
+        return json.loads((Path(destino) / NOME_MANIFESTO).read_text())
+    except (FileNotFoundError, ValueError):
+        return {'exportado_em': None, 'arquivos': {}, 'listas': {}, 'ativos': {}}
+
+
+def salvar_manifesto(destino, manifesto):
+    gravar(Path(destino) / NOME_MANIFESTO, json.dumps(manifesto).encode())
+
+
+def listagens():
+    """{url base: [[ids da página 1], [ids da página 2], ...]} de todas as listagens.
+
+    Usa o queryset de cada view, então a exportação segue qualquer mudança
+    de filtro ou ordenação das listagens do site.
+    """
+    def paginar(view, url):
+        ids = list(view.get_queryset().values_list('id', flat=True))
+        tamanho = view.paginate_by
+        return url, [ids[i:i + tamanho] for i in range(0, len(ids), tamanho)] or [[]]
+
+    resultado = dict([paginar(PostListView(), '/')])
+    for view_class, modelo in ((PostsPorCategoriaView, Categoria), (PostsPorTagView, Tag)):
+        for objeto in modelo.objects.only('slug'):
+            view = view_class(kwargs={'slug': objeto.slug})
+            url, paginas = paginar(view, objeto.get_absolute_url())
+            resultado[url] = paginas
+    return resultado
+
+
+def url_da_pagina(base, numero):
+    return base if numero == 1 else f'{base}?page={numero}'
+
+
+def planejar(manifesto, desde, tudo=False):
+    """Retorna (urls a renderizar, arquivos a remover, novas listagens)."""
+    publicados = dict(Post.objects.publicados().values_list('id', 'slug'))
+    urls_posts = {post_id: Post(slug=slug).get_absolute_url() for post_id, slug in publicados.items()}
+
+    if tudo or desde is None:
+        alterados = set(publicados)
+    else:
+        alterados = set(Post.objects.filter(atualizado_em__gt=desde).values_list('id', flat=True))
+        alterados |= set(Comentario.objects.filter(criado_em__gt=desde).values_list('post_id', flat=True))
+        alterados |= set(
+            PostRelacionado.objects.filter(relacionado_id__in=alterados).values_list('post_id', flat=True)
+        )
+    urls = {urls_posts[post_id] for post_id in alterados if post_id in publicados}
+
+    listas = listagens()
+    anteriores = manifesto['listas']
+    for base, paginas in listas.items():
+        antigas = anteriores.get(base, [])
+        for numero, ids in enumerate(paginas, start=1):
+            if (
+                tudo
+                or numero > len(antigas)
+                or antigas[numero - 1] != ids
+                or alterados.intersection(ids)
+                or (base == '/' and numero == 1)
+            ):
+                urls.add(url_da_pagina(base, numero))
+
+    gerados = {arquivo_da_url(url) for url in urls}
+    gerados |= {arquivo_da_url(url) for url in urls_posts.values()}
+    for base, paginas in listas.items():
+        gerados |= {arquivo_da_url(url_da_pagina(base, n)) for n in range(1, len(paginas) + 1)}
+    # Tudo o que estava no manifesto e não existe mais no site sai do destino
+    remover = set(manifesto['arquivos']) - gerados
+    return sorted(urls), remover, listas
+
+
+def midia_exportavel(nome, imagens_publicadas):
+    """Arquivos do site (logos, ícones...) e imagens de posts publicados.
+
+    Imagens de rascunhos, de agendados e blobs sem post ficam de fora: no
+    espelho não há `midia.pode_acessar` para barrá-las.
+    """
+    if not nome.startswith((f'{PREFIXO_BLOBS}/', PREFIXO_POSTS)):
+        return True
+    return nome in imagens_publicadas
+
+
+def copiar_ativos(destino, manifesto):
+    """Copia static, media e sitemaps/feeds; só o que mudou de tamanho/data e de hash.
+
+    O que deixou de ser exportável (ex.: post despublicado) sai do destino.
+    """
+    origens = []
+    for finder in finders.get_finders():
+        for caminho, storage in finder.list([]):
+            origens.append((Path(storage.path(caminho)), Path('static') / caminho))
+    imagens_publicadas = set(
+        Post.objects.publicados().exclude(imagem='').exclude(imagem__isnull=True).values_list('imagem', flat=True)
+    )
+    for raiz, prefixo in ((settings.MEDIA_ROOT, 'media'), (settings.SYNDICATION_ROOT, '')):
+        for origem in Path(raiz).rglob('*'):
+            if not origem.is_file() or origem.name.startswith('.'):
+                continue
+            relativo = origem.relative_to(raiz)
+            if prefixo == 'media' and not midia_exportavel(relativo.as_posix(), imagens_publicadas):
+                continue
+            origens.append((origem, Path(prefixo) / relativo))
+
+    anteriores = manifesto.get('ativos', {})
+    ativos = {}
+    copiados = 0
+    for origem, relativo in origens:
+        info = origem.stat()
+        chave = str(relativo)
+        anterior = anteriores.get(chave)
+        if anterior and anterior[:2] == [info.st_size, info.st_mtime_ns]:
+            ativos[chave] = anterior
+            continue
+        digest = sha256(origem.read_bytes())
+        if not anterior or anterior[2] != digest or not (Path(destino) / relativo).exists():
+            (Path(destino) / relativo).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(origem, Path(destino) / relativo)
+            copiados += 1
+        ativos[chave] = [info.st_size, info.st_mtime_ns, digest]
+    for chave in set(anteriores) - set(ativos):
+        (Path(destino) / chave).unlink(missing_ok=True)
+    return ativos, copiados
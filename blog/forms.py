@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
+from . import disponibilidade
 from .models import Post, Categoria, Tag
 
 
@@ -16,13 +17,14 @@ class UserSignUpForm(UserCreationForm):
 
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        # Sem cache: é esta checagem que decide o cadastro
+        if disponibilidade.email_em_uso(email, usar_cache=False):
             raise forms.ValidationError('Este email já está registrado.')
         return email
 
     def clean_username(self):
         username = self.cleaned_data.get('username')
-        if User.objects.filter(username=username).exists():
+        if disponibilidade.username_em_uso(username, usar_cache=False):
             raise forms.ValidationError('Este usuário já existe.')
         return username
 
@@ -0,0 +1,216 @@
+"""Páginas em cache compartilhado com fragmentos pessoais (estilo ESI).
+
+A página é renderizada uma única vez como "casca": tudo o que depende do
+usuário (barra de navegação, contador de notificações, botões do autor,
+token CSRF) sai como um marcador `<!--velora:fragmento nome args-->` no lugar
+do HTML. A casca vai para o cache e serve qualquer visitante, logado ou não;
+a cada requisição os marcadores são trocados pelos fragmentos do usuário,
+que por sua vez têm cache próprio por usuário quando custam uma consulta.
+
+Cada casca leva um nonce aleatório no marcador, guardado junto dela: só os
+marcadores gerados pela renderização são trocados, nunca um comentário
+igual escrito no conteúdo de um post. Marcadores de nome desconhecido ou
+com argumentos errados viram string vazia.
+
+A chave de cada casca leva duas versões guardadas no cache: a do site
+inteiro e a do grupo de páginas da view (`grupo_da_casca`): `listas` para
+home, categorias, tags e arquivo, `post:<slug>` para cada post. Trocar uma
+versão descarta de uma vez as cascas que dependem dela: um comentário só
+invalida o post comentado, a edição de um post publicado invalida ele e as
+listas, e só categorias e tags (que aparecem em toda página) invalidam o
+site inteiro. Rascunhos e agendados não invalidam nada.
+"""
+import hashlib
+import logging
+import re
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.html import format_html
+
+from .models import Notification, Post
+
+logger = logging.getLogger(__name__)
+
+CHAVE_VERSAO = 'paginas:versao:{}'
+GRUPO_SITE = 'site'
+GRUPO_LISTAS = 'listas'
+# Cabeçalhos da view que a página servida do cache precisa manter
+CABECALHOS_DA_CASCA = ('Cache-Control', 'Vary')
+CHAVE_NAVBAR = 'fragmento:navbar:{}'
+
+_renderizadores = {}
+
+
+def fragmento(nome):
+    """Registra a função que renderiza o fragmento `nome` para a requisição."""
+    def registrar(funcao):
+        # Guarda quantos argumentos vêm depois do request, para validar marcadores
+        _renderizadores[nome] = (funcao, funcao.__code__.co_argcount - 1)
+        return funcao
+    return registrar
+
+
+def novo_nonce():
+    return secrets.token_hex(8)
+
+
+def marcador(nonce, nome, args):
+    return f'<!--velora:fragmento:{nonce} {nome} {",".join(str(arg) for arg in args)}-->'
+
+
+def renderizar_fragmento(request, nome, args):
+    registrado = _renderizadores.get(nome)
+    if registrado is None or len(args) != registrado[1]:
+        logger.warning('Fragmento inválido: %s %s', nome, args)
+        return ''
+    funcao, _ = registrado
+    try:
+        return funcao(request, *args)
+    except (TypeError, ValueError):
+        logger.warning('Argumentos inválidos para o fragmento %s: %s', nome, args)
+        return ''
+
+
+def substituir_fragmentos(html, request, nonce):
+    padrao = re.compile(rf'<!--velora:fragmento:{re.escape(nonce)} (\w+) ([\w,]*)-->')
+    return padrao.sub(
+        lambda m: renderizar_fragmento(request, m[1], m[2].split(',') if m[2] else []),
+        html,
+    )
+
+
+def grupo_do_post(slug):
+    return f'post:{slug}'
+
+
+def versao_paginas(grupo=GRUPO_LISTAS):
+    """Versão das cascas de `grupo`, já combinada com a do site."""
+    chaves = [CHAVE_VERSAO.format(GRUPO_SITE), CHAVE_VERSAO.format(grupo)]
+    versoes = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in versoes:
+            versoes[chave] = cache.get_or_set(chave, time.time_ns, None)
+    return '.'.join(str(versoes[chave]) for chave in chaves)
+
+
+def invalidar_paginas(*grupos):
+    """Descarta as cascas dos grupos; sem argumentos, as do site inteiro."""
+    agora = time.time_ns()
+    cache.set_many({CHAVE_VERSAO.format(grupo): agora for grupo in grupos or (GRUPO_SITE,)}, None)
+
+
+def invalidar_posts(post_ids):
+    """Descarta só as páginas dos posts (ex.: comentários novos)."""
+    slugs = Post.objects.filter(pk__in=post_ids).values_list('slug', flat=True)
+    grupos = [grupo_do_post(slug) for slug in slugs]
+    if grupos:
+        invalidar_paginas(*grupos)
+
+
+def invalidar_fragmentos_usuario(user_id):
+    cache.delete(CHAVE_NAVBAR.format(user_id))
+
+
+@fragmento('navbar')
+def navbar(request):
+    user = request.user
+    chave = CHAVE_NAVBAR.format(user.pk if user.is_authenticated else 'anonimo')
+    html = cache.get(chave)
+    if html is None:
+        nao_lidas = 0
+        if user.is_authenticated:
+            nao_lidas = Notification.objects.filter(user=user, read=False).count()
+        html = render_to_string(
+            'fragmentos/navbar.html',
+            {'user': user, 'notifications_unread_count': nao_lidas},
+        )
+        cache.set(chave, html, settings.FRAGMENT_CACHE_TIMEOUT)
+    return html
+
+
+@fragmento('csrf')
+def csrf(request):
+    return format_html(
+        '<input type="hidden" name="csrfmiddlewaretoken" value="{}">', get_token(request)
+    )
+
+
+@fragmento('controles_autor')
+def controles_autor(request, post_id, autor_id):
+    if request.user.pk != int(autor_id):
+        return ''
+    return render_to_string(
+        'fragmentos/controles_autor.html',
+        {'post_id': post_id, 'csrf_token': get_token(request)},
+    )
+
+
+@fragmento('excluir_comentario')
+def excluir_comentario(request, comentario_id, autor_id):
+    if request.user.pk != int(autor_id):
+        return ''
+    return render_to_string(
+        'fragmentos/excluir_comentario.html',
+        {'comentario_id': comentario_id, 'csrf_token': get_token(request)},
+    )
+
+
+class CachedShellMixin:
+    """Serve GETs a partir da casca em cache e só preenche os fragmentos.
+
+    Views podem guardar dados junto da casca (`dados_da_casca`) e usá-los a
+    cada página servida (`pagina_servida`), com ou sem cache, por exemplo
+    para contar visualizações sem renderizar de novo. Páginas que só quem
+    está logado pode ver (`casca_compartilhavel` falso) nunca vão para o
+    cache, que é o mesmo para todos. Requisições internas da exportação
+    estática (`request.exportando`) passam direto; as do aquecimento
+    (`request.aquecendo`) só gravam a casca. `Cache-Control` e `Vary` da
+    resposta original são guardados com a casca e repostos a cada página.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if getattr(request, 'exportando', False):
+            return super().get(request, *args, **kwargs)
+        caminho = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        chave = f'pagina:{versao_paginas(self.grupo_da_casca())}:{caminho}'
+        casca = cache.get(chave)
+        if casca is None or 'nonce' not in casca:
+            request.renderizando_casca = novo_nonce()
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200 or not hasattr(response, 'render'):
+                return response
+            response.render()
+            casca = {
+                'html': response.content.decode(response.charset),
+                'dados': self.dados_da_casca(),
+                'nonce': request.renderizando_casca,
+                'cabecalhos': {nome: response[nome] for nome in CABECALHOS_DA_CASCA if nome in response},
+            }
+            if settings.PAGE_CACHE_TIMEOUT and self.casca_compartilhavel():
+                cache.set(chave, casca, settings.PAGE_CACHE_TIMEOUT)
+        if getattr(request, 'aquecendo', False):
+            # Só enche o cache (ver blog.agendamento): não é um acesso de leitor
+            return HttpResponse(casca['html'], headers=casca.get('cabecalhos'))
+        self.pagina_servida(casca['dados'])
+        return HttpResponse(
+            substituir_fragmentos(casca['html'], request, casca['nonce']),
+            headers=casca.get('cabecalhos'),
+        )
+
+    def grupo_da_casca(self):
+        return GRUPO_LISTAS
+
+    def casca_compartilhavel(self):
+        return True
+
+    def dados_da_casca(self):
+        return None
+
+    def pagina_servida(self, dados):
+        pass
@@ -0,0 +1,138 @@
+"""Envio de e-mails em massa por um pool limitado de conexões SMTP.
+
+Cada thread do pool mantém a própria conexão aberta (uma transação SMTP por
+mensagem, mas sem reconectar a cada uma), todas dividem um limitador de taxa
+e cada mensagem é retentada com backoff exponencial, reabrindo a conexão.
+Só falhas transitórias são retentadas: erros de conexão e respostas 4xx do
+servidor. Um 5xx (destinatário inexistente, mensagem recusada) falha na
+primeira tentativa. Funciona com qualquer EMAIL_BACKEND (smtp, locmem,
+filebased, console).
+"""
+import logging
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+ERROS_SMTP = (smtplib.SMTPException, OSError)
+
+
+def transitorio(exc):
+    """True se vale a pena tentar de novo: conexão caiu ou o servidor pediu (4xx)."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= codigo < 500 for codigo, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    # Demais SMTPException (ex.: extensão não suportada) não mudam na
+    # próxima tentativa; OSError é rede (recusada, timeout, reset)
+    return not isinstance(exc, smtplib.SMTPException)
+
+
+class LimitadorTaxa:
+    """Token bucket em memória compartilhado pelas threads do pool."""
+
+    def __init__(self, por_segundo, rajada=None):
+        self.por_segundo = por_segundo
+        self.capacidade = rajada or max(1, int(por_segundo))
+        self._tokens = float(self.capacidade)
+        self._atualizado_em = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.por_segundo:
+            return
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(
+                    self.capacidade,
+                    self._tokens + (agora - self._atualizado_em) * self.por_segundo,
+                )
+                self._atualizado_em = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.por_segundo
+            time.sleep(espera)
+
+
+class PoolEnvio:
+    """Envia mensagens com no máximo `conexoes` conexões simultâneas.
+
+    Uso::
+
+        with PoolEnvio(conexoes=4, por_segundo=20) as pool:
+            for chave, ok, erro in pool.enviar(pares):
+                ...
+
+    `pares` é um iterável de (chave, EmailMessage); a chave volta no
+    resultado para o chamador saber o que marcar como enviado.
+    """
+
+    def __init__(self, conexoes=4, por_segundo=0, tentativas=3, backoff=1.0, backend=None):
+        self.conexoes = conexoes
+        self.tentativas = tentativas
+        self.backoff = backoff
+        self.backend = backend
+        self.limitador = LimitadorTaxa(por_segundo)
+        self._local = threading.local()
+        self._abertas = []
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def __enter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.conexoes, thread_name_prefix='mailer')
+        return self
+
+    def __exit__(self, *exc):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conexao in self._abertas:
+                try:
+                    conexao.close()
+                except ERROS_SMTP:
+                    pass
+            self._abertas.clear()
+
+    def _conexao(self, reabrir=False):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is not None and reabrir:
+            try:
+                conexao.close()
+            except ERROS_SMTP:
+                pass
+            conexao = None
+        if conexao is None:
+            conexao = get_connection(backend=self.backend, fail_silently=False)
+            conexao.open()
+            self._local.conexao = conexao
+            with self._lock:
+                self._abertas.append(conexao)
+        return conexao
+
+    def _enviar_um(self, par):
+        chave, mensagem = par
+        erro = None
+        for tentativa in range(self.tentativas):
+            self.limitador.aguardar()
+            try:
+                mensagem.connection = self._conexao(reabrir=tentativa > 0)
+                mensagem.send()
+                return chave, True, None
+            except ERROS_SMTP as exc:
+                erro = exc
+                logger.warning('Falha ao enviar e-mail (%s), tentativa %d: %s', chave, tentativa + 1, exc)
+                if not transitorio(exc) or tentativa == self.tentativas - 1:
+                    break
+                time.sleep(self.backoff * 2 ** tentativa)
+        return chave, False, erro
+
+    def enviar(self, pares):
+        """Envia e devolve (chave, ok, erro) na ordem de entrada."""
+        return self._executor.map(self._enviar_um, pares)
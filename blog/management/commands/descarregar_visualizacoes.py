@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.models import LoteVisualizacao
+from blog.visualizacoes import aplicar_lotes_pendentes
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica lotes de visualizações já registrados que ficaram pendentes e poda o diário. '
+        'Não alcança as contagens na memória dos workers: essas só são gravadas pelo próprio '
+        'worker (buffer cheio ou vencido e no encerramento).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--podar-dias',
+            type=int,
+            default=7,
+            help='Remove lotes aplicados há mais de N dias (0 desativa).',
+        )
+
+    def handle(self, *args, **options):
+        aplicados = aplicar_lotes_pendentes()
+        self.stdout.write(f'{aplicados} lote(s) pendente(s) aplicado(s).')
+
+        if options['podar_dias']:
+            limite = timezone.now() - timedelta(days=options['podar_dias'])
+            removidos, _ = LoteVisualizacao.objects.filter(aplicado_em__lt=limite).delete()
+            self.stdout.write(f'{removidos} lote(s) antigo(s) removido(s).')
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.mailer import PoolEnvio
+from blog.models import EnvioNewsletter, Post
+from blog.newsletter import EnvioConcorrente, enviar_anuncio
+
+
+class Command(BaseCommand):
+    help = (
+        'Anuncia um post publicado para todos os assinantes da newsletter. '
+        'Sem --post, retoma os envios interrompidos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--post', help='Slug do post a anunciar.')
+        parser.add_argument('--lote', type=int, default=500, help='Assinantes por lote (e por checkpoint).')
+        parser.add_argument('--conexoes', type=int, default=4, help='Conexões SMTP simultâneas.')
+        parser.add_argument('--por-segundo', type=float, default=10, help='Limite de mensagens por segundo (0 = sem limite).')
+        parser.add_argument('--tentativas', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options['post']:
+            post = Post.objects.publicados().filter(slug=options['post']).first()
+            if post is None:
+                raise CommandError(f"Post publicado '{options['post']}' não encontrado.")
+            posts = [post]
+        else:
+            posts = [
+                envio.post
+                for envio in EnvioNewsletter.objects.filter(concluido_em__isnull=True).select_related('post')
+            ]
+            if not posts:
+                self.stdout.write('Nenhum envio pendente.')
+                return
+
+        with PoolEnvio(
+            conexoes=options['conexoes'],
+            por_segundo=options['por_segundo'],
+            tentativas=options['tentativas'],
+        ) as pool:
+            for post in posts:
+                inicio = time.monotonic()
+                self.stdout.write(self.style.MIGRATE_HEADING(f'Anunciando {post.slug}'))
+                try:
+                    envio = enviar_anuncio(post, pool, options['lote'], ao_avancar=self.progresso)
+                except EnvioConcorrente as exc:
+                    raise CommandError(exc)
+                self.stdout.write(self.style.SUCCESS(
+                    f'{envio.enviados} enviado(s), {envio.falhas} falha(s) em {time.monotonic() - inicio:.1f}s.'
+                ))
+
+    def progresso(self, envio):
+        self.stdout.write(f'  até o assinante {envio.ultimo_usuario_id}: {envio.enviados} enviado(s), {envio.falhas} falha(s)')
@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.mailer import PoolEnvio
+from blog.models import Notification
+from blog.resumos import lotes_de_usuarios, montar_resumos
+
+
+class Command(BaseCommand):
+    help = 'Envia por e-mail um resumo das notificações não lidas de cada usuário.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--janela-horas', type=int, default=24, help='Considera notificações das últimas N horas.')
+        parser.add_argument('--lote', type=int, default=500, help='Usuários por lote.')
+        parser.add_argument('--conexoes', type=int, default=4, help='Conexões SMTP simultâneas.')
+        parser.add_argument('--por-segundo', type=float, default=10, help='Limite de mensagens por segundo (0 = sem limite).')
+        parser.add_argument('--tentativas', type=int, default=3)
+
+    def handle(self, *args, **options):
+        desde = timezone.now() - timedelta(hours=options['janela_horas'])
+        inicio = time.monotonic()
+        enviados = falhas = 0
+
+        with PoolEnvio(
+            conexoes=options['conexoes'],
+            por_segundo=options['por_segundo'],
+            tentativas=options['tentativas'],
+        ) as pool:
+            for user_ids in lotes_de_usuarios(desde, options['lote']):
+                resumos = montar_resumos(user_ids, desde)
+                ids_por_usuario = {usuario.pk: ids for usuario, ids, _ in resumos}
+                concluidos = [ids for _, ids, mensagem in resumos if mensagem is None]
+                pares = [(usuario.pk, mensagem) for usuario, _, mensagem in resumos if mensagem is not None]
+                for user_id, ok, _ in pool.enviar(pares):
+                    if ok:
+                        concluidos.append(ids_por_usuario[user_id])
+                        enviados += 1
+                    else:
+                        falhas += 1
+                # Marca em bloco só o que entrou nos resumos deste lote
+                ids = [notificacao_id for grupo in concluidos for notificacao_id in grupo]
+                agora = timezone.now()
+                for i in range(0, len(ids), 1000):
+                    Notification.objects.filter(id__in=ids[i:i + 1000]).update(resumido_em=agora)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{enviados} resumo(s) enviado(s), {falhas} falha(s) em {time.monotonic() - inicio:.1f}s.'
+        ))
@@ -0,0 +1,88 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from blog.exportacao import (
+    arquivo_da_url,
+    carregar_manifesto,
+    copiar_ativos,
+    exportar_paginas,
+    planejar,
+    salvar_manifesto,
+)
+from blog.sindicacao import regenerar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Exporta o site público para arquivos estáticos, só o que mudou desde a última exportação.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destino', default=settings.EXPORT_ROOT)
+        parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--bloco', type=int, default=200, help='Páginas por tarefa do pool.')
+        parser.add_argument('--tudo', action='store_true', help='Renderiza todas as páginas de novo.')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        destino = Path(options['destino'])
+        destino.mkdir(parents=True, exist_ok=True)
+        manifesto = carregar_manifesto(destino)
+        # Marcado antes das consultas: o que mudar durante a exportação entra na próxima
+        exportado_em = timezone.now()
+        desde = parse_datetime(manifesto['exportado_em']) if manifesto['exportado_em'] else None
+
+        urls, remover, listas = planejar(manifesto, desde, tudo=options['tudo'])
+        arquivos = {arquivo: digest for arquivo, digest in manifesto['arquivos'].items() if arquivo not in remover}
+        tamanho = options['bloco']
+        tarefas = [urls[i:i + tamanho] for i in range(0, len(urls), tamanho)]
+        argumentos = [
+            (str(destino), bloco, {a: arquivos.get(a) for a in map(arquivo_da_url, bloco)})
+            for bloco in tarefas
+        ]
+
+        # Cada processo filho abre a própria conexão com o banco
+        connections.close_all()
+        if options['processos'] > 1 and len(tarefas) > 1:
+            with ProcessPoolExecutor(max_workers=options['processos']) as pool:
+                resultados = list(pool.map(_exportar_bloco, argumentos))
+        else:
+            resultados = [_exportar_bloco(argumento) for argumento in argumentos]
+
+        for bloco in resultados:
+            for arquivo, digest in bloco:
+                if digest is None:
+                    remover.add(arquivo)
+                    arquivos.pop(arquivo, None)
+                else:
+                    arquivos[arquivo] = digest
+        for arquivo in remover:
+            (destino / arquivo).unlink(missing_ok=True)
+            try:
+                (destino / arquivo).parent.rmdir()
+            except OSError:
+                pass  # pasta não vazia (ex.: ainda tem /pagina/)
+
+        regenerar_pendentes()
+        ativos, copiados = copiar_ativos(destino, manifesto)
+        salvar_manifesto(destino, {
+            'exportado_em': exportado_em.isoformat(),
+            'arquivos': arquivos,
+            'listas': listas,
+            'ativos': ativos,
+        })
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(urls)} página(s) renderizada(s), {len(remover)} removida(s), '
+            f'{copiados} arquivo(s) estático(s) copiado(s) em {time.monotonic() - inicio:.1f}s.'
+        ))
+
+
+def _exportar_bloco(argumentos):
+    destino, urls, hashes = argumentos
+    return exportar_paginas(destino, urls, hashes)
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.sindicacao import marcar, regenerar_pendentes, todas_as_chaves
+
+
+class Command(BaseCommand):
+    help = 'Gera os sitemaps e feeds marcados como pendentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tudo', action='store_true', help='Gera todos os arquivos, não só os pendentes.')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        if options['tudo']:
+            marcar(todas_as_chaves())
+        regeneradas = regenerar_pendentes()
+        self.stdout.write(self.style.SUCCESS(
+            f'{regeneradas} arquivo(s) gerado(s) em {time.monotonic() - inicio:.1f}s.'
+        ))
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.newsletter import importar, ler_csv, ler_jsonl
+
+LEITORES = {'csv': ler_csv, 'jsonl': ler_jsonl}
+
+
+class Command(BaseCommand):
+    help = 'Importa assinantes da newsletter de um CSV (email,nome) ou JSONL, em lotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo, ou - para a entrada padrão.')
+        parser.add_argument('--formato', choices=sorted(LEITORES), help='Padrão: pela extensão do arquivo.')
+        parser.add_argument('--lote', type=int, default=1000, help='Assinantes por INSERT.')
+
+    def handle(self, *args, **options):
+        caminho = options['arquivo']
+        formato = options['formato'] or Path(caminho).suffix.lstrip('.').lower()
+        if formato not in LEITORES:
+            raise CommandError('Informe --formato csv ou jsonl.')
+
+        if caminho == '-':
+            contagens = importar(LEITORES[formato](sys.stdin), options['lote'])
+        else:
+            try:
+                with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+                    contagens = importar(LEITORES[formato](arquivo), options['lote'])
+            except OSError as exc:
+                raise CommandError(exc)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{contagens['lidos']} registro(s) lido(s): {contagens['novos']} novo(s), "
+            f"{contagens['invalidos']} inválido(s)."
+        ))
@@ -0,0 +1,71 @@
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from blog.armazenamento import PREFIXO_BLOBS, armazenamento_midia, remover_se_orfao
+from blog.models import BlobMidia, Post
+from blog.uploads import limpar_expirados
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as referências dos blobs de mídia e apaga órfãos e uploads parciais abandonados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--importar',
+            action='store_true',
+            help='Move as imagens antigas (fora de blobs/) para o armazenamento por conteúdo.',
+        )
+        parser.add_argument('--horas', type=int, default=24, help='Idade dos uploads parciais removidos.')
+
+    def handle(self, *args, **options):
+        if options['importar']:
+            self.stdout.write(f'{self.importar()} imagem(ns) importada(s).')
+
+        with transaction.atomic():
+            BlobMidia.objects.select_for_update().update(referencias=0)
+            contagens = (
+                Post.objects.filter(imagem__startswith=f'{PREFIXO_BLOBS}/')
+                .values_list('imagem')
+                .annotate(n=Count('id'))
+            )
+            for nome, n in contagens:
+                BlobMidia.objects.filter(arquivo=nome).update(referencias=n)
+
+        orfaos = BlobMidia.objects.filter(
+            referencias=0, enviado_em__lt=timezone.now() - timedelta(seconds=settings.MEDIA_ORPHAN_GRACE)
+        ).values_list('arquivo', flat=True)
+        removidos = sum(remover_se_orfao(nome) for nome in list(orfaos))
+
+        # Temporários de uploads interrompidos no meio da gravação
+        limite = time.time() - settings.MEDIA_ORPHAN_GRACE
+        for temporario in Path(armazenamento_midia().path(PREFIXO_BLOBS)).glob('.*.tmp'):
+            if temporario.stat().st_mtime < limite:
+                temporario.unlink(missing_ok=True)
+
+        expirados = limpar_expirados(options['horas'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{removidos} blob(s) órfão(s) removido(s), {expirados} upload(s) parcial(is) expirado(s).'
+        ))
+
+    def importar(self):
+        armazenamento = armazenamento_midia()
+        importadas = 0
+        antigas = Post.objects.exclude(imagem='').exclude(imagem__isnull=True).exclude(
+            imagem__startswith=f'{PREFIXO_BLOBS}/'
+        )
+        for pk, nome in antigas.values_list('pk', 'imagem').iterator(chunk_size=500):
+            caminho = Path(armazenamento.path(nome))
+            if not caminho.exists():
+                continue
+            blob = armazenamento.guardar_arquivo_local(caminho, caminho.suffix.lower())
+            # update() não dispara sinais: as referências são recontadas em seguida
+            Post.objects.filter(pk=pk).update(imagem=blob)
+            importadas += 1
+        return importadas
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from blog.models import CursorTimeline
+from blog.timeline import desmaterializar_usuario, materializar_usuario, podar_materializados
+
+
+class Command(BaseCommand):
+    help = 'Materializa a timeline dos usuários muito ativos e desfaz a dos que esfriaram.'
+
+    def handle(self, *args, **options):
+        minimo = settings.TIMELINE_MATERIALIZE_MIN_READS
+        promovidos = rebaixados = 0
+
+        for cursor in CursorTimeline.objects.filter(materializado=False, leituras_recentes__gte=minimo).select_related('user'):
+            materializar_usuario(cursor.user)
+            promovidos += 1
+
+        # Histerese: só desmaterializa abaixo da metade do limite
+        ativos = CursorTimeline.objects.filter(materializado=True)
+        for user_id in ativos.filter(leituras_recentes__lt=minimo // 2).values_list('user_id', flat=True):
+            desmaterializar_usuario(user_id)
+            rebaixados += 1
+        for user_id in ativos.values_list('user_id', flat=True):
+            podar_materializados(user_id)
+
+        # Decaimento das leituras para a próxima rodada
+        CursorTimeline.objects.filter(leituras_recentes__gt=0).update(leituras_recentes=F('leituras_recentes') / 2)
+        self.stdout.write(f'{promovidos} timeline(s) materializada(s), {rebaixados} desfeita(s).')
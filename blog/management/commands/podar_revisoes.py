@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.revisoes import podar_revisoes
+
+
+class Command(BaseCommand):
+    help = 'Remove revisões antigas de posts, mantendo as mais recentes de cada um.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manter', type=int, default=settings.REVISIONS_KEEP, help='Revisões mantidas por post.')
+        parser.add_argument('--dias', type=int, default=30, help='Só remove revisões com mais de N dias.')
+        parser.add_argument('--lote', type=int, default=500, help='Posts por lote.')
+
+    def handle(self, *args, **options):
+        antes_de = timezone.now() - timedelta(days=options['dias'])
+        removidas = podar_revisoes(options['manter'], antes_de, options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{removidas} revisão(ões) removida(s).'))
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.agendamento import aquecer_paginas, paginas_afetadas, publicar_vencidos
+from blog.models import Post
+from blog.sindicacao import regenerar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Publica os posts agendados que venceram e aquece o cache das páginas afetadas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Fica rodando, verificando a cada N segundos no máximo (0 roda uma vez).',
+        )
+        parser.add_argument('--lote', type=int, default=100, help='Posts publicados por rodada.')
+        parser.add_argument('--sem-aquecer', action='store_true', help='Não renderiza as páginas afetadas.')
+
+    def handle(self, *args, **options):
+        while True:
+            self.rodada(options)
+            if not options['intervalo']:
+                return
+            time.sleep(self.espera(options['intervalo']))
+
+    def rodada(self, options):
+        while True:
+            posts = publicar_vencidos(lote=options['lote'])
+            if not posts:
+                return
+            # Feeds e sitemaps já saem atualizados, sem esperar o primeiro crawler
+            regenerar_pendentes()
+            aquecidas = 0
+            if not options['sem_aquecer']:
+                aquecidas = aquecer_paginas(paginas_afetadas(posts))
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(posts)} post(s) publicado(s), {aquecidas} página(s) aquecida(s).'
+            ))
+
+    def espera(self, intervalo):
+        # Dorme até o próximo agendamento, se ele vier antes do intervalo
+        proximo = (
+            Post.objects.filter(publicacao_processada=False, publicado_em__isnull=False)
+            .order_by('publicado_em')
+            .values_list('publicado_em', flat=True)
+            .first()
+        )
+        if proximo is None:
+            return intervalo
+        return max(1, min(intervalo, (proximo - timezone.now()).total_seconds()))
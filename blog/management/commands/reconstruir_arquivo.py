@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from blog.arquivo import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Recalcula do zero o histograma mensal do arquivo de posts.'
+
+    def handle(self, *args, **options):
+        meses = reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'Arquivo reconstruído: {meses} mês(es) com posts.'))
@@ -0,0 +1,64 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blog.models import Post
+from blog.relacionados import carregar_indice_completo, gravar_relacionados, ranquear
+
+# Índice compartilhado por cada processo do pool (enviado uma vez por worker)
+_indice_worker = None
+
+
+def _iniciar_worker(indice):
+    global _indice_worker
+    _indice_worker = indice
+
+
+def _ranquear_bloco(argumentos):
+    post_ids, k, agora = argumentos
+    return {post_id: ranquear(post_id, _indice_worker, k, agora) for post_id in post_ids}
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o índice de posts relacionados de todos os posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--bloco', type=int, default=500, help='Posts por tarefa do pool.')
+        parser.add_argument('--k', type=int, default=settings.RELATED_POSTS_K)
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        indice = carregar_indice_completo()
+        post_ids = list(Post.objects.values_list('id', flat=True).order_by('id'))
+        tamanho = options['bloco']
+        agora = time.time()
+        tarefas = [(post_ids[i:i + tamanho], options['k'], agora) for i in range(0, len(post_ids), tamanho)]
+
+        # Os workers não usam o banco; fecha as conexões antes do fork para
+        # que nenhum processo filho herde o socket do pai
+        connections.close_all()
+        total = 0
+        if options['processos'] > 1:
+            with ProcessPoolExecutor(
+                max_workers=options['processos'],
+                initializer=_iniciar_worker,
+                initargs=(indice,),
+            ) as pool:
+                for resultados in pool.map(_ranquear_bloco, tarefas):
+                    gravar_relacionados(resultados)
+                    total += len(resultados)
+        else:
+            _iniciar_worker(indice)
+            for tarefa in tarefas:
+                resultados = _ranquear_bloco(tarefa)
+                gravar_relacionados(resultados)
+                total += len(resultados)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} post(s) indexado(s) em {time.monotonic() - inicio:.1f}s.'
+        ))
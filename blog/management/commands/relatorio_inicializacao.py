@@ -0,0 +1,87 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Roda num processo novo: só assim os imports e a primeira requisição são frios
+SCRIPT = '''
+import json, sys, time
+from wsgiref.util import setup_testing_defaults
+
+inicio = time.perf_counter()
+from velora.wsgi import application
+carregado = time.perf_counter()
+
+def pedir(caminho, host):
+    environ = {'PATH_INFO': caminho, 'HTTP_HOST': host, 'REQUEST_METHOD': 'GET'}
+    setup_testing_defaults(environ)
+    status = []
+    antes = time.perf_counter()
+    corpo = application(environ, lambda s, h, *a: status.append(s))
+    b''.join(corpo)
+    getattr(corpo, 'close', lambda: None)()
+    return status[0], time.perf_counter() - antes
+
+primeira = pedir(sys.argv[1], sys.argv[2])
+segunda = pedir(sys.argv[1], sys.argv[2])
+print(json.dumps({
+    'carregar_aplicacao': carregado - inicio,
+    'primeira': primeira,
+    'segunda': segunda,
+}))
+'''
+LINHA_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a inicialização de um worker novo: tempo de import por módulo, '
+        'carga da aplicação WSGI e tempo até a primeira resposta, com e sem aquecimento.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--caminho', default='/', help='Página pedida como primeira requisição.')
+        parser.add_argument('--top', type=int, default=20, help='Quantos módulos listar.')
+
+    def handle(self, *args, **options):
+        host = settings.ALLOWED_HOSTS[0].lstrip('.') if settings.ALLOWED_HOSTS else 'localhost'
+        if host == '*':
+            host = 'localhost'
+
+        for rotulo, aquecer in (('sem aquecimento', 'False'), ('com aquecimento', 'True')):
+            medidas, imports = self.medir(options['caminho'], host, aquecer)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Worker {rotulo}'))
+            self.stdout.write(f"  carregar aplicação:  {medidas['carregar_aplicacao'] * 1000:8.1f} ms")
+            for chave in ('primeira', 'segunda'):
+                status, segundos = medidas[chave]
+                self.stdout.write(f'  {chave} resposta: {segundos * 1000:8.1f} ms ({status})')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Imports mais lentos (de {len(imports)})"))
+        self.stdout.write(f"  {'próprio ms':>10} {'acumulado ms':>12}  módulo")
+        for modulo, proprio, acumulado in sorted(imports, key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {proprio / 1000:10.1f} {acumulado / 1000:12.1f}  {modulo}')
+        for prefixo in ('django', 'blog', 'velora'):
+            total = sum(proprio for modulo, proprio, _ in imports if modulo.split('.')[0] == prefixo)
+            self.stdout.write(f'  total {prefixo}.*: {total / 1000:.1f} ms')
+
+    def medir(self, caminho, host, aquecer):
+        ambiente = {**os.environ, 'WARMUP_ON_START': aquecer, 'DJANGO_SETTINGS_MODULE': 'velora.settings'}
+        processo = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SCRIPT, caminho, host],
+            cwd=settings.BASE_DIR,
+            env=ambiente,
+            capture_output=True,
+            text=True,
+        )
+        if processo.returncode != 0:
+            raise CommandError(processo.stderr[-2000:])
+        imports = []
+        for linha in processo.stderr.splitlines():
+            encontrado = LINHA_IMPORTTIME.match(linha)
+            if encontrado:
+                imports.append((encontrado[4], int(encontrado[1]), int(encontrado[2])))
+        return json.loads(processo.stdout.strip().splitlines()[-1]), imports
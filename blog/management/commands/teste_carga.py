@@ -0,0 +1,101 @@
+import asyncio
+import math
+
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.carga import LOGADOS, MIX_PADRAO, Carga, ler_mix, saturacao
+from blog.models import Post
+from blog.views import PostListView
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera carga HTTP contra um servidor já rodando (runserver, gunicorn, uvicorn) com um mix '
+        'de cenários, subindo a concorrência em estágios. Cria comentários e rascunhos: use uma '
+        'cópia do banco.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Endereço do servidor.')
+        parser.add_argument('--usuarios', default='1,5,10,20,50', help='Usuários virtuais de cada estágio.')
+        parser.add_argument('--duracao', type=float, default=30, help='Segundos por estágio.')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre as linhas do relatório.')
+        parser.add_argument(
+            '--mix',
+            default=','.join(f'{nome}={peso}' for nome, peso in MIX_PADRAO.items()),
+            help='Pesos dos cenários (padrão: %(default)s).',
+        )
+        parser.add_argument('--usuario', help='Conta usada nos cenários logados (painel, editor).')
+        parser.add_argument('--senha')
+        parser.add_argument('--pausa', type=float, default=0, help='Pausa média entre cenários, em segundos.')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        try:
+            mix = ler_mix(options['mix'])
+            estagios = [int(parte) for parte in options['usuarios'].split(',') if parte.strip()]
+        except ValueError as exc:
+            raise CommandError(exc)
+        if not estagios or min(estagios) < 1 or estagios != sorted(estagios):
+            raise CommandError('--usuarios deve ser uma lista crescente de inteiros positivos.')
+
+        logados = LOGADOS & {nome for nome, peso in mix.items() if peso > 0}
+        if logados and not (options['usuario'] and authenticate(username=options['usuario'], password=options['senha'])):
+            self.stderr.write(self.style.WARNING(
+                f"Sem --usuario/--senha válidos: cenários {', '.join(sorted(logados))} ficam fora do mix."
+            ))
+            mix = {nome: peso for nome, peso in mix.items() if nome not in LOGADOS}
+        if not any(mix.values()):
+            raise CommandError('O mix não tem cenários com peso.')
+
+        # Alvos lidos do banco antes da carga: só URLs que existem
+        publicados = Post.objects.publicados()
+        slugs = list(publicados.order_by('-publicado_em').values_list('slug', flat=True)[:1000])
+        if not slugs and ({'post', 'comentario'} & set(mix)):
+            raise CommandError('Nenhum post publicado para os cenários de post.')
+        dados = {
+            'slugs': slugs,
+            'paginas': max(1, math.ceil(publicados.count() / PostListView.paginate_by)),
+        }
+
+        carga = Carga(
+            options['url'], dados, mix,
+            usuario=options['usuario'], senha=options['senha'],
+            pausa=options['pausa'], timeout=options['timeout'],
+        )
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{options['url']}: estágios {estagios}, {options['duracao']:.0f}s cada"
+        ))
+        self.stdout.write(f"  {'t':>6} {'usuários':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>7} {'429':>7}")
+        resultado = asyncio.run(
+            carga.executar(estagios, options['duracao'], options['intervalo'], ao_intervalo=self.linha)
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Por estágio'))
+        for usuarios, resumo in resultado:
+            self.linha(usuarios, None, resumo)
+        indice = saturacao(resultado)
+        if indice is None:
+            self.stdout.write(self.style.SUCCESS('Sem saturação até o último estágio: aumente --usuarios.'))
+        else:
+            usuarios, resumo = resultado[indice - 1]
+            self.stdout.write(self.style.WARNING(
+                f'Saturação a partir de {resultado[indice][0]} usuários; melhor estágio: '
+                f"{usuarios} usuários, {resumo['por_segundo']:.1f} req/s, p95 {resumo['p95']:.0f} ms."
+            ))
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Por passo'))
+        self.stdout.write(f"  {'passo':<22} {'req':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>7} {'429':>7}")
+        for passo, resumo in carga.por_passo().items():
+            self.stdout.write(
+                f"  {passo:<22} {resumo['requisicoes']:>7} {resumo['p50']:>8.1f} {resumo['p95']:>8.1f} "
+                f"{resumo['p99']:>8.1f} {resumo['erros']:>7.1%} {resumo['limitados']:>7.1%}"
+            )
+
+    def linha(self, usuarios, segundos, resumo):
+        tempo = f'{segundos:5.0f}s' if segundos is not None else ''
+        self.stdout.write(
+            f"  {tempo:>6} {usuarios:>8} {resumo['por_segundo']:>8.1f} {resumo['p50']:>8.1f} {resumo['p95']:>8.1f} "
+            f"{resumo['p99']:>8.1f} {resumo['erros']:>7.1%} {resumo['limitados']:>7.1%}"
+        )
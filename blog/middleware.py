@@ -0,0 +1,48 @@
+from django.conf import settings
+
+from .routers import (
+    aliases_replicas,
+    fixar_no_principal,
+    houve_escrita,
+    iniciar_rastreamento_escrita,
+    restaurar,
+    saude_replicas,
+)
+
+
+class ReplicaPinMiddleware:
+    """Garante read-your-writes quando há réplicas de leitura.
+
+    Requisições que não são de leitura e sessões que escreveram nos últimos
+    `DB_REPLICA_PIN_SECONDS` segundos (marcadas por um cookie) leem do banco
+    principal. Deve ficar no topo do MIDDLEWARE para enxergar também a
+    gravação da sessão feita pelo SessionMiddleware.
+    """
+
+    cookie_name = 'velora_db_pin'
+    metodos_leitura = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        fixado = (
+            request.method not in self.metodos_leitura
+            or self.cookie_name in request.COOKIES
+        )
+        token_fixado = fixar_no_principal(fixado)
+        token_escrita = iniciar_rastreamento_escrita()
+        try:
+            response = self.get_response(request)
+            if houve_escrita() and aliases_replicas():
+                response.set_cookie(
+                    self.cookie_name,
+                    '1',
+                    max_age=settings.DB_REPLICA_PIN_SECONDS,
+                    httponly=True,
+                    samesite='Lax',
+                )
+        finally:
+            restaurar(token_fixado, token_escrita)
+            saude_replicas.registrar_falhas()
+        return response
@@ -0,0 +1,172 @@
+"""Entrega de arquivos de MEDIA_ROOT com Range, validação e offload.
+
+- Range de um trecho (`bytes=a-b`, `a-`, `-n`), respeitando `If-Range`;
+  pedidos com vários trechos recebem o arquivo inteiro, como a RFC permite.
+- ETag (o próprio hash para blobs, tamanho+mtime para os demais) e
+  Last-Modified, com 304 via `get_conditional_response`.
+- `MEDIA_SERVE_MODE`:
+  - `django`: FileResponse. O servidor WSGI usa `wsgi.file_wrapper`
+    (sendfile no gunicorn), inclusive para trechos, porque o arquivo já vai
+    posicionado no início do trecho e o Content-Length limita o envio.
+  - `x-accel` (nginx) e `x-sendfile` (Apache/lighttpd): o Django só confere
+    o acesso e devolve um cabeçalho; a transferência fica com o proxy.
+- Imagens usadas só por posts não publicados são entregues apenas ao autor
+  (ou à equipe), sem cache compartilhado.
+"""
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+
+from .armazenamento import PREFIXO_BLOBS
+from .models import Post
+
+PADRAO_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+UM_ANO = 365 * 24 * 3600
+# Imagens enviadas antes do armazenamento por conteúdo
+PREFIXO_POSTS = 'posts/'
+
+
+class Trecho:
+    """Arquivo já posicionado que entrega no máximo `restante` bytes.
+
+    Expõe `fileno()` para que o `wsgi.file_wrapper` use sendfile a partir da
+    posição atual; quem só sabe iterar lê pelo `read` limitado.
+    """
+
+    def __init__(self, arquivo, inicio, tamanho):
+        arquivo.seek(inicio)
+        self.arquivo = arquivo
+        self.restante = tamanho
+        self.name = arquivo.name
+
+    def read(self, n=-1):
+        if self.restante <= 0:
+            return b''
+        n = self.restante if n is None or n < 0 else min(n, self.restante)
+        dados = self.arquivo.read(n)
+        self.restante -= len(dados)
+        return dados
+
+    def fileno(self):
+        return self.arquivo.fileno()
+
+    def close(self):
+        self.arquivo.close()
+
+
+def pode_acessar(request, nome):
+    """(permitido, público). Arquivo sem post, ou de algum post publicado, é
+    público; o de rascunhos e agendados, só do autor."""
+    if not nome.startswith((f'{PREFIXO_BLOBS}/', PREFIXO_POSTS)):
+        # Logos, ícones, vídeos do site: nunca são imagem de post
+        return True, True
+    agora = timezone.now()
+    posts = list(Post.objects.filter(imagem=nome).order_by().values_list('autor_id', 'publicado_em'))
+    if not posts or any(publicado_em and publicado_em <= agora for _, publicado_em in posts):
+        return True, True
+    user = request.user
+    permitido = user.is_authenticated and (user.is_staff or any(autor_id == user.pk for autor_id, _ in posts))
+    return permitido, False
+
+
+def intervalo_pedido(request, tamanho, etag, modificado_em):
+    """(inicio, fim) inclusivo, None para o arquivo inteiro, ou 'invalido' (416)."""
+    cabecalho = request.META.get('HTTP_RANGE', '')
+    encontrado = PADRAO_RANGE.match(cabecalho.strip())
+    if not encontrado or not any(encontrado.groups()):
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range:
+        # Validador antigo: o cliente tem outra versão, manda o arquivo inteiro
+        data = parse_http_date_safe(if_range)
+        if if_range != etag and (data is None or data < int(modificado_em)):
+            return None
+    inicio, fim = encontrado.groups()
+    if not inicio:
+        sufixo = int(fim)
+        if sufixo == 0:
+            return 'invalido'
+        return max(0, tamanho - sufixo), tamanho - 1
+    inicio = int(inicio)
+    fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho or fim < inicio:
+        return 'invalido'
+    return inicio, fim
+
+
+def servir(request, nome):
+    try:
+        caminho = Path(safe_join(settings.MEDIA_ROOT, nome))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not caminho.is_file() or any(parte.startswith('.') for parte in Path(nome).parts):
+        raise Http404
+
+    permitido, publico = pode_acessar(request, nome)
+    if not permitido:
+        # Não revela que o arquivo existe
+        raise Http404
+
+    info = caminho.stat()
+    blob = nome.startswith(f'{PREFIXO_BLOBS}/')
+    etag = f'"{Path(nome).stem}"' if blob else f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+    content_type, encoding = mimetypes.guess_type(caminho.name)
+    content_type = content_type or 'application/octet-stream'
+
+    base = HttpResponse()
+    base.headers['ETag'] = etag
+    base.headers['Last-Modified'] = http_date(info.st_mtime)
+    base.headers['Accept-Ranges'] = 'bytes'
+    if not publico:
+        base.headers['Cache-Control'] = 'private, no-cache'
+    elif blob:
+        # O nome é o hash: o conteúdo nunca muda
+        base.headers['Cache-Control'] = f'public, max-age={UM_ANO}, immutable'
+    else:
+        base.headers['Cache-Control'] = f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+    condicional = get_conditional_response(request, etag=etag, last_modified=int(info.st_mtime), response=base)
+    if condicional.status_code in (304, 412):
+        return condicional
+
+    if settings.MEDIA_SERVE_MODE != 'django':
+        # O proxy trata Range e envia o arquivo; o worker fica livre
+        resposta = base
+        resposta.headers['Content-Type'] = content_type
+        if settings.MEDIA_SERVE_MODE == 'x-accel':
+            resposta.headers['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + nome
+        else:
+            resposta.headers['X-Sendfile'] = str(caminho)
+        return resposta
+
+    trecho = intervalo_pedido(request, info.st_size, etag, info.st_mtime)
+    if trecho == 'invalido':
+        resposta = HttpResponse(status=416)
+        resposta.headers['Content-Range'] = f'bytes */{info.st_size}'
+        return resposta
+    inicio, fim = trecho or (0, info.st_size - 1)
+    tamanho = max(0, fim - inicio + 1)
+
+    if request.method == 'HEAD':
+        resposta = HttpResponse(status=206 if trecho else 200, content_type=content_type)
+    else:
+        arquivo = open(caminho, 'rb')
+        conteudo = Trecho(arquivo, inicio, tamanho) if trecho else arquivo
+        resposta = FileResponse(conteudo, status=206 if trecho else 200, content_type=content_type)
+    for cabecalho, valor in base.headers.items():
+        if cabecalho != 'Content-Type':
+            resposta.headers[cabecalho] = valor
+    resposta.headers['Content-Length'] = str(tamanho)
+    if encoding:
+        resposta.headers['Content-Encoding'] = encoding
+    if trecho:
+        resposta.headers['Content-Range'] = f'bytes {inicio}-{fim}/{info.st_size}'
+    return resposta
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_usuario_visualizacoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostRelacionado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveSmallIntegerField()),
+                ('pontuacao', models.FloatField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionados_indice', to='blog.post')),
+                ('relacionado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.post')),
+            ],
+            options={
+                'ordering': ['post', 'posicao'],
+                'constraints': [models.UniqueConstraint(fields=('post', 'posicao'), name='post_relacionado_posicao_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_postrelacionado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Assinatura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CursorTimeline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo_evento_id', models.BigIntegerField(default=0)),
+                ('materializado', models.BooleanField(db_index=True, default=False)),
+                ('leituras_recentes', models.PositiveIntegerField(default=0)),
+                ('lido_em', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='newpost',
+            name='author',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='newpost',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.categoria'),
+        ),
+        migrations.AddField(
+            model_name='newpostnotification',
+            name='event',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='materialized', to='blog.newpost'),
+        ),
+        migrations.AddIndex(
+            model_name='newpost',
+            index=models.Index(fields=['author', '-id'], name='newpost_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newpost',
+            index=models.Index(fields=['category', '-id'], name='newpost_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='newpostnotification',
+            index=models.Index(fields=['user', '-event'], name='newpostnotif_user_event_idx'),
+        ),
+        migrations.AddField(
+            model_name='assinatura',
+            name='autor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assinantes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='assinatura',
+            name='categoria',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assinantes', to='blog.categoria'),
+        ),
+        migrations.AddField(
+            model_name='assinatura',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assinaturas', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='cursortimeline',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cursor_timeline', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='assinatura',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('autor__isnull', False), ('categoria__isnull', True)), models.Q(('autor__isnull', True), ('categoria__isnull', False)), _connector='OR'), name='assinatura_autor_ou_categoria'),
+        ),
+        migrations.AddConstraint(
+            model_name='assinatura',
+            constraint=models.UniqueConstraint(fields=('user', 'autor'), name='assinatura_autor_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='assinatura',
+            constraint=models.UniqueConstraint(fields=('user', 'categoria'), name='assinatura_categoria_unica'),
+        ),
+    ]
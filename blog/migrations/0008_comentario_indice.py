@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_notification_resumido_em'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comentario',
+            index=models.Index(fields=['post', 'aprovado', 'criado_em'], name='comentario_post_aprovado_idx'),
+        ),
+    ]
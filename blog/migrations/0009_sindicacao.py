@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_comentario_indice'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SindicacaoPendente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=255, unique=True)),
+                ('marcado_em', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
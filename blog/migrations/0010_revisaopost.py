@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_sindicacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevisaoPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveIntegerField()),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('titulo', models.CharField(max_length=200)),
+                ('dados', models.BinaryField()),
+                ('hash', models.CharField(max_length=64)),
+                ('tamanho', models.PositiveIntegerField(help_text='Tamanho do conteúdo completo, em caracteres.')),
+                ('autor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('base', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='deltas', to='blog.revisaopost')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisoes', to='blog.post')),
+            ],
+            options={
+                'ordering': ['post', '-numero'],
+                'constraints': [models.UniqueConstraint(fields=('post', 'numero'), name='revisao_post_numero_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_revisaopost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='versao',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:17
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def preencher_histograma(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    ArquivoMensal = apps.get_model('blog', 'ArquivoMensal')
+    meses = (
+        Post.objects.filter(publicado_em__isnull=False)
+        .annotate(mes=TruncMonth('publicado_em', tzinfo=timezone.get_current_timezone()))
+        .values('mes')
+        .annotate(total=Count('id'))
+    )
+    ArquivoMensal.objects.bulk_create(
+        [ArquivoMensal(ano=linha['mes'].year, mes=linha['mes'].month, total=linha['total']) for linha in meses]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_post_versao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.PositiveSmallIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-ano', '-mes'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['publicado_em', 'id'], name='post_publicado_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='arquivomensal',
+            constraint=models.UniqueConstraint(fields=('ano', 'mes'), name='arquivo_mensal_unico'),
+        ),
+        migrations.RunPython(preencher_histograma, migrations.RunPython.noop),
+    ]
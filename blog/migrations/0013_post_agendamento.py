@@ -0,0 +1,50 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def marcar_publicados(apps, schema_editor):
+    """Posts já no ar contam como processados; os agendados saem do arquivo e
+    da timeline até o agendador publicá-los."""
+    Post = apps.get_model('blog', 'Post')
+    ArquivoMensal = apps.get_model('blog', 'ArquivoMensal')
+    NewPost = apps.get_model('blog', 'NewPost')
+    agora = timezone.now()
+    Post.objects.filter(publicado_em__lte=agora).update(publicacao_processada=True)
+    NewPost.objects.filter(post__publicado_em__gt=agora).delete()
+
+    meses = (
+        Post.objects.filter(publicacao_processada=True)
+        .annotate(mes=TruncMonth('publicado_em', tzinfo=timezone.get_current_timezone()))
+        .values('mes')
+        .annotate(total=Count('id'))
+    )
+    ArquivoMensal.objects.all().delete()
+    ArquivoMensal.objects.bulk_create(
+        [ArquivoMensal(ano=linha['mes'].year, mes=linha['mes'].month, total=linha['total']) for linha in meses]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_arquivomensal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='publicacao_processada',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('publicacao_processada', False), ('publicado_em__isnull', False)), fields=['publicado_em'], name='post_agendado_idx'),
+        ),
+        migrations.RunPython(marcar_publicados, migrations.RunPython.noop),
+    ]
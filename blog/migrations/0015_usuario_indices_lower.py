@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Índices funcionais em auth_user para as checagens de disponibilidade
+    (blog.disponibilidade), que comparam LOWER(email) e LOWER(username)."""
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog', '0014_midia_por_conteudo'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS auth_user_email_lower_idx ON auth_user (LOWER(email));',
+            reverse_sql='DROP INDEX IF EXISTS auth_user_email_lower_idx;',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS auth_user_username_lower_idx ON auth_user (LOWER(username));',
+            reverse_sql='DROP INDEX IF EXISTS auth_user_username_lower_idx;',
+        ),
+    ]
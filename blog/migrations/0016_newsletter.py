@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_usuario_indices_lower'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvioNewsletter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo_usuario_id', models.BigIntegerField(default=0)),
+                ('enviados', models.PositiveIntegerField(default=0)),
+                ('falhas', models.PositiveIntegerField(default=0)),
+                ('iniciado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='envio_newsletter', to='blog.post')),
+            ],
+        ),
+    ]
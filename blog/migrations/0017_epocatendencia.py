@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:47
+
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def criar_epoca(apps, schema_editor):
+    """As pontuações já gravadas foram calculadas a partir de TRENDING_EPOCH."""
+    EpocaTendencia = apps.get_model('blog', 'EpocaTendencia')
+    inicio = datetime.fromisoformat(settings.TRENDING_EPOCH).replace(tzinfo=timezone.utc)
+    EpocaTendencia.objects.get_or_create(pk=1, defaults={'inicio': inicio})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_newsletter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EpocaTendencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(criar_epoca, migrations.RunPython.noop),
+    ]
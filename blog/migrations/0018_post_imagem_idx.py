@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_epocatendencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['imagem'], name='post_imagem_idx'),
+        ),
+    ]
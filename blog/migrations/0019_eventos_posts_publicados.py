@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-19 19:02
+
+from django.db import migrations
+
+
+def registrar_eventos(apps, schema_editor):
+    """Posts publicados antes do log de eventos existir também entram na
+    timeline; em ordem de publicação, porque a timeline ordena por id."""
+    Post = apps.get_model('blog', 'Post')
+    NewPost = apps.get_model('blog', 'NewPost')
+    posts = (
+        Post.objects.filter(publicacao_processada=True, new_posts__isnull=True)
+        .order_by('publicado_em', 'id')
+        .values_list('id', 'autor_id', 'categoria_id')
+    )
+    NewPost.objects.bulk_create(
+        [NewPost(post_id=post_id, author_id=autor_id, category_id=categoria_id) for post_id, autor_id, categoria_id in posts.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_post_imagem_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(registrar_eventos, migrations.RunPython.noop),
+    ]
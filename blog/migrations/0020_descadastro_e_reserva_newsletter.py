@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_eventos_posts_publicados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='envionewsletter',
+            name='reservado_ate',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='envionewsletter',
+            name='reservado_por',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='descadastrado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,9 +1,14 @@
+import uuid
+
 from django.db import models
+from django.db.models.functions import Now
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.contrib.auth.models import User
 
+from .armazenamento import armazenamento_midia
+
 
 class Categoria(models.Model):
     nome = models.CharField(max_length=100, unique=True)
@@ -37,6 +42,13 @@ class Tag(models.Model):
         return reverse('blog:posts_por_tag', args=[self.slug])
 
 
+class PostQuerySet(models.QuerySet):
+    def publicados(self):
+        # Now() é avaliado pelo banco em cada consulta, então o filtro vale
+        # também em querysets declarados no corpo da classe (ex.: views)
+        return self.filter(publicado_em__lte=Now())
+
+
 class Post(models.Model):
     titulo = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
@@ -44,12 +56,38 @@ class Post(models.Model):
     categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
     conteudo = models.TextField()
-    imagem = models.ImageField(upload_to='posts/%Y/%m/%d/', blank=True, null=True)
+    # Gravada uma vez por conteúdo em blobs/<hash> (ver blog.armazenamento)
+    imagem = models.ImageField(upload_to='posts/%Y/%m/%d/', storage=armazenamento_midia, blank=True, null=True)
     criado_em = models.DateTimeField(default=timezone.now)
     publicado_em = models.DateTimeField(blank=True, null=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    # Incrementada a cada gravação do rascunho (controle otimista do autosave)
+    versao = models.PositiveIntegerField(default=1)
+    # Contadores mantidos em lote por blog.visualizacoes (nunca por requisição)
+    visualizacoes = models.PositiveBigIntegerField(default=0)
+    tendencia = models.FloatField(default=0)
+    # Efeitos da publicação (timeline, arquivo, feeds...) já aplicados; para
+    # posts agendados isso acontece em `manage.py publicar_agendados`
+    publicacao_processada = models.BooleanField(default=False, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-publicado_em', '-criado_em']
+        indexes = [
+            models.Index(fields=['-visualizacoes'], name='post_visualizacoes_idx'),
+            models.Index(fields=['-tendencia'], name='post_tendencia_idx'),
+            # Arquivo por data: intervalo de publicado_em + keyset (publicado_em, id)
+            models.Index(fields=['publicado_em', 'id'], name='post_publicado_idx'),
+            # Acesso a /media/: de quais posts é este arquivo (ver blog.midia)
+            models.Index(fields=['imagem'], name='post_imagem_idx'),
+            # Fila do agendador: só os posts ainda não processados
+            models.Index(
+                fields=['publicado_em'],
+                condition=models.Q(publicacao_processada=False, publicado_em__isnull=False),
+                name='post_agendado_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.titulo
@@ -58,6 +96,108 @@ class Post(models.Model):
         return reverse('blog:detalhe_post', args=[self.slug])
 
 
+class RevisaoPost(models.Model):
+    """Revisão do título e do conteúdo de um post (ver blog.revisoes).
+
+    `dados` guarda, comprimido, o conteúdo inteiro (snapshot, `base` nula)
+    ou só a diferença para o snapshot `base`.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='revisoes')
+    numero = models.PositiveIntegerField()
+    autor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    criado_em = models.DateTimeField(default=timezone.now)
+    titulo = models.CharField(max_length=200)
+    base = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='deltas')
+    dados = models.BinaryField()
+    hash = models.CharField(max_length=64)
+    tamanho = models.PositiveIntegerField(help_text='Tamanho do conteúdo completo, em caracteres.')
+
+    class Meta:
+        ordering = ['post', '-numero']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'numero'], name='revisao_post_numero_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} #{self.numero}'
+
+
+class ArquivoMensal(models.Model):
+    """Posts publicados por mês, mantido por blog.arquivo (sem GROUP BY por página)."""
+    ano = models.PositiveSmallIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-ano', '-mes']
+        constraints = [
+            models.UniqueConstraint(fields=['ano', 'mes'], name='arquivo_mensal_unico'),
+        ]
+
+    def __str__(self):
+        return f'{self.mes:02d}/{self.ano}: {self.total}'
+
+
+class BlobMidia(models.Model):
+    """Arquivo de mídia guardado uma vez por conteúdo (ver blog.armazenamento)."""
+    hash = models.CharField(max_length=64, unique=True)
+    arquivo = models.CharField(max_length=255)
+    tamanho = models.PositiveBigIntegerField()
+    # Posts que apontam para o arquivo; em zero ele pode ser apagado
+    referencias = models.PositiveIntegerField(default=0)
+    # Último upload do conteúdo: protege blobs recém-enviados sem post ainda
+    enviado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['arquivo'], name='blob_arquivo_idx')]
+
+    def __str__(self):
+        return f'{self.arquivo} ({self.referencias})'
+
+
+class UploadParcial(models.Model):
+    """Upload em blocos retomável (ver blog.uploads); o conteúdo fica em
+    MEDIA_PARTIAL_ROOT até o último bloco chegar."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    nome = models.CharField(max_length=255)
+    tamanho = models.PositiveBigIntegerField()
+    recebido = models.PositiveBigIntegerField(default=0)
+    # Nome do blob quando concluído
+    arquivo = models.CharField(max_length=255, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.nome} ({self.recebido}/{self.tamanho})'
+
+
+class SindicacaoPendente(models.Model):
+    """Sitemap ou feed que precisa ser gerado de novo (ver blog.sindicacao)."""
+    chave = models.CharField(max_length=255, unique=True)
+    marcado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.chave
+
+
+class PostRelacionado(models.Model):
+    """Top-k de posts relacionados, pré-calculado por blog.relacionados."""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='relacionados_indice')
+    relacionado = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    posicao = models.PositiveSmallIntegerField()
+    pontuacao = models.FloatField()
+
+    class Meta:
+        ordering = ['post', 'posicao']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'posicao'], name='post_relacionado_posicao_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} -> {self.relacionado_id} ({self.pontuacao:.2f})'
+
+
 class Comentario(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comentarios')
     nome = models.CharField(max_length=100)
@@ -69,6 +209,10 @@ class Comentario(models.Model):
 
     class Meta:
         ordering = ['-criado_em']
+        indexes = [
+            # Paginação por keyset dos comentários aprovados de um post
+            models.Index(fields=['post', 'aprovado', 'criado_em'], name='comentario_post_aprovado_idx'),
+        ]
 
     def __str__(self):
         return f'Comentário de {self.nome} em {self.post.titulo}'
@@ -82,36 +226,150 @@ class Notification(models.Model):
     message = models.TextField(blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
     read = models.BooleanField(default=False)
+    # Quando entrou em um resumo por e-mail (enviar_resumos)
+    resumido_em = models.DateTimeField(blank=True, null=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(
+                fields=['user', 'id'],
+                condition=models.Q(read=False, resumido_em__isnull=True),
+                name='notification_resumo_pend_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Notification to {self.user.username}: {self.title or self.verb or self.message[:30]}'
     
 class NewPostNotification(models.Model):
+    """Item de timeline materializado (só para usuários muito ativos)."""
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='new_post_notifications')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='new_post_user_notifications')
+    event = models.ForeignKey('NewPost', null=True, blank=True, on_delete=models.CASCADE, related_name='materialized')
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['user', '-event'], name='newpostnotif_user_event_idx'),
+        ]
 
     def __str__(self):
         return f'New Post Notification to {self.user.username} for post {self.post.titulo}'
-    
+
+
 class NewPost(models.Model):
+    """Evento de publicação: o log lido pela timeline (fan-out na leitura)."""
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='new_posts')
+    # Copiados do post para que cada fonte da timeline seja uma varredura de índice
+    author = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    category = models.ForeignKey(Categoria, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['author', '-id'], name='newpost_author_idx'),
+            models.Index(fields=['category', '-id'], name='newpost_category_idx'),
+        ]
 
     def __str__(self):
         return f'New Post: {self.post.titulo}'
 
 
+class CursorTimeline(models.Model):
+    """Até onde o usuário leu a timeline e se ela está materializada."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cursor_timeline')
+    ultimo_evento_id = models.BigIntegerField(default=0)
+    materializado = models.BooleanField(default=False, db_index=True)
+    leituras_recentes = models.PositiveIntegerField(default=0)
+    lido_em = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'Cursor de {self.user.username} em {self.ultimo_evento_id}'
+
+
+class Assinatura(models.Model):
+    """Assinatura de um autor ou de uma categoria na timeline."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='assinaturas')
+    autor = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE, related_name='assinantes')
+    categoria = models.ForeignKey(Categoria, null=True, blank=True, on_delete=models.CASCADE, related_name='assinantes')
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(autor__isnull=False, categoria__isnull=True)
+                | models.Q(autor__isnull=True, categoria__isnull=False),
+                name='assinatura_autor_ou_categoria',
+            ),
+            models.UniqueConstraint(fields=['user', 'autor'], name='assinatura_autor_unica'),
+            models.UniqueConstraint(fields=['user', 'categoria'], name='assinatura_categoria_unica'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} assina {self.autor or self.categoria}'
+
+
+class LoteVisualizacao(models.Model):
+    """Diário dos lotes de visualizações gravados nos posts.
+
+    O lote é registrado antes de ser aplicado e marcado como aplicado na
+    mesma transação dos UPDATEs, então reaplicar um lote nunca conta duas vezes.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    contagens = models.JSONField()
+    criado_em = models.DateTimeField(auto_now_add=True)
+    aplicado_em = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        ordering = ['criado_em']
+
+    def __str__(self):
+        return f'Lote {self.id} ({"aplicado" if self.aplicado_em else "pendente"})'
+
+
+class EpocaTendencia(models.Model):
+    """Época do ranking "em alta" (linha única, ver blog/visualizacoes.py)."""
+    inicio = models.DateTimeField()
+
+    def __str__(self):
+        return f'Época de tendência em {self.inicio:%Y-%m-%d %H:%M}'
+
+
 class Usuario(models.Model):
+    """Assinante da newsletter (ver blog/newsletter.py).
+
+    Quem cancela a inscrição fica na tabela com `descadastrado_em`: assim uma
+    nova importação da mesma lista não o inscreve de novo.
+    """
     email = models.EmailField(unique=True)
     nome = models.CharField(max_length=250)
-    criado_em = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    criado_em = models.DateTimeField(auto_now_add=True)
+    descadastrado_em = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return self.email
+
+
+class EnvioNewsletter(models.Model):
+    """Progresso do anúncio de um post para os assinantes.
+
+    `ultimo_usuario_id` é o checkpoint: todos os assinantes com id até ele já
+    foram processados. Um envio interrompido continua do próximo id.
+    `reservado_por`/`reservado_ate` são a reserva do processo que está
+    enviando; outro só assume depois que ela vence.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='envio_newsletter')
+    ultimo_usuario_id = models.BigIntegerField(default=0)
+    reservado_por = models.CharField(max_length=32, blank=True)
+    reservado_ate = models.DateTimeField(blank=True, null=True)
+    enviados = models.PositiveIntegerField(default=0)
+    falhas = models.PositiveIntegerField(default=0)
+    iniciado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f'Newsletter de {self.post.titulo} ({"concluída" if self.concluido_em else "em andamento"})'
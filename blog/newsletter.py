@@ -0,0 +1,216 @@
+"""Newsletter: importação de assinantes e anúncio de posts novos.
+
+A importação lê CSV ou JSONL em fluxo e grava em lotes com `bulk_create`
+(`ignore_conflicts`): o índice único de `Usuario.email` descarta quem já
+está na lista, sem uma consulta por linha. E-mails são gravados em
+minúsculas, então a mesma pessoa não entra duas vezes por causa da caixa.
+Quem se descadastrou continua na tabela (`descadastrado_em`), então a
+importação também não o inscreve de novo.
+
+O anúncio primeiro reserva o `EnvioNewsletter` (UPDATE condicionado a não
+haver reserva válida, por `NEWSLETTER_LEASE_SECONDS`); uma segunda execução
+do mesmo envio para antes de mandar qualquer e-mail. Depois percorre os
+assinantes por keyset em id e envia cada lote pelo `PoolEnvio` (conexões
+limitadas, taxa e retentativas). Ao fim de cada lote o checkpoint avança e
+renova a reserva: um envio interrompido retoma do lote seguinte (quem estava
+no lote em andamento pode receber de novo).
+
+Cada mensagem leva um link de descadastro assinado (`django.core.signing`,
+sem nada guardado no banco) no corpo e nos cabeçalhos `List-Unsubscribe` e
+`List-Unsubscribe-Post`, para o botão "cancelar inscrição" dos clientes de
+e-mail (RFC 8058).
+"""
+import csv
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMultiAlternatives
+from django.core.validators import validate_email
+from django.db.models import F, Q
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import EnvioNewsletter, Usuario
+
+SAL_DESCADASTRO = 'blog.newsletter.descadastro'
+
+
+class EnvioConcorrente(Exception):
+    """Outro processo detém (ou tomou) a reserva do mesmo envio."""
+
+
+def ler_csv(arquivo):
+    """Registros de um CSV com cabeçalho (colunas `email` e, opcional, `nome`)."""
+    for linha in csv.DictReader(arquivo):
+        yield {(chave or '').strip().lower(): valor for chave, valor in linha.items()}
+
+
+def ler_jsonl(arquivo):
+    """Registros de um JSONL, um objeto por linha; linhas inválidas viram {}."""
+    for linha in arquivo:
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except json.JSONDecodeError:
+            registro = {}
+        yield registro if isinstance(registro, dict) else {}
+
+
+def importar(registros, tamanho_lote=1000):
+    """Grava os assinantes de `registros` e retorna as contagens.
+
+    Retorna {'lidos', 'invalidos', 'novos'}; os demais já estavam na lista
+    ou se repetiam no arquivo. Quem já está na tabela não é alterado: um
+    descadastrado continua descadastrado.
+    """
+    antes = Usuario.objects.count()
+    lidos = invalidos = 0
+    lote = {}
+    for registro in registros:
+        lidos += 1
+        email = str(registro.get('email') or '').strip().lower()
+        try:
+            validate_email(email)
+        except ValidationError:
+            invalidos += 1
+            continue
+        lote.setdefault(email, str(registro.get('nome') or '').strip()[:250])
+        if len(lote) >= tamanho_lote:
+            _gravar(lote)
+            lote = {}
+    _gravar(lote)
+    return {'lidos': lidos, 'invalidos': invalidos, 'novos': Usuario.objects.count() - antes}
+
+
+def _gravar(lote):
+    if lote:
+        Usuario.objects.bulk_create(
+            [Usuario(email=email, nome=nome) for email, nome in lote.items()],
+            ignore_conflicts=True,
+        )
+
+
+def url_descadastro(email):
+    token = signing.dumps(email, salt=SAL_DESCADASTRO)
+    return settings.SITE_URL + reverse('blog:descadastrar_newsletter', args=[token])
+
+
+def email_do_token(token):
+    """E-mail do link de descadastro, ou None se o token foi adulterado."""
+    try:
+        return signing.loads(token, salt=SAL_DESCADASTRO)
+    except signing.BadSignature:
+        return None
+
+
+def descadastrar(email):
+    """Marca o e-mail como descadastrado; True se ele estava inscrito."""
+    return bool(
+        Usuario.objects.filter(email=email, descadastrado_em__isnull=True).update(descadastrado_em=timezone.now())
+    )
+
+
+def lotes_de_assinantes(depois_de, tamanho):
+    """Percorre os inscritos por keyset em id: listas de (id, email, nome)."""
+    inscritos = Usuario.objects.filter(descadastrado_em__isnull=True)
+    ultimo = depois_de
+    while True:
+        lote = list(
+            inscritos.filter(id__gt=ultimo).order_by('id').values_list('id', 'email', 'nome')[:tamanho]
+        )
+        if not lote:
+            return
+        yield lote
+        ultimo = lote[-1][0]
+
+
+def montar_anuncios(post, assinantes):
+    """[(id do assinante, mensagem)] para um lote; templates compilados uma vez."""
+    texto = get_template('emails/anuncio_post.txt')
+    html = get_template('emails/anuncio_post.html')
+    base = {
+        'post': post,
+        'url': settings.SITE_URL + reverse('blog:detalhe_post', args=[post.slug]),
+        'site_url': settings.SITE_URL,
+    }
+    anuncios = []
+    for usuario_id, email, nome in assinantes:
+        descadastro = url_descadastro(email)
+        context = {**base, 'nome': nome, 'url_descadastro': descadastro}
+        mensagem = EmailMultiAlternatives(
+            subject=f'Novo no Velora Blog: {post.titulo}',
+            body=texto.render(context),
+            to=[email],
+            headers={
+                'List-Unsubscribe': f'<{descadastro}>',
+                'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click',
+            },
+        )
+        mensagem.attach_alternative(html.render(context), 'text/html')
+        anuncios.append((usuario_id, mensagem))
+    return anuncios
+
+
+def reservar(envio):
+    """Reserva `envio` para este processo e o recarrega; levanta EnvioConcorrente se já reservado."""
+    agora = timezone.now()
+    dono = uuid.uuid4().hex
+    reservou = EnvioNewsletter.objects.filter(
+        Q(reservado_ate__isnull=True) | Q(reservado_ate__lt=agora), pk=envio.pk,
+    ).update(reservado_por=dono, reservado_ate=agora + timedelta(seconds=settings.NEWSLETTER_LEASE_SECONDS))
+    if not reservou:
+        raise EnvioConcorrente(f'O envio de {envio.post.slug} está sendo feito por outro processo')
+    # O checkpoint pode ter avançado desde o get_or_create
+    envio.refresh_from_db()
+    return dono
+
+
+def enviar_anuncio(post, pool, tamanho_lote=500, ao_avancar=None):
+    """Envia (ou retoma) o anúncio de `post` para todos os assinantes.
+
+    `ao_avancar(envio)` é chamado depois de cada checkpoint. Retorna o
+    `EnvioNewsletter` atualizado.
+    """
+    envio, _ = EnvioNewsletter.objects.get_or_create(post=post)
+    if envio.concluido_em:
+        return envio
+    dono = reservar(envio)
+    reservado = EnvioNewsletter.objects.filter(pk=envio.pk, reservado_por=dono)
+    try:
+        if envio.concluido_em:
+            return envio
+        for lote in lotes_de_assinantes(envio.ultimo_usuario_id, tamanho_lote):
+            enviados = falhas = 0
+            for _, ok, _ in pool.enviar(montar_anuncios(post, lote)):
+                if ok:
+                    enviados += 1
+                else:
+                    falhas += 1
+            agora = timezone.now()
+            avancou = reservado.update(
+                ultimo_usuario_id=lote[-1][0],
+                enviados=F('enviados') + enviados,
+                falhas=F('falhas') + falhas,
+                reservado_ate=agora + timedelta(seconds=settings.NEWSLETTER_LEASE_SECONDS),
+                atualizado_em=agora,
+            )
+            if not avancou:
+                # A reserva venceu durante o lote e outro processo a tomou
+                raise EnvioConcorrente(f'O envio de {post.slug} foi assumido por outro processo')
+            envio.ultimo_usuario_id = lote[-1][0]
+            envio.enviados += enviados
+            envio.falhas += falhas
+            if ao_avancar:
+                ao_avancar(envio)
+        envio.concluido_em = timezone.now()
+        reservado.update(concluido_em=envio.concluido_em)
+        return envio
+    finally:
+        # Libera logo em vez de esperar a reserva vencer (no-op se já a perdeu)
+        reservado.update(reservado_por='', reservado_ate=None)
@@ -0,0 +1,40 @@
+"""Paginação por keyset (data, id) em ordem decrescente, sem OFFSET.
+
+O cursor 'microssegundos-id' identifica o último item da página; a página
+seguinte começa logo depois dele e usa o mesmo índice (data, id) que a
+primeira, não importa quão funda seja a navegação.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSSEGUNDO = timedelta(microseconds=1)
+
+
+def codificar_cursor(momento, pk):
+    # Aritmética inteira para o cursor voltar exatamente ao mesmo instante
+    microssegundos = (momento - EPOCA) // MICROSSEGUNDO
+    return f'{microssegundos}-{pk}'
+
+
+def decodificar_cursor(cursor):
+    """Converte 'microssegundos-id' em (datetime, id); None se inválido."""
+    try:
+        microssegundos, pk = (int(parte) for parte in cursor.split('-', 1))
+        return EPOCA + microssegundos * MICROSSEGUNDO, pk
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def pagina_keyset(consulta, campo, depois_de, limite):
+    """Retorna (itens, cursor da próxima página ou None) ordenados por -campo, -pk."""
+    if depois_de:
+        momento, pk = depois_de
+        consulta = consulta.filter(Q(**{f'{campo}__lt': momento}) | Q(**{campo: momento, 'pk__lt': pk}))
+    itens = list(consulta.order_by(f'-{campo}', '-pk')[:limite + 1])
+    proximo = None
+    if len(itens) > limite:
+        ultimo = itens[limite - 1]
+        proximo = codificar_cursor(getattr(ultimo, campo), ultimo.pk)
+    return itens[:limite], proximo
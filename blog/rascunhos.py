@@ -0,0 +1,103 @@
+"""Autosave de rascunhos com patches parciais e controle otimista de versão.
+
+O editor envia só os campos que mudaram desde o último salvamento, junto
+com a `versao` que conhece. A gravação é um único
+`UPDATE ... WHERE id = ? AND versao = ? AND publicado_em IS NULL` com só
+esses campos; se outra janela salvou antes, nenhuma linha muda e o cliente
+recebe um conflito em vez de sobrescrever o texto.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Categoria, Post, Tag
+from .revisoes import registrar_revisao
+
+
+class ConflitoVersao(Exception):
+    def __init__(self, versao_atual):
+        super().__init__(versao_atual)
+        self.versao_atual = versao_atual
+
+
+def slug_unico(titulo, exceto=None):
+    """Slug livre para `titulo`; `exceto` é o pk do próprio post, se já existe."""
+    base_slug = slugify(titulo) or 'rascunho'
+    slug = base_slug
+    counter = 1
+    while Post.objects.filter(slug=slug).exclude(pk=exceto).exists():
+        slug = f"{base_slug}-{counter}"
+        counter += 1
+    return slug
+
+
+def _validar(patch):
+    """Converte o patch em (campos do UPDATE, ids de tags ou None)."""
+    campos = {}
+    if 'titulo' in patch:
+        titulo = str(patch['titulo']).strip()
+        if not titulo or len(titulo) > Post._meta.get_field('titulo').max_length:
+            raise ValueError('Título inválido')
+        campos['titulo'] = titulo
+    if 'conteudo' in patch:
+        campos['conteudo'] = str(patch['conteudo'])
+    if 'categoria' in patch:
+        categoria_id = patch['categoria']
+        if categoria_id not in (None, ''):
+            categoria_id = int(categoria_id)
+            if not Categoria.objects.filter(pk=categoria_id).exists():
+                raise ValueError('Categoria inexistente')
+        campos['categoria_id'] = categoria_id or None
+
+    tag_ids = None
+    if 'tags' in patch:
+        tag_ids = {int(tag_id) for tag_id in patch['tags']}
+        if Tag.objects.filter(pk__in=tag_ids).count() != len(tag_ids):
+            raise ValueError('Tag inexistente')
+    return campos, tag_ids
+
+
+def _aplicar_tags(post, tag_ids):
+    # Conjunto igual ao atual não gera escrita nem sinais de m2m
+    atuais = set(post.tags.values_list('id', flat=True))
+    if tag_ids - atuais:
+        post.tags.add(*(tag_ids - atuais))
+    if atuais - tag_ids:
+        post.tags.remove(*(atuais - tag_ids))
+
+
+def criar_rascunho(autor, patch):
+    campos, tag_ids = _validar(patch)
+    if 'titulo' not in campos:
+        raise ValueError('Título inválido')
+    with transaction.atomic():
+        post = Post.objects.create(autor=autor, slug=slug_unico(campos['titulo']), **campos)
+        if tag_ids:
+            post.tags.add(*tag_ids)
+        registrar_revisao(post, autor)
+    return post
+
+
+def salvar_rascunho(post, versao, patch, autor):
+    """Aplica o patch ao rascunho se ele ainda estiver na `versao` informada.
+
+    `post` precisa ter titulo e conteudo carregados. Retorna a nova versão;
+    levanta ConflitoVersao se o rascunho mudou (ou foi publicado) desde então.
+    """
+    campos, tag_ids = _validar(patch)
+    if not campos and tag_ids is None:
+        return versao
+    with transaction.atomic():
+        atualizados = Post.objects.filter(pk=post.pk, versao=versao, publicado_em__isnull=True).update(
+            versao=F('versao') + 1, atualizado_em=timezone.now(), **campos
+        )
+        if not atualizados:
+            raise ConflitoVersao(Post.objects.filter(pk=post.pk).values_list('versao', flat=True).first())
+        if tag_ids is not None:
+            _aplicar_tags(post, tag_ids)
+        if 'titulo' in campos or 'conteudo' in campos:
+            post.titulo = campos.get('titulo', post.titulo)
+            post.conteudo = campos.get('conteudo', post.conteudo)
+            registrar_revisao(post, autor)
+    return versao + 1
@@ -0,0 +1,223 @@
+"""Índice de posts relacionados.
+
+A pontuação de um candidato em relação a um post soma, para cada tag em
+comum, o IDF da tag (tags raras pesam mais), um bônus se a categoria é a
+mesma e um termo de recência. Os candidatos vêm do índice invertido
+tag -> posts (e categoria -> posts), limitado aos posts mais recentes de cada
+chave para que tags muito populares não explodam o custo.
+
+O resultado (top-k) fica em `PostRelacionado`, e a página de detalhe faz
+uma única consulta pelo índice (post, posicao).
+"""
+import heapq
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Now
+
+from .models import Post, PostRelacionado
+
+PESO_TAG = 1.0
+PESO_CATEGORIA = 0.5
+PESO_RECENCIA = 0.25
+MEIA_VIDA_RECENCIA_DIAS = 30
+# Quantos posts (os mais recentes) cada tag/categoria contribui como candidatos
+LIMITE_CANDIDATOS_POR_CHAVE = 500
+
+Tagueamento = Post.tags.through
+
+
+def _novo_indice():
+    return {
+        'total': 0,
+        'tags_por_post': {},
+        'categoria_por_post': {},
+        'data_por_post': {},
+        'posts_por_tag': {},
+        'frequencia_tag': {},
+        'posts_por_categoria': {},
+    }
+
+
+def carregar_indice_completo():
+    """Monta o índice invertido de todos os posts publicados."""
+    indice = _novo_indice()
+    publicados = (
+        Post.objects.publicados()
+        .order_by('-publicado_em')
+        .values_list('id', 'categoria_id', 'publicado_em')
+    )
+    ordem = {}
+    for post_id, categoria_id, publicado_em in publicados.iterator(chunk_size=2000):
+        ordem[post_id] = len(ordem)
+        indice['data_por_post'][post_id] = publicado_em.timestamp()
+        indice['categoria_por_post'][post_id] = categoria_id
+        if categoria_id is not None:
+            lista = indice['posts_por_categoria'].setdefault(categoria_id, [])
+            if len(lista) < LIMITE_CANDIDATOS_POR_CHAVE:
+                lista.append(post_id)
+    indice['total'] = len(ordem)
+
+    tagueamentos = Tagueamento.objects.filter(post__publicado_em__lte=Now()).values_list('post_id', 'tag_id')
+    posts_por_tag = defaultdict(list)
+    for post_id, tag_id in tagueamentos.iterator(chunk_size=5000):
+        indice['tags_por_post'].setdefault(post_id, []).append(tag_id)
+        posts_por_tag[tag_id].append(post_id)
+    for tag_id, post_ids in posts_por_tag.items():
+        indice['frequencia_tag'][tag_id] = len(post_ids)
+        post_ids.sort(key=ordem.__getitem__)
+        indice['posts_por_tag'][tag_id] = post_ids[:LIMITE_CANDIDATOS_POR_CHAVE]
+    return indice
+
+
+def carregar_indice_parcial(post_ids):
+    """Monta só a parte do índice necessária para ranquear `post_ids`."""
+    indice = _novo_indice()
+    indice['total'] = Post.objects.publicados().count()
+
+    for post_id, categoria_id in Post.objects.filter(pk__in=post_ids).values_list('id', 'categoria_id'):
+        indice['categoria_por_post'][post_id] = categoria_id
+    for post_id, tag_id in Tagueamento.objects.filter(post_id__in=post_ids).values_list('post_id', 'tag_id'):
+        indice['tags_por_post'].setdefault(post_id, []).append(tag_id)
+
+    tags = {tag_id for tag_ids in indice['tags_por_post'].values() for tag_id in tag_ids}
+    frequencias = (
+        Tagueamento.objects.filter(tag_id__in=tags, post__publicado_em__lte=Now())
+        .values('tag_id')
+        .annotate(n=Count('id'))
+    )
+    indice['frequencia_tag'] = {linha['tag_id']: linha['n'] for linha in frequencias}
+
+    for tag_id in tags:
+        candidatos = (
+            Tagueamento.objects.filter(tag_id=tag_id, post__publicado_em__lte=Now())
+            .order_by('-post__publicado_em')
+            .values_list('post_id', 'post__publicado_em')[:LIMITE_CANDIDATOS_POR_CHAVE]
+        )
+        indice['posts_por_tag'][tag_id] = _registrar_candidatos(indice, candidatos)
+
+    categorias = {c for c in indice['categoria_por_post'].values() if c is not None}
+    for categoria_id in categorias:
+        candidatos = (
+            Post.objects.publicados().filter(categoria_id=categoria_id)
+            .order_by('-publicado_em')
+            .values_list('id', 'publicado_em')[:LIMITE_CANDIDATOS_POR_CHAVE]
+        )
+        indice['posts_por_categoria'][categoria_id] = _registrar_candidatos(indice, candidatos)
+    return indice
+
+
+def _registrar_candidatos(indice, candidatos):
+    post_ids = []
+    for post_id, publicado_em in candidatos:
+        indice['data_por_post'][post_id] = publicado_em.timestamp()
+        post_ids.append(post_id)
+    return post_ids
+
+
+def ranquear(post_id, indice, k, agora=None):
+    """Retorna até `k` pares (post_relacionado_id, pontuação), melhores primeiro."""
+    agora = agora or time.time()
+    pontuacoes = defaultdict(float)
+    for tag_id in indice['tags_por_post'].get(post_id, ()):
+        frequencia = indice['frequencia_tag'].get(tag_id)
+        if not frequencia:
+            continue
+        idf = math.log(1 + indice['total'] / frequencia)
+        for candidato in indice['posts_por_tag'].get(tag_id, ()):
+            pontuacoes[candidato] += PESO_TAG * idf
+
+    categoria_id = indice['categoria_por_post'].get(post_id)
+    if categoria_id is not None:
+        for candidato in indice['posts_por_categoria'].get(categoria_id, ()):
+            pontuacoes[candidato] += PESO_CATEGORIA
+
+    pontuacoes.pop(post_id, None)
+    datas = indice['data_por_post']
+    for candidato in pontuacoes:
+        idade_dias = max(agora - datas[candidato], 0) / 86400
+        pontuacoes[candidato] += PESO_RECENCIA * 0.5 ** (idade_dias / MEIA_VIDA_RECENCIA_DIAS)
+    return heapq.nlargest(k, pontuacoes.items(), key=lambda item: (item[1], datas[item[0]]))
+
+
+def gravar_relacionados(resultados):
+    """Substitui o top-k dos posts em `resultados` ({post_id: [(id, pontuação)]})."""
+    linhas = [
+        PostRelacionado(post_id=post_id, relacionado_id=relacionado_id, posicao=posicao, pontuacao=pontuacao)
+        for post_id, vizinhos in resultados.items()
+        for posicao, (relacionado_id, pontuacao) in enumerate(vizinhos)
+    ]
+    with transaction.atomic():
+        PostRelacionado.objects.filter(post_id__in=list(resultados)).delete()
+        PostRelacionado.objects.bulk_create(linhas, batch_size=1000)
+
+
+def posts_afetados(post_ids, tag_ids=(), categoria_ids=()):
+    """Posts cujo top-k pode mudar quando `post_ids` mudam de tags/categoria."""
+    limite = settings.RELATED_POSTS_MAX_AFFECTED
+    afetados = set(post_ids)
+    afetados.update(
+        PostRelacionado.objects.filter(relacionado_id__in=post_ids)
+        .values_list('post_id', flat=True)[:limite]
+    )
+    if tag_ids:
+        afetados.update(
+            Tagueamento.objects.filter(tag_id__in=tag_ids, post__publicado_em__lte=Now())
+            .order_by('-post__publicado_em')
+            .values_list('post_id', flat=True)[:limite]
+        )
+    if categoria_ids:
+        afetados.update(
+            Post.objects.publicados().filter(categoria_id__in=categoria_ids)
+            .order_by('-publicado_em')
+            .values_list('id', flat=True)[:limite]
+        )
+    return afetados
+
+
+def atualizar_relacionados(post_ids, tag_ids=(), categoria_ids=()):
+    """Recalcula incrementalmente apenas os posts afetados por uma mudança."""
+    afetados = posts_afetados(post_ids, tag_ids, categoria_ids)
+    existentes = set(Post.objects.filter(pk__in=afetados).values_list('id', flat=True))
+    if not existentes:
+        return 0
+    indice = carregar_indice_parcial(existentes)
+    k = settings.RELATED_POSTS_K
+    gravar_relacionados({post_id: ranquear(post_id, indice, k) for post_id in existentes})
+    return len(existentes)
+
+
+_agendado = threading.local()
+
+
+def agendar_atualizacao(post_ids, tag_ids=(), categoria_ids=()):
+    """Agenda `atualizar_relacionados` para o commit da transação atual.
+
+    Várias mudanças na mesma transação (salvar o post, trocar a categoria,
+    adicionar tags) viram um único recálculo.
+    """
+    pendente = getattr(_agendado, 'pendente', None)
+    if pendente is None:
+        pendente = _agendado.pendente = {'posts': set(), 'tags': set(), 'categorias': set()}
+    pendente['posts'].update(post_ids)
+    pendente['tags'].update(tag_ids)
+    pendente['categorias'].update(c for c in categoria_ids if c is not None)
+    transaction.on_commit(_executar_agendado)
+
+
+def _executar_agendado():
+    pendente = getattr(_agendado, 'pendente', None)
+    _agendado.pendente = None
+    if pendente and pendente['posts']:
+        atualizar_relacionados(pendente['posts'], pendente['tags'], pendente['categorias'])
+
+
+def relacionados_de(post):
+    """Posts relacionados já calculados, em uma consulta pelo índice (post, posicao)."""
+    linhas = PostRelacionado.objects.filter(post=post).select_related('relacionado').order_by('posicao')
+    return [linha.relacionado for linha in linhas]
@@ -0,0 +1,71 @@
+"""Resumos por e-mail das notificações não lidas."""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
+
+from .models import Notification
+
+MAXIMO_ITENS_POR_RESUMO = 20
+
+
+def pendentes(desde):
+    """Notificações que ainda podem entrar em um resumo."""
+    return Notification.objects.filter(read=False, resumido_em__isnull=True, timestamp__gte=desde)
+
+
+def lotes_de_usuarios(desde, tamanho):
+    """Percorre, por keyset em user_id, os usuários com notificações pendentes."""
+    ultimo = 0
+    while True:
+        ids = list(
+            pendentes(desde)
+            .filter(user_id__gt=ultimo)
+            .order_by('user_id')
+            .values_list('user_id', flat=True)
+            .distinct()[:tamanho]
+        )
+        if not ids:
+            return
+        yield ids
+        ultimo = ids[-1]
+
+
+def montar_resumos(user_ids, desde):
+    """Retorna [(usuario, ids_das_notificacoes, mensagem ou None)] para o lote.
+
+    Os templates são compilados uma vez por lote. A mensagem é None para
+    quem não tem e-mail; as notificações desses usuários também são
+    marcadas, para não voltarem em toda execução.
+    """
+    por_usuario = defaultdict(list)
+    campos = ('id', 'user_id', 'title', 'verb', 'message', 'timestamp')
+    for notificacao in pendentes(desde).filter(user_id__in=user_ids).order_by('user_id', '-id').values(*campos):
+        por_usuario[notificacao['user_id']].append(notificacao)
+
+    texto = get_template('emails/resumo_notificacoes.txt')
+    html = get_template('emails/resumo_notificacoes.html')
+    resumos = []
+    for usuario in User.objects.filter(pk__in=list(por_usuario)).only('id', 'username', 'first_name', 'email'):
+        notificacoes = por_usuario[usuario.pk]
+        ids = [n['id'] for n in notificacoes]
+        if not usuario.email:
+            resumos.append((usuario, ids, None))
+            continue
+        context = {
+            'usuario': usuario,
+            'notificacoes': notificacoes[:MAXIMO_ITENS_POR_RESUMO],
+            'total': len(notificacoes),
+            'restantes': max(len(notificacoes) - MAXIMO_ITENS_POR_RESUMO, 0),
+            'site_url': settings.SITE_URL,
+        }
+        mensagem = EmailMultiAlternatives(
+            subject=f'Velora Blog: {len(notificacoes)} notificação(ões) não lida(s)',
+            body=texto.render(context),
+            to=[usuario.email],
+        )
+        mensagem.attach_alternative(html.render(context), 'text/html')
+        resumos.append((usuario, ids, mensagem))
+    return resumos
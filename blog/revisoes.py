@@ -0,0 +1,151 @@
+"""Histórico de revisões dos posts com snapshots e deltas comprimidos.
+
+Cada revisão guarda o conteúdo inteiro (snapshot) ou só a diferença, linha a
+linha, para o snapshot mais recente do post, sempre comprimida com zlib. Um
+delta nunca depende de outro delta, então reconstruir qualquer revisão custa
+no máximo descomprimir um snapshot e aplicar um delta. Um snapshot novo é
+gravado a cada `REVISIONS_SNAPSHOT_INTERVAL` revisões ou quando o delta já
+não compensa (mais da metade do tamanho do snapshot comprimido).
+
+Salvar sem mudar título nem conteúdo não cria revisão.
+"""
+import difflib
+import hashlib
+import json
+import zlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+
+from .models import Post, RevisaoPost
+
+
+def impressao(titulo, conteudo):
+    return hashlib.sha256(f'{titulo}\0{conteudo}'.encode()).hexdigest()
+
+
+def calcular_delta(base, novo):
+    """Operações que montam `novo` a partir de `base`.
+
+    [i, j] copia as linhas i..j-1 de `base`; uma string é inserida como está.
+    """
+    linhas_base = base.splitlines(keepends=True)
+    linhas_novo = novo.splitlines(keepends=True)
+    operacoes = []
+    matcher = difflib.SequenceMatcher(None, linhas_base, linhas_novo)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            operacoes.append([i1, i2])
+        elif tag in ('replace', 'insert'):
+            operacoes.append(''.join(linhas_novo[j1:j2]))
+    return operacoes
+
+
+def aplicar_delta(base, operacoes):
+    linhas = base.splitlines(keepends=True)
+    return ''.join(
+        ''.join(linhas[op[0]:op[1]]) if isinstance(op, list) else op for op in operacoes
+    )
+
+
+def _comprimir(texto):
+    return zlib.compress(texto.encode(), 6)
+
+
+def _descomprimir(dados):
+    return zlib.decompress(bytes(dados)).decode()
+
+
+def registrar_revisao(post, autor=None):
+    """Grava o título/conteúdo atuais do post como nova revisão.
+
+    Retorna a revisão criada, ou None se nada mudou desde a última.
+    """
+    assinatura = impressao(post.titulo, post.conteudo)
+    with transaction.atomic():
+        # Serializa as revisões do post: o número é sequencial
+        Post.objects.select_for_update().filter(pk=post.pk).values_list('pk').first()
+        ultima = (
+            RevisaoPost.objects.filter(post=post)
+            .select_related('base')
+            .order_by('-numero')
+            .first()
+        )
+        if ultima is not None and ultima.hash == assinatura:
+            return None
+
+        completo = _comprimir(post.conteudo)
+        base, dados = None, completo
+        snapshot = ultima if ultima is None or ultima.base_id is None else ultima.base
+        if snapshot is not None and ultima.numero + 1 - snapshot.numero < settings.REVISIONS_SNAPSHOT_INTERVAL:
+            delta = _comprimir(json.dumps(calcular_delta(_descomprimir(snapshot.dados), post.conteudo)))
+            if len(delta) * 2 < len(completo):
+                base, dados = snapshot, delta
+
+        return RevisaoPost.objects.create(
+            post=post,
+            numero=ultima.numero + 1 if ultima else 1,
+            autor=autor,
+            titulo=post.titulo,
+            base=base,
+            dados=dados,
+            hash=assinatura,
+            tamanho=len(post.conteudo),
+        )
+
+
+def conteudo_da_revisao(revisao):
+    if revisao.base_id is None:
+        return _descomprimir(revisao.dados)
+    return aplicar_delta(_descomprimir(revisao.base.dados), json.loads(_descomprimir(revisao.dados)))
+
+
+def comparar(revisao_a, revisao_b, contexto=3):
+    """Diff unificado entre duas revisões, como [(classe, linha)]."""
+    linhas = difflib.unified_diff(
+        conteudo_da_revisao(revisao_a).splitlines(),
+        conteudo_da_revisao(revisao_b).splitlines(),
+        f'#{revisao_a.numero}',
+        f'#{revisao_b.numero}',
+        n=contexto,
+        lineterm='',
+    )
+    classes = {'+': 'adicionada', '-': 'removida', '@': 'trecho'}
+    return [(classes.get(linha[:1], 'contexto'), linha) for linha in linhas][2:]
+
+
+def podar_revisoes(manter, antes_de, lote=500):
+    """Remove revisões anteriores a `antes_de`, preservando as `manter` mais
+    recentes de cada post e os snapshots de que elas dependem.
+
+    Percorre os posts por keyset em lotes e apaga cada lote com duas
+    consultas (deltas e depois snapshots). Retorna o total removido.
+    """
+    removidas = 0
+    ultimo = 0
+    while True:
+        maiores = dict(
+            RevisaoPost.objects.filter(post_id__gt=ultimo)
+            .values('post_id')
+            .annotate(maior=Max('numero'))
+            .order_by('post_id')
+            .values_list('post_id', 'maior')[:lote]
+        )
+        if not maiores:
+            return removidas
+        ultimo = max(maiores)
+
+        antigas = Q(pk__in=[])
+        for post_id, maior in maiores.items():
+            if maior > manter:
+                antigas |= Q(post_id=post_id, numero__lte=maior - manter)
+        antigas &= Q(criado_em__lt=antes_de)
+        bases_em_uso = (
+            RevisaoPost.objects.filter(post_id__in=list(maiores), base__isnull=False)
+            .exclude(antigas)
+            .values_list('base_id', flat=True)
+        )
+        candidatas = RevisaoPost.objects.filter(antigas).exclude(pk__in=set(bases_em_uso))
+        removidas += candidatas.filter(base__isnull=False).delete()[0]
+        removidas += candidatas.filter(base__isnull=True).delete()[0]
@@ -0,0 +1,137 @@
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+# Estado por requisição/contexto (funciona com threads do WSGI e com ASGI)
+_fixado_no_principal = contextvars.ContextVar('velora_db_fixado', default=False)
+_houve_escrita = contextvars.ContextVar('velora_db_escrita', default=False)
+
+
+def fixar_no_principal(valor=True):
+    """Força (ou libera) as leituras do contexto atual para o banco principal.
+
+    Retorna o token para restaurar o estado anterior com `restaurar`.
+    """
+    return _fixado_no_principal.set(valor)
+
+
+def iniciar_rastreamento_escrita():
+    return _houve_escrita.set(False)
+
+
+def houve_escrita():
+    return _houve_escrita.get()
+
+
+def restaurar(token_fixado, token_escrita):
+    _fixado_no_principal.reset(token_fixado)
+    _houve_escrita.reset(token_escrita)
+
+
+def aliases_replicas():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+class SaudeReplicas:
+    """Guarda, por processo, se cada réplica respondeu ao último `SELECT 1`.
+
+    Cada réplica é verificada no máximo uma vez a cada
+    `DB_REPLICA_HEALTH_CHECK_INTERVAL` segundos, por uma thread de cada vez:
+    as outras esperam o resultado em vez de usar o anterior. Uma réplica
+    fora do ar fica de fora do sorteio até a próxima verificação
+    bem-sucedida; uma falha de conexão em qualquer consulta
+    (`registrar_falhas`) a tira na hora. A espera pela conexão é limitada
+    por `connect_timeout` (`DB_REPLICA_CONNECT_TIMEOUT`).
+    """
+
+    def __init__(self):
+        self._estado = {}
+        self._locks = {}
+
+    def _recente(self, alias):
+        ok, verificado_em = self._estado.get(alias, (True, None))
+        intervalo = settings.DB_REPLICA_HEALTH_CHECK_INTERVAL
+        if verificado_em is not None and time.monotonic() - verificado_em < intervalo:
+            return ok
+        return None
+
+    def saudavel(self, alias):
+        ok = self._recente(alias)
+        if ok is not None:
+            return ok
+        with self._locks.setdefault(alias, threading.Lock()):
+            # Outra thread pode ter verificado enquanto esta esperava
+            ok = self._recente(alias)
+            if ok is None:
+                ok = self._verificar(alias)
+                self._estado[alias] = (ok, time.monotonic())
+        return ok
+
+    def _verificar(self, alias):
+        conexao = connections[alias]
+        try:
+            with conexao.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except DatabaseError:
+            conexao.close()
+            return False
+
+    def marcar_fora(self, alias):
+        self._estado[alias] = (False, time.monotonic())
+
+    def registrar_falhas(self):
+        """Tira do sorteio as réplicas cuja conexão falhou nesta thread.
+
+        Só olha conexões já abertas; erros de SQL com a conexão ainda
+        utilizável não contam.
+        """
+        replicas = set(aliases_replicas())
+        for conexao in connections.all(initialized_only=True):
+            if conexao.alias not in replicas or not conexao.errors_occurred:
+                continue
+            if conexao.connection is None or not conexao.is_usable():
+                self.marcar_fora(conexao.alias)
+
+    def escolher(self):
+        candidatas = [alias for alias in aliases_replicas() if self.saudavel(alias)]
+        return random.choice(candidatas) if candidatas else None
+
+    def limpar(self):
+        self._estado.clear()
+
+
+saude_replicas = SaudeReplicas()
+
+
+class PrimaryReplicaRouter:
+    """Leituras vão para uma réplica saudável; escritas sempre para o principal.
+
+    As leituras voltam para o principal quando o contexto está fixado
+    (sessão que escreveu há pouco, requisição não-GET), quando o próprio
+    contexto já escreveu algo ou dentro de uma transação no principal.
+    Sem réplicas configuradas, tudo fica no `default`.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _fixado_no_principal.get() or _houve_escrita.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return saude_replicas.escolher() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _houve_escrita.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Principal e réplicas têm os mesmos dados
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
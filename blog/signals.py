@@ -0,0 +1,160 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import armazenamento, arquivo, comentarios, conexoes, disponibilidade, fragmentos, relacionados, sindicacao, taxonomia, timeline
+from .models import Categoria, Comentario, Notification, Post, PostRelacionado, Tag
+
+
+@receiver(pre_save, sender=Post)
+def guardar_estado_anterior(sender, instance, **kwargs):
+    """Guarda os valores do banco para comparar no post_save."""
+    instance._estado_anterior = None
+    if instance.pk:
+        instance._estado_anterior = (
+            Post.objects.filter(pk=instance.pk)
+            .values('categoria_id', 'publicado_em', 'publicacao_processada', 'imagem', 'slug')
+            .first()
+        )
+    # Data futura: os efeitos da publicação ficam para o agendador
+    instance.publicacao_processada = bool(instance.publicado_em and instance.publicado_em <= timezone.now())
+
+
+@receiver(post_save, sender=Post)
+def post_salvo(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_estado_anterior', None) or {}
+    categoria_mudou = anterior.get('categoria_id') != instance.categoria_id
+    if (anterior.get('imagem') or '') != (instance.imagem.name or ''):
+        # Contagem de referências dos blobs de mídia (ver blog.armazenamento)
+        armazenamento.referenciar(instance.imagem.name)
+        armazenamento.soltar(anterior.get('imagem'))
+    estava_no_ar = anterior.get('publicacao_processada', False)
+    no_ar = instance.publicacao_processada
+    publicacao_mudou = estava_no_ar != no_ar
+    if no_ar and (created or categoria_mudou or publicacao_mudou):
+        timeline.registrar_evento(instance)
+    elif publicacao_mudou:
+        timeline.remover_eventos(instance)
+    arquivo.registrar_mudanca(
+        anterior.get('publicado_em') if estava_no_ar else None,
+        instance.publicado_em if no_ar else None,
+    )
+
+    if no_ar or estava_no_ar:
+        # Edição, publicação ou despublicação: a página do post (também no
+        # slug antigo) e as listas. Rascunhos e agendados não aparecem em
+        # cascas compartilhadas, então não invalidam nada
+        slugs = {instance.slug, anterior.get('slug')} - {None}
+        fragmentos.invalidar_paginas(fragmentos.GRUPO_LISTAS, *map(fragmentos.grupo_do_post, slugs))
+        # Sitemap do shard e feeds do post
+        sindicacao.agendar(
+            [sindicacao.chave_de_shard('posts', instance.pk), 'feed:site'],
+            categoria_ids=[anterior.get('categoria_id'), instance.categoria_id],
+            tag_ids=[] if created else instance.tags.values_list('id', flat=True),
+        )
+
+    if created or categoria_mudou or publicacao_mudou:
+        tag_ids = [] if created else list(instance.tags.values_list('id', flat=True))
+        relacionados.agendar_atualizacao(
+            [instance.pk],
+            tag_ids=tag_ids,
+            categoria_ids=[anterior.get('categoria_id'), instance.categoria_id],
+        )
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def tags_alteradas(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        alvo = instance.post_set if reverse else instance.tags
+        instance._ids_antes_de_limpar = set(alvo.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    ids = pk_set if action != 'post_clear' else getattr(instance, '_ids_antes_de_limpar', set())
+    if reverse:
+        # tag.post_set.add(...): `instance` é a tag e os ids são de posts
+        relacionados.agendar_atualizacao(ids, tag_ids=[instance.pk])
+        sindicacao.agendar(tag_ids=[instance.pk])
+        fragmentos.invalidar_paginas(fragmentos.GRUPO_LISTAS)
+        fragmentos.invalidar_posts(ids)
+    else:
+        relacionados.agendar_atualizacao([instance.pk], tag_ids=ids)
+        if instance.publicacao_processada:
+            sindicacao.agendar(tag_ids=ids)
+            fragmentos.invalidar_paginas(fragmentos.GRUPO_LISTAS, fragmentos.grupo_do_post(instance.slug))
+
+
+@receiver(pre_delete, sender=Post)
+def guardar_vizinhos(sender, instance, **kwargs):
+    # Só quem listava o post removido pode ter o top-k alterado
+    instance._vizinhos = set(
+        PostRelacionado.objects.filter(relacionado=instance).values_list('post_id', flat=True)
+    )
+    instance._tag_ids = list(instance.tags.values_list('id', flat=True)) if instance.publicacao_processada else []
+
+
+@receiver(post_delete, sender=Post)
+def post_removido(sender, instance, **kwargs):
+    vizinhos = getattr(instance, '_vizinhos', set()) - {instance.pk}
+    armazenamento.soltar(instance.imagem.name)
+    if vizinhos:
+        relacionados.agendar_atualizacao(vizinhos)
+    if instance.publicacao_processada:
+        fragmentos.invalidar_paginas(fragmentos.GRUPO_LISTAS, fragmentos.grupo_do_post(instance.slug))
+        arquivo.registrar_mudanca(instance.publicado_em, None)
+        sindicacao.agendar(
+            [sindicacao.chave_de_shard('posts', instance.pk), 'feed:site'],
+            categoria_ids=[instance.categoria_id],
+            tag_ids=getattr(instance, '_tag_ids', []),
+        )
+
+
+@receiver(pre_save, sender=Categoria)
+@receiver(pre_save, sender=Tag)
+def guardar_slug_anterior(sender, instance, **kwargs):
+    instance._slug_anterior = None
+    if instance.pk:
+        instance._slug_anterior = sender.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Tag)
+def taxonomia_alterada(sender, instance, **kwargs):
+    secao = 'categorias' if sender is Categoria else 'tags'
+    tipo = 'categoria' if sender is Categoria else 'tag'
+    slugs = {instance.slug, getattr(instance, '_slug_anterior', None)} - {None}
+    taxonomia.invalidar()
+    # Categorias e tags aparecem em todas as páginas
+    fragmentos.invalidar_paginas()
+    # Um slug que sumiu tem o feed apagado na regeneração
+    sindicacao.agendar(
+        [sindicacao.chave_de_shard(secao, instance.pk)] + [f'feed:{tipo}/{slug}' for slug in slugs]
+    )
+
+
+@receiver(post_save, sender=Comentario)
+@receiver(post_delete, sender=Comentario)
+def comentario_alterado(sender, instance, **kwargs):
+    comentarios.invalidar_contagem(instance.post_id)
+    fragmentos.invalidar_posts([instance.post_id])
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def notificacao_alterada(sender, instance, **kwargs):
+    fragmentos.invalidar_fragmentos_usuario(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def usuario_salvo(sender, instance, **kwargs):
+    # E-mail ou nome agora em uso: a resposta "livre" no cache ficou velha
+    disponibilidade.esquecer(instance)
+
+
+@receiver(connection_created)
+def conexao_criada(sender, connection, **kwargs):
+    conexoes.registrar_conexao(connection.alias)
@@ -0,0 +1,286 @@
+"""Sitemaps e feeds RSS/Atom pré-gerados em arquivos.
+
+Nada é montado por requisição de crawler. Cada arquivo tem uma chave:
+
+- `indice`: sitemap.xml, o índice com todos os shards;
+- `sitemap:<secao>:<n>`: sitemap-<secao>-<n>.xml, com os objetos de pk em
+  [n * 50000, (n + 1) * 50000), ou seja, no máximo 50 mil URLs por shard;
+- `feed:site`, `feed:categoria/<slug>`, `feed:tag/<slug>`: feeds/<...>.rss
+  e feeds/<...>.atom com os últimos `FEED_ITEMS` posts do escopo.
+
+Os sinais marcam as chaves afetadas em `SindicacaoPendente` no commit da
+transação. Os arquivos marcados são gerados de novo pelo comando
+`gerar_sindicacao` ou, na falta dele, na próxima vez que alguém os pedir
+(só o arquivo pedido). Sem o índice, que é o caso da primeira geração, a
+requisição não gera o site inteiro: responde 503 e deixa o trabalho para o
+comando.
+Os sitemaps são escritos em streaming direto para o arquivo, e cada arquivo
+é trocado atomicamente (arquivo temporário + rename).
+"""
+import os
+import threading
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .models import Categoria, Post, SindicacaoPendente, Tag
+
+TAMANHO_SHARD = 50000
+# Segundos sugeridos aos crawlers enquanto a primeira geração não roda
+ESPERA_GERACAO = 60
+SECOES = {
+    'posts': (Post, 'blog:detalhe_post'),
+    'categorias': (Categoria, 'blog:posts_por_categoria'),
+    'tags': (Tag, 'blog:posts_por_tag'),
+}
+FORMATOS = {
+    'rss': (Rss201rev2Feed, 'application/rss+xml; charset=utf-8'),
+    'atom': (Atom1Feed, 'application/atom+xml; charset=utf-8'),
+}
+XMLNS_SITEMAP = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def publicados():
+    return Post.objects.publicados()
+
+
+def _url(caminho):
+    return settings.SITE_URL.rstrip('/') + caminho
+
+
+def _arquivo(caminho):
+    return Path(settings.SYNDICATION_ROOT) / caminho
+
+
+def _gravar(caminho, escrever):
+    """Escreve via `escrever(arquivo)`; se ela retornar 0, remove o arquivo."""
+    destino = _arquivo(caminho)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(f'.{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    try:
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            escritos = escrever(arquivo)
+        if escritos == 0:
+            destino.unlink(missing_ok=True)
+        else:
+            os.replace(temporario, destino)
+    finally:
+        temporario.unlink(missing_ok=True)
+
+
+def _urls_do_shard(secao, n):
+    modelo, nome_url = SECOES[secao]
+    consulta = publicados() if modelo is Post else modelo.objects.all()
+    consulta = consulta.filter(pk__gte=n * TAMANHO_SHARD, pk__lt=(n + 1) * TAMANHO_SHARD).order_by('pk')
+    if modelo is Post:
+        for slug, atualizado_em in consulta.values_list('slug', 'atualizado_em').iterator(chunk_size=2000):
+            yield reverse(nome_url, args=[slug]), atualizado_em
+    else:
+        for slug in consulta.values_list('slug', flat=True).iterator(chunk_size=2000):
+            yield reverse(nome_url, args=[slug]), None
+
+
+def gerar_shard(secao, n):
+    def escrever(arquivo):
+        xml = SimplerXMLGenerator(arquivo, 'utf-8', short_empty_elements=True)
+        xml.startDocument()
+        xml.startElement('urlset', {'xmlns': XMLNS_SITEMAP})
+        escritos = 0
+        for caminho, atualizado_em in _urls_do_shard(secao, n):
+            xml.startElement('url', {})
+            xml.addQuickElement('loc', _url(caminho))
+            if atualizado_em:
+                xml.addQuickElement('lastmod', atualizado_em.date().isoformat())
+            xml.endElement('url')
+            escritos += 1
+        xml.endElement('urlset')
+        xml.endDocument()
+        return escritos
+
+    _gravar(f'sitemap-{secao}-{n}.xml', escrever)
+
+
+def gerar_indice():
+    """Lista os shards existentes, com a data de modificação de cada arquivo."""
+    shards = sorted(Path(settings.SYNDICATION_ROOT).glob('sitemap-*-*.xml'))
+
+    def escrever(arquivo):
+        xml = SimplerXMLGenerator(arquivo, 'utf-8', short_empty_elements=True)
+        xml.startDocument()
+        xml.startElement('sitemapindex', {'xmlns': XMLNS_SITEMAP})
+        for shard in shards:
+            modificado = datetime.fromtimestamp(shard.stat().st_mtime, tz=dt_timezone.utc)
+            xml.startElement('sitemap', {})
+            xml.addQuickElement('loc', _url(f'/{shard.name}'))
+            xml.addQuickElement('lastmod', modificado.date().isoformat())
+            xml.endElement('sitemap')
+        xml.endElement('sitemapindex')
+        xml.endDocument()
+
+    _gravar('sitemap.xml', escrever)
+
+
+def gerar_feed(escopo):
+    """Gera RSS e Atom de `site`, `categoria/<slug>` ou `tag/<slug>`.
+
+    Se a categoria/tag não existe mais (removida ou com slug trocado), os
+    arquivos antigos são apagados.
+    """
+    tipo, _, slug = escopo.partition('/')
+    consulta = publicados()
+    titulo, link = 'Velora Blog', reverse('blog:lista_posts')
+    if tipo != 'site':
+        modelo = Categoria if tipo == 'categoria' else Tag
+        objeto = modelo.objects.filter(slug=slug).first()
+        if objeto is None:
+            for formato in FORMATOS:
+                _arquivo(f'feeds/{escopo}.{formato}').unlink(missing_ok=True)
+            return
+        consulta = consulta.filter(categoria=objeto) if tipo == 'categoria' else consulta.filter(tags=objeto)
+        titulo, link = f'Velora Blog – {objeto.nome}', objeto.get_absolute_url()
+
+    posts = list(
+        consulta.select_related('autor')
+        .only('titulo', 'slug', 'conteudo', 'publicado_em', 'atualizado_em', 'autor__username', 'autor__first_name', 'autor__last_name')
+        .order_by('-publicado_em')[:settings.FEED_ITEMS]
+    )
+    for formato, (classe, _) in FORMATOS.items():
+        feed = classe(
+            title=titulo,
+            link=_url(link),
+            description=titulo,
+            language='pt-br',
+            feed_url=_url(f'/feeds/{escopo}.{formato}'),
+        )
+        for post in posts:
+            url = _url(post.get_absolute_url())
+            feed.add_item(
+                title=post.titulo,
+                link=url,
+                description=Truncator(post.conteudo).words(60),
+                unique_id=url,
+                pubdate=post.publicado_em,
+                updateddate=post.atualizado_em,
+                author_name=post.autor.get_full_name() or post.autor.username,
+            )
+        _gravar(f'feeds/{escopo}.{formato}', lambda arquivo: feed.write(arquivo, 'utf-8'))
+
+
+def regenerar(chave):
+    tipo, _, resto = chave.partition(':')
+    if tipo == 'indice':
+        gerar_indice()
+    elif tipo == 'sitemap':
+        secao, n = resto.split(':')
+        gerar_shard(secao, int(n))
+    elif tipo == 'feed':
+        gerar_feed(resto)
+
+
+def marcar(chaves):
+    """Marca chaves como pendentes; sitemaps alterados também marcam o índice."""
+    chaves = set(chaves)
+    if any(chave.startswith('sitemap:') for chave in chaves):
+        chaves.add('indice')
+    SindicacaoPendente.objects.bulk_create(
+        [SindicacaoPendente(chave=chave) for chave in chaves], ignore_conflicts=True
+    )
+
+
+def regenerar_pendentes(chaves=None):
+    """Regenera as chaves pendentes (todas ou só as indicadas); o índice por último.
+
+    Quem consegue apagar a marca é quem regenera: processos concorrentes
+    pulam a chave. Se a geração falhar, a marca volta.
+    """
+    consulta = SindicacaoPendente.objects.all()
+    if chaves is not None:
+        consulta = consulta.filter(chave__in=chaves)
+    pendentes = sorted(consulta.values_list('chave', flat=True), key=lambda chave: chave == 'indice')
+    regeneradas = 0
+    for chave in pendentes:
+        if not SindicacaoPendente.objects.filter(chave=chave).delete()[0]:
+            continue
+        try:
+            regenerar(chave)
+        except Exception:
+            marcar([chave])
+            raise
+        regeneradas += 1
+    return regeneradas
+
+
+def todas_as_chaves():
+    chaves = {'indice', 'feed:site'}
+    for secao, (modelo, _) in SECOES.items():
+        maior = modelo.objects.aggregate(maior=Max('pk'))['maior']
+        if maior is not None:
+            chaves.update(f'sitemap:{secao}:{n}' for n in range(maior // TAMANHO_SHARD + 1))
+    chaves.update(f'feed:categoria/{slug}' for slug in Categoria.objects.values_list('slug', flat=True))
+    chaves.update(f'feed:tag/{slug}' for slug in Tag.objects.values_list('slug', flat=True))
+    return chaves
+
+
+def chave_de_shard(secao, pk):
+    return f'sitemap:{secao}:{pk // TAMANHO_SHARD}'
+
+
+def servir(chave, caminho, content_type):
+    """Entrega o arquivo, regenerando antes só ele se estiver marcado ou se faltar.
+
+    Sem o índice, marca tudo para o `gerar_sindicacao` e responde 503.
+    """
+    regenerar_pendentes([chave])
+    arquivo = _arquivo(caminho)
+    if not arquivo.exists():
+        if chave == 'indice':
+            marcar(todas_as_chaves())
+            response = HttpResponse('Sitemap em geração.', status=503, content_type='text/plain; charset=utf-8')
+            response['Retry-After'] = ESPERA_GERACAO
+            return response
+        regenerar(chave)
+    try:
+        return FileResponse(open(arquivo, 'rb'), content_type=content_type)
+    except FileNotFoundError:
+        raise Http404
+
+
+_agendado = threading.local()
+
+
+def agendar(chaves=(), categoria_ids=(), tag_ids=()):
+    """Marca as chaves no commit da transação atual, uma vez por transação.
+
+    Categorias e tags chegam por id e viram slugs numa consulta só.
+    """
+    pendente = getattr(_agendado, 'pendente', None)
+    if pendente is None:
+        pendente = _agendado.pendente = {'chaves': set(), 'categorias': set(), 'tags': set()}
+    pendente['chaves'].update(chaves)
+    pendente['categorias'].update(c for c in categoria_ids if c is not None)
+    pendente['tags'].update(tag_ids)
+    transaction.on_commit(_executar_agendado)
+
+
+def _executar_agendado():
+    pendente = getattr(_agendado, 'pendente', None)
+    _agendado.pendente = None
+    if not pendente:
+        return
+    chaves = set(pendente['chaves'])
+    if pendente['categorias']:
+        slugs = Categoria.objects.filter(pk__in=pendente['categorias']).values_list('slug', flat=True)
+        chaves.update(f'feed:categoria/{slug}' for slug in slugs)
+    if pendente['tags']:
+        slugs = Tag.objects.filter(pk__in=pendente['tags']).values_list('slug', flat=True)
+        chaves.update(f'feed:tag/{slug}' for slug in slugs)
+    if chaves:
+        marcar(chaves)
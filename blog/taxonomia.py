@@ -0,0 +1,28 @@
+"""Listas de categorias e tags em cache (formulários de post e timeline).
+
+Mudam raramente e aparecem em toda tela de edição, então ficam no cache até
+um sinal de Categoria/Tag descartá-las. O sinal apaga a entrada no cache de
+quem gravou: com o LocMem padrão os outros workers só veem a mudança quando
+a entrada expira (`TAXONOMY_CACHE_TIMEOUT`, 60 s nesse caso).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Categoria, Tag
+
+CHAVE_CATEGORIAS = 'taxonomia:categorias'
+CHAVE_TAGS = 'taxonomia:tags'
+
+
+def categorias():
+    return cache.get_or_set(
+        CHAVE_CATEGORIAS, lambda: list(Categoria.objects.order_by('nome')), settings.TAXONOMY_CACHE_TIMEOUT
+    )
+
+
+def tags():
+    return cache.get_or_set(CHAVE_TAGS, lambda: list(Tag.objects.order_by('nome')), settings.TAXONOMY_CACHE_TIMEOUT)
+
+
+def invalidar():
+    cache.delete_many([CHAVE_CATEGORIAS, CHAVE_TAGS])
@@ -0,0 +1,20 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..fragmentos import marcador, renderizar_fragmento
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragmento(context, nome, *args):
+    """Trecho que depende do usuário.
+
+    Ao renderizar uma casca (ver blog/fragmentos.py) vira um marcador, que é
+    preenchido a cada requisição; fora dela é renderizado na hora.
+    """
+    request = context.get('request')
+    nonce = getattr(request, 'renderizando_casca', None)
+    if nonce:
+        return mark_safe(marcador(nonce, nome, args))
+    return mark_safe(renderizar_fragmento(request, nome, args))
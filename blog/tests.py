@@ -1,3 +1,975 @@
-from django.test import TestCase
+import contextvars
+import hashlib
+import smtplib
+import tempfile
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from . import agendamento, armazenamento, arquivo, disponibilidade, fragmentos, newsletter
+from .comentarios import contar_aprovados, limite_por_ip, motivo_rejeicao, pagina_comentarios
+from .mailer import PoolEnvio
+from .middleware import ReplicaPinMiddleware
+from .models import (
+    ArquivoMensal,
+    BlobMidia,
+    Categoria,
+    Comentario,
+    EnvioNewsletter,
+    NewPost,
+    Notification,
+    Post,
+    Usuario,
+)
+from .paginacao import codificar_cursor, decodificar_cursor
+from .rascunhos import ConflitoVersao, criar_rascunho, salvar_rascunho
+from .resumos import lotes_de_usuarios
+from .revisoes import aplicar_delta, calcular_delta, comparar, conteudo_da_revisao, podar_revisoes, registrar_revisao
+from .throttling import BaldeTokens, ip_do_cliente
+from .views import PostDetailView
+from .routers import (
+    PrimaryReplicaRouter,
+    aliases_replicas,
+    fixar_no_principal,
+    houve_escrita,
+    iniciar_rastreamento_escrita,
+    saude_replicas,
+)
+
+
+def novo_post(autor, slug, **campos):
+    """Post publicado (a menos que `publicado_em` diga outra coisa) numa categoria padrão."""
+    categoria, _ = Categoria.objects.get_or_create(slug='geral', defaults={'nome': 'Geral'})
+    campos.setdefault('publicado_em', timezone.now() - timedelta(hours=1))
+    campos.setdefault('categoria', categoria)
+    campos.setdefault('titulo', slug.title())
+    campos.setdefault('conteudo', 'Conteúdo')
+    return Post.objects.create(autor=autor, slug=slug, **campos)
+
+
+def em_contexto_novo(funcao, *args):
+    """Roda `funcao` num contexto isolado: o estado do roteador não vaza entre testes."""
+    return contextvars.copy_context().run(funcao, *args)
+
+
+# As réplicas de settings usam TEST: {'MIRROR': 'default'}; rode com
+# DB_REPLICA_COUNT=1 (e DB_REPLICA_1_NAME) para exercitar o roteador. Sem a
+# transação do TestCase, que por si só manda as leituras para o principal
+@skipUnless(aliases_replicas(), 'sem réplicas configuradas (DB_REPLICA_COUNT=0)')
+class RoteadorReplicasTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.replica = aliases_replicas()[0]
+        saude_replicas.limpar()
+        self.addCleanup(saude_replicas.limpar)
+
+    def ler(self):
+        iniciar_rastreamento_escrita()
+        return self.router.db_for_read(Post)
+
+    def test_leitura_vai_para_replica_saudavel(self):
+        self.assertIn(em_contexto_novo(self.ler), aliases_replicas())
+
+    def test_contexto_fixado_le_do_principal(self):
+        def fixado():
+            fixar_no_principal()
+            return self.ler()
+        self.assertEqual(em_contexto_novo(fixado), 'default')
+
+    def test_transacao_no_principal_le_do_principal(self):
+        def em_transacao():
+            with transaction.atomic():
+                return self.ler()
+        self.assertEqual(em_contexto_novo(em_transacao), 'default')
+
+    def test_escrita_marca_o_contexto_e_fixa_as_leituras(self):
+        def escrever_e_ler():
+            iniciar_rastreamento_escrita()
+            destino = self.router.db_for_write(Post)
+            return destino, houve_escrita(), self.router.db_for_read(Post)
+        self.assertEqual(em_contexto_novo(escrever_e_ler), ('default', True, 'default'))
+
+    def test_replica_fora_do_ar_volta_para_o_principal(self):
+        with mock.patch.object(saude_replicas, '_verificar', return_value=False) as verificar:
+            self.assertEqual(em_contexto_novo(self.ler), 'default')
+            # Dentro do intervalo o resultado vem da memória
+            self.assertEqual(em_contexto_novo(self.ler), 'default')
+        self.assertEqual(verificar.call_count, len(aliases_replicas()))
+
+    def test_falha_de_conexao_tira_a_replica_na_hora(self):
+        self.assertTrue(saude_replicas.saudavel(self.replica))
+        saude_replicas.marcar_fora(self.replica)
+        self.assertFalse(saude_replicas.saudavel(self.replica))
+
+
+@skipUnless(aliases_replicas(), 'sem réplicas configuradas (DB_REPLICA_COUNT=0)')
+class ReplicaPinMiddlewareTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        saude_replicas.limpar()
+        self.addCleanup(saude_replicas.limpar)
+
+    def responder(self, request, escrever=False):
+        def view(request):
+            if escrever:
+                self.router.db_for_write(Post)
+            return HttpResponse(self.router.db_for_read(Post))
+        return em_contexto_novo(ReplicaPinMiddleware(view), request)
+
+    def test_escrita_grava_o_cookie(self):
+        response = self.responder(self.factory.get('/'), escrever=True)
+        cookie = response.cookies[ReplicaPinMiddleware.cookie_name]
+        self.assertEqual(cookie['max-age'], settings.DB_REPLICA_PIN_SECONDS)
+        self.assertTrue(cookie['httponly'])
+
+    def test_leitura_sem_escrita_nao_grava_cookie(self):
+        response = self.responder(self.factory.get('/'))
+        self.assertNotIn(ReplicaPinMiddleware.cookie_name, response.cookies)
+        self.assertIn(response.content.decode(), aliases_replicas())
+
+    def test_cookie_fixa_as_leituras_no_principal(self):
+        request = self.factory.get('/')
+        request.COOKIES[ReplicaPinMiddleware.cookie_name] = '1'
+        self.assertEqual(self.responder(request).content, b'default')
+
+    def test_post_le_do_principal(self):
+        self.assertEqual(self.responder(self.factory.post('/')).content, b'default')
+
+
+class ResumosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ana = User.objects.create_user('ana', 'ana@exemplo.com')
+        cls.bia = User.objects.create_user('bia', 'bia@exemplo.com')
+        cls.sem_email = User.objects.create_user('caio')
+        for usuario in (cls.ana, cls.ana, cls.bia, cls.sem_email):
+            Notification.objects.create(user=usuario, title='Novo comentário', verb='comentou')
+        Notification.objects.create(user=cls.bia, title='Lida', read=True)
+
+    def enviar_resumos(self, *args):
+        call_command('enviar_resumos', '--por-segundo', '0', *args, stdout=StringIO())
+
+    def test_lotes_por_keyset_de_usuario(self):
+        desde = timezone.now() - timedelta(hours=1)
+        lotes = list(lotes_de_usuarios(desde, 2))
+        self.assertEqual(lotes, [[self.ana.pk, self.bia.pk], [self.sem_email.pk]])
+
+    def test_um_resumo_por_usuario_com_email(self):
+        self.enviar_resumos('--lote', '2')
+        self.assertEqual(sorted(mensagem.to[0] for mensagem in mail.outbox), ['ana@exemplo.com', 'bia@exemplo.com'])
+        resumo_da_ana = next(mensagem for mensagem in mail.outbox if mensagem.to == ['ana@exemplo.com'])
+        self.assertIn('2 notificação', resumo_da_ana.subject)
+
+    def test_marca_resumido_em_e_nao_reenvia(self):
+        self.enviar_resumos()
+        self.assertFalse(Notification.objects.filter(read=False, resumido_em__isnull=True).exists())
+        # Lidas nunca entram em resumo
+        self.assertIsNone(Notification.objects.get(read=True).resumido_em)
+        mail.outbox.clear()
+        self.enviar_resumos()
+        self.assertEqual(mail.outbox, [])
+
+    def test_falha_no_envio_nao_marca(self):
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages',
+            side_effect=smtplib.SMTPServerDisconnected('caiu'),
+        ), self.assertLogs('blog.mailer', 'WARNING'):
+            self.enviar_resumos('--tentativas', '1')
+        pendentes = Notification.objects.filter(read=False, resumido_em__isnull=True)
+        self.assertEqual(set(pendentes.values_list('user_id', flat=True)), {self.ana.pk, self.bia.pk})
+
+
+class PoolEnvioTests(TestCase):
+    def enviar(self, erro, tentativas=3):
+        mensagem = EmailMessage('Assunto', 'Corpo', to=['a@exemplo.com'])
+        with mock.patch(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=erro,
+        ) as enviar, mock.patch('blog.mailer.time.sleep') as dormir, self.assertLogs('blog.mailer', 'WARNING'):
+            with PoolEnvio(conexoes=1, tentativas=tentativas) as pool:
+                resultado = list(pool.enviar([('chave', mensagem)]))
+        return resultado, enviar.call_count, dormir.call_count
+
+    def test_envia_pelo_backend(self):
+        with PoolEnvio(conexoes=2) as pool:
+            resultado = list(pool.enviar([(i, EmailMessage('A', 'B', to=[f'{i}@exemplo.com'])) for i in range(3)]))
+        self.assertEqual([(chave, ok) for chave, ok, _ in resultado], [(0, True), (1, True), (2, True)])
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_erro_transitorio_para_no_limite_de_tentativas(self):
+        resultado, chamadas, esperas = self.enviar(smtplib.SMTPServerDisconnected('caiu'))
+        self.assertEqual(chamadas, 3)
+        # Sem espera depois da última tentativa
+        self.assertEqual(esperas, 2)
+        self.assertFalse(resultado[0][1])
+
+    def test_resposta_4xx_e_retentada(self):
+        _, chamadas, _ = self.enviar(smtplib.SMTPDataError(451, 'tente depois'))
+        self.assertEqual(chamadas, 3)
+
+    def test_erro_permanente_nao_e_retentado(self):
+        recusado = smtplib.SMTPRecipientsRefused({'a@exemplo.com': (550, b'nao existe')})
+        for erro in (recusado, smtplib.SMTPDataError(554, 'recusada')):
+            resultado, chamadas, esperas = self.enviar(erro)
+            self.assertEqual((chamadas, esperas), (1, 0))
+            self.assertIs(resultado[0][2], erro)
+
+
+class NewsletterImportacaoTests(TestCase):
+    def test_dedup_sem_diferenciar_caixa_e_conta_invalidos(self):
+        Usuario.objects.create(email='ja@exemplo.com', nome='Já')
+        registros = [
+            {'email': 'Ana@Exemplo.com', 'nome': 'Ana'},
+            {'email': ' ana@exemplo.com ', 'nome': 'Ana de novo'},
+            {'email': 'JA@exemplo.com'},
+            {'email': 'sem-arroba'},
+            {},
+        ]
+        self.assertEqual(newsletter.importar(registros, tamanho_lote=2), {'lidos': 5, 'invalidos': 2, 'novos': 1})
+        self.assertEqual(Usuario.objects.get(email='ana@exemplo.com').nome, 'Ana')
+
+    def test_csv_e_jsonl(self):
+        csv = StringIO('Email,Nome\nb@exemplo.com,Bia\n')
+        jsonl = StringIO('{"email": "c@exemplo.com"}\nnão é json\n[1]\n\n')
+        self.assertEqual(newsletter.importar(newsletter.ler_csv(csv))['novos'], 1)
+        self.assertEqual(newsletter.importar(newsletter.ler_jsonl(jsonl)), {'lidos': 3, 'invalidos': 2, 'novos': 1})
+
+    def test_reimportar_nao_reinscreve_descadastrado(self):
+        newsletter.importar([{'email': 'a@exemplo.com'}])
+        self.assertTrue(newsletter.descadastrar('a@exemplo.com'))
+        self.assertFalse(newsletter.descadastrar('a@exemplo.com'))
+        newsletter.importar([{'email': 'A@exemplo.com'}])
+        self.assertIsNotNone(Usuario.objects.get(email='a@exemplo.com').descadastrado_em)
+        self.assertEqual(list(newsletter.lotes_de_assinantes(0, 10)), [])
+
+
+class NewsletterEnvioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        autor = User.objects.create_user('autor')
+        cls.post = novo_post(autor, 'anuncio')
+        Usuario.objects.bulk_create([Usuario(email=f'{i}@exemplo.com', nome=str(i)) for i in range(5)])
+        cls.ids = list(Usuario.objects.order_by('id').values_list('id', flat=True))
+
+    def enviar(self, **kwargs):
+        with PoolEnvio(conexoes=1) as pool:
+            return newsletter.enviar_anuncio(self.post, pool, tamanho_lote=2, **kwargs)
+
+    def test_envia_em_lotes_com_link_de_descadastro(self):
+        checkpoints = []
+        envio = self.enviar(ao_avancar=lambda envio: checkpoints.append(envio.ultimo_usuario_id))
+        self.assertEqual(checkpoints, [self.ids[1], self.ids[3], self.ids[4]])
+        self.assertEqual((envio.enviados, envio.falhas), (5, 0))
+        self.assertIsNotNone(envio.concluido_em)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertIn('/newsletter/sair/', mail.outbox[0].extra_headers['List-Unsubscribe'])
+
+    def test_retoma_do_checkpoint(self):
+        EnvioNewsletter.objects.create(post=self.post, ultimo_usuario_id=self.ids[2], enviados=3)
+        envio = self.enviar()
+        self.assertEqual(sorted(mensagem.to[0] for mensagem in mail.outbox), ['3@exemplo.com', '4@exemplo.com'])
+        self.assertEqual(envio.enviados, 5)
+
+    def test_pula_descadastrados(self):
+        newsletter.descadastrar('0@exemplo.com')
+        self.enviar()
+        self.assertNotIn(['0@exemplo.com'], [mensagem.to for mensagem in mail.outbox])
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_envio_reservado_por_outro_processo_nao_envia(self):
+        EnvioNewsletter.objects.create(
+            post=self.post, reservado_por='outro', reservado_ate=timezone.now() + timedelta(minutes=5),
+        )
+        with self.assertRaises(newsletter.EnvioConcorrente):
+            self.enviar()
+        self.assertEqual(mail.outbox, [])
+
+    def test_reserva_vencida_e_assumida_e_liberada_no_fim(self):
+        EnvioNewsletter.objects.create(
+            post=self.post, reservado_por='morto', reservado_ate=timezone.now() - timedelta(seconds=1),
+        )
+        self.enviar()
+        envio = EnvioNewsletter.objects.get(post=self.post)
+        self.assertEqual((envio.reservado_por, envio.reservado_ate), ('', None))
+        self.assertEqual(len(mail.outbox), 5)
+
+
+class NewsletterDescadastroTests(TestCase):
+    def setUp(self):
+        Usuario.objects.create(email='a@exemplo.com', nome='A')
+        self.url = newsletter.url_descadastro('a@exemplo.com').removeprefix(settings.SITE_URL)
+
+    def test_get_so_pede_confirmacao(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Cancelar inscrição?')
+        self.assertIsNone(Usuario.objects.get().descadastrado_em)
+
+    def test_post_descadastra_sem_apagar(self):
+        response = self.client.post(self.url)
+        self.assertContains(response, 'Inscrição cancelada')
+        self.assertIsNotNone(Usuario.objects.get().descadastrado_em)
+
+    def test_token_adulterado_e_404(self):
+        url = reverse('blog:descadastrar_newsletter', args=['b@exemplo.com:abc'])
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+
+class PaginacaoComentariosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = novo_post(User.objects.create_user('autor'), 'comentado')
+        Comentario.objects.bulk_create([
+            Comentario(post=cls.post, nome=f'n{i}', email='n@exemplo.com', mensagem=f'm{i}', aprovado=i != 3)
+            for i in range(7)
+        ])
+        # Empates de criado_em: o id desempata sem pular nem repetir
+        momento = timezone.now()
+        Comentario.objects.filter(mensagem__in=['m1', 'm2', 'm4']).update(criado_em=momento)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_volta_ao_mesmo_instante(self):
+        momento = timezone.now()
+        self.assertEqual(decodificar_cursor(codificar_cursor(momento, 42)), (momento, 42))
+        for invalido in ('', 'abc', '1-x', None, '9' * 40 + '-1'):
+            self.assertIsNone(decodificar_cursor(invalido))
+
+    def test_percorre_todos_os_aprovados_sem_repetir(self):
+        vistos, cursor = [], None
+        while True:
+            pagina, proximo = pagina_comentarios(self.post.pk, decodificar_cursor(cursor) if cursor else None, limite=2)
+            vistos.extend(comentario.pk for comentario in pagina)
+            if proximo is None:
+                break
+            cursor = proximo
+        esperados = list(
+            Comentario.objects.filter(aprovado=True).order_by('-criado_em', '-pk').values_list('pk', flat=True)
+        )
+        self.assertEqual(vistos, esperados)
+        self.assertEqual(len(vistos), 6)
+
+    def test_endpoint_devolve_fragmento_e_proximo_cursor(self):
+        primeira, proximo = pagina_comentarios(self.post.pk, limite=2)
+        url = reverse('blog:comentarios_post', args=[self.post.slug])
+        with override_settings(COMMENTS_PAGE_SIZE=2):
+            dados = self.client.get(url, {'depois': proximo}).json()
+        self.assertNotIn(primeira[0].mensagem, dados['html'])
+        self.assertEqual(dados['html'].count('list-group-item'), 2)
+        self.assertIsNotNone(dados['proximo'])
+        self.assertEqual(self.client.get(url, {'depois': 'lixo'}).status_code, 400)
+
+    def test_contagem_em_cache_invalidada_por_comentario(self):
+        self.assertEqual(contar_aprovados(self.post.pk), 6)
+        with self.assertNumQueries(0):
+            contar_aprovados(self.post.pk)
+        Comentario.objects.create(post=self.post, nome='x', email='x@exemplo.com', mensagem='novo', aprovado=True)
+        self.assertEqual(contar_aprovados(self.post.pk), 7)
+
+
+class LimiteComentariosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = novo_post(User.objects.create_user('autor'), 'limitado')
+        cls.url = reverse('blog:detalhe_post', args=[cls.post.slug])
+
+    def setUp(self):
+        cache.clear()
+
+    def comentar(self, n, **extra):
+        dados = {'nome': 'Ana', 'email': 'ana@exemplo.com', 'mensagem': f'Comentário {n}'}
+        return self.client.post(self.url, dados, **extra)
+
+    def test_rajada_por_ip_e_depois_429(self):
+        for n in range(limite_por_ip.rajada):
+            self.assertEqual(self.comentar(n).status_code, 302)
+        response = self.comentar('extra')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(Comentario.objects.count(), limite_por_ip.rajada)
+
+    def test_sem_proxy_x_forwarded_for_nao_troca_o_ip(self):
+        for n in range(limite_por_ip.rajada):
+            self.comentar(n, HTTP_X_FORWARDED_FOR=f'10.0.0.{n}')
+        self.assertEqual(self.comentar('extra', HTTP_X_FORWARDED_FOR='10.9.9.9').status_code, 429)
+
+    def test_duplicado_e_spam_sao_descartados_em_silencio(self):
+        self.assertIsNone(motivo_rejeicao(self.post.pk, 'Olá   mundo'))
+        self.assertEqual(motivo_rejeicao(self.post.pk, 'olá mundo'), 'duplicado')
+        with override_settings(COMMENTS_MAX_LINKS=2):
+            self.assertEqual(motivo_rejeicao(self.post.pk, 'http://a http://b http://c'), 'spam')
+
+    def test_balde_repoe_fichas_com_o_tempo(self):
+        balde = BaldeTokens('teste', por_minuto=60, rajada=1)
+        with mock.patch('blog.throttling.time.time', return_value=1000.0):
+            self.assertTrue(balde.consumir('x'))
+            self.assertFalse(balde.consumir('x'))
+            # Arredonda para cima: nunca manda voltar antes da ficha existir
+            self.assertIn(balde.espera('x'), (1, 2))
+        with mock.patch('blog.throttling.time.time', return_value=1001.5):
+            self.assertTrue(balde.consumir('x'))
+
+
+class IpDoClienteTests(TestCase):
+    def ip(self, saltos, encaminhado):
+        request = RequestFactory().get('/', REMOTE_ADDR='192.0.2.1', HTTP_X_FORWARDED_FOR=encaminhado)
+        with override_settings(TRUSTED_PROXY_HOPS=saltos):
+            return ip_do_cliente(request)
+
+    def test_sem_proxy_usa_remote_addr(self):
+        self.assertEqual(self.ip(0, '1.1.1.1'), '192.0.2.1')
+
+    def test_le_o_salto_do_proxy_confiavel(self):
+        # forjado pelo cliente, cliente real, proxy de borda
+        cabecalho = '6.6.6.6, 203.0.113.7, 10.0.0.2'
+        self.assertEqual(self.ip(1, cabecalho), '10.0.0.2')
+        self.assertEqual(self.ip(2, cabecalho), '203.0.113.7')
+
+    def test_menos_entradas_que_saltos_usa_a_mais_a_esquerda(self):
+        self.assertEqual(self.ip(3, '203.0.113.7'), '203.0.113.7')
+        self.assertEqual(self.ip(2, ''), '192.0.2.1')
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=60)
+class CascaFragmentosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.autor = User.objects.create_user('autor', password='senha-de-teste')
+        cls.post = novo_post(cls.autor, 'em-cache')
+        cls.outro = novo_post(cls.autor, 'vizinho')
+        cls.url = reverse('blog:detalhe_post', args=[cls.post.slug])
+
+    def setUp(self):
+        cache.clear()
+
+    def versoes(self):
+        grupos = [fragmentos.GRUPO_LISTAS, fragmentos.grupo_do_post('em-cache'), fragmentos.grupo_do_post('vizinho')]
+        return dict(zip(grupos, map(fragmentos.versao_paginas, grupos)))
+
+    def grupos_invalidados(self, acao):
+        antes = self.versoes()
+        acao()
+        depois = self.versoes()
+        return {grupo for grupo in antes if antes[grupo] != depois[grupo]}
+
+    def test_uma_casca_serve_anonimo_e_autor_com_fragmentos_proprios(self):
+        with mock.patch.object(
+            PostDetailView, 'get_context_data', autospec=True, side_effect=PostDetailView.get_context_data,
+        ) as renderizar:
+            anonimo = self.client.get(self.url).content.decode()
+            self.client.login(username='autor', password='senha-de-teste')
+            autor = self.client.get(self.url).content.decode()
+        self.assertEqual(renderizar.call_count, 1)
+        self.assertNotIn('Excluir Post', anonimo)
+        self.assertNotIn('title="Dashboard"', anonimo)
+        self.assertIn('Excluir Post', autor)
+        self.assertIn('title="Dashboard"', autor)
+        self.assertNotIn('velora:fragmento', anonimo + autor)
+
+    def test_so_os_marcadores_da_renderizacao_sao_trocados(self):
+        nonce = fragmentos.novo_nonce()
+        request = RequestFactory().get('/')
+        request.user = self.autor
+        html = ' | '.join([
+            fragmentos.marcador(nonce, 'controles_autor', [self.post.pk, self.autor.pk]),
+            fragmentos.marcador('outro', 'controles_autor', [self.post.pk, self.autor.pk]),
+            fragmentos.marcador(nonce, 'inexistente', []),
+            fragmentos.marcador(nonce, 'controles_autor', [self.post.pk]),
+        ])
+        with self.assertLogs('blog.fragmentos', 'WARNING'):
+            partes = fragmentos.substituir_fragmentos(html, request, nonce).split(' | ')
+        self.assertIn('Excluir Post', partes[0])
+        self.assertEqual(partes[1], fragmentos.marcador('outro', 'controles_autor', [self.post.pk, self.autor.pk]))
+        self.assertEqual(partes[2:], ['', ''])
+
+    def test_comentario_invalida_so_o_post_comentado(self):
+        invalidados = self.grupos_invalidados(lambda: Comentario.objects.create(
+            post=self.post, nome='a', email='a@exemplo.com', mensagem='oi', aprovado=True,
+        ))
+        self.assertEqual(invalidados, {'post:em-cache'})
+
+    def test_edicao_de_post_publicado_invalida_ele_e_as_listas(self):
+        def editar():
+            self.post.titulo = 'Novo título'
+            self.post.save()
+        self.assertEqual(self.grupos_invalidados(editar), {'listas', 'post:em-cache'})
+
+    def test_rascunho_e_agendado_nao_invalidam(self):
+        def rascunhos():
+            rascunho = novo_post(self.autor, 'rascunho', publicado_em=None)
+            rascunho.conteudo = 'autosave'
+            rascunho.save()
+            novo_post(self.autor, 'agendado', publicado_em=timezone.now() + timedelta(days=1))
+        self.assertEqual(self.grupos_invalidados(rascunhos), set())
+
+    def test_cabecalhos_da_view_sobrevivem_ao_cache(self):
+        original = PostDetailView.render_to_response
+
+        def com_cabecalhos(view, context, **kwargs):
+            response = original(view, context, **kwargs)
+            patch_cache_control(response, max_age=30)
+            patch_vary_headers(response, ['Accept-Language'])
+            return response
+
+        with mock.patch.object(PostDetailView, 'render_to_response', com_cabecalhos):
+            respostas = [self.client.get(self.url) for _ in range(2)]
+        for response in respostas:
+            self.assertEqual(response['Cache-Control'], 'max-age=30')
+            self.assertIn('Accept-Language', response['Vary'])
+
+
+@override_settings(REVISIONS_SNAPSHOT_INTERVAL=3)
+class RevisoesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.autor = User.objects.create_user('autor')
+        # Linhas pouco compressíveis: o delta precisa compensar frente ao snapshot
+        cls.base = ''.join(
+            f'Parágrafo {i} do texto original {hashlib.sha256(str(i).encode()).hexdigest()}.\n'
+            for i in range(40)
+        )
+
+    def setUp(self):
+        self.post = novo_post(self.autor, 'revisado', conteudo=self.base)
+
+    def revisar(self, conteudo):
+        self.post.conteudo = conteudo
+        return registrar_revisao(self.post, self.autor)
+
+    def test_delta_ida_e_volta(self):
+        novo = self.base.replace('Parágrafo 7', 'Parágrafo sete') + 'Fim sem quebra'
+        self.assertEqual(aplicar_delta(self.base, calcular_delta(self.base, novo)), novo)
+        self.assertEqual(aplicar_delta(self.base, calcular_delta(self.base, '')), '')
+
+    def test_snapshot_e_deltas_reconstroem_cada_revisao(self):
+        versoes = [self.base]
+        for i in range(1, 6):
+            versoes.append(versoes[-1].replace(f'Parágrafo {i} ', f'Parágrafo {i} editado '))
+        revisoes = [self.revisar(conteudo) for conteudo in versoes]
+        # A cada 3 revisões um snapshot novo; as demais são deltas dele
+        self.assertEqual([revisao.base_id is None for revisao in revisoes], [True, False, False, True, False, False])
+        self.assertEqual(revisoes[2].base_id, revisoes[0].pk)
+        for revisao, conteudo in zip(revisoes, versoes):
+            self.assertEqual(conteudo_da_revisao(revisao), conteudo)
+        self.assertLess(len(revisoes[1].dados), len(revisoes[0].dados))
+
+    def test_sem_mudanca_nao_cria_revisao(self):
+        self.assertIsNotNone(self.revisar(self.base))
+        self.assertIsNone(self.revisar(self.base))
+
+    def test_comparar_marca_linhas(self):
+        antes = self.revisar(self.base)
+        depois = self.revisar(self.base.replace('Parágrafo 3 do', 'Parágrafo 3 novo do'))
+        linhas = comparar(antes, depois)
+        removida = next(linha for linha in self.base.splitlines() if linha.startswith('Parágrafo 3 '))
+        self.assertIn(('removida', f'-{removida}'), linhas)
+        self.assertIn(('adicionada', '+' + removida.replace('Parágrafo 3 do', 'Parágrafo 3 novo do')), linhas)
+
+    def test_poda_preserva_snapshot_em_uso(self):
+        for i in range(5):
+            self.revisar(self.base + f'Linha {i}\n')
+        removidas = podar_revisoes(manter=1, antes_de=timezone.now() + timedelta(seconds=1))
+        restantes = list(self.post.revisoes.order_by('numero'))
+        # Fica a última (delta) e o snapshot de que ela depende
+        self.assertEqual([revisao.numero for revisao in restantes], [4, 5])
+        self.assertEqual(removidas, 3)
+        self.assertEqual(conteudo_da_revisao(restantes[-1]), self.base + 'Linha 4\n')
+
+
+class AutosaveRascunhoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.autor = User.objects.create_user('autor')
+
+    def setUp(self):
+        self.client.force_login(self.autor)
+        self.rascunho = criar_rascunho(self.autor, {'titulo': 'Rascunho', 'conteudo': 'Primeira versão'})
+
+    def salvar(self, versao, **campos):
+        url = reverse('blog:autosave_rascunho', args=[self.rascunho.pk])
+        return self.client.post(url, {'versao': versao, 'campos': campos}, content_type='application/json')
+
+    def test_patch_parcial_avanca_a_versao(self):
+        response = self.salvar(self.rascunho.versao, conteudo='Segunda versão')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['versao'], self.rascunho.versao + 1)
+        self.rascunho.refresh_from_db()
+        self.assertEqual((self.rascunho.titulo, self.rascunho.conteudo), ('Rascunho', 'Segunda versão'))
+
+    def test_versao_antiga_devolve_conflito_sem_sobrescrever(self):
+        versao = self.rascunho.versao
+        self.salvar(versao, conteudo='Da primeira janela')
+        response = self.salvar(versao, conteudo='Da segunda janela')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['versao'], versao + 1)
+        self.rascunho.refresh_from_db()
+        self.assertEqual(self.rascunho.conteudo, 'Da primeira janela')
+
+    def test_rascunho_publicado_nao_aceita_autosave(self):
+        Post.objects.filter(pk=self.rascunho.pk).update(publicado_em=timezone.now())
+        with self.assertRaises(ConflitoVersao):
+            salvar_rascunho(self.rascunho, self.rascunho.versao, {'conteudo': 'Tarde demais'}, self.autor)
+
+    def test_patch_vazio_nao_grava(self):
+        versao = self.rascunho.versao
+        self.assertEqual(salvar_rascunho(self.rascunho, versao, {}, self.autor), versao)
+        self.rascunho.refresh_from_db()
+        self.assertEqual(self.rascunho.versao, versao)
+
+    def test_titulo_invalido_e_400(self):
+        response = self.salvar(self.rascunho.versao, titulo='   ')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cria_rascunho_pela_api(self):
+        response = self.client.post(
+            reverse('blog:criar_rascunho'), {'campos': {'titulo': 'Rascunho'}}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        post = Post.objects.get(pk=response.json()['id'])
+        self.assertIsNone(post.publicado_em)
+        self.assertEqual(post.slug, 'rascunho-1')
+
+
+class ArquivoMensalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.autor = User.objects.create_user('autor')
+
+    def setUp(self):
+        cache.clear()
+
+    def em(self, ano, mes, dia=15):
+        return timezone.make_aware(datetime(ano, mes, dia, 12))
+
+    def meses(self):
+        return {(mes.year, mes.month): total for grupo in arquivo.histograma() for mes, total in grupo['meses']}
+
+    def test_publicacao_e_remocao_atualizam_o_histograma(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            novo_post(self.autor, 'janeiro', publicado_em=self.em(2025, 1))
+            novo_post(self.autor, 'janeiro-2', publicado_em=self.em(2025, 1))
+            ultimo = novo_post(self.autor, 'marco', publicado_em=self.em(2025, 3))
+        self.assertEqual(self.meses(), {(2025, 1): 2, (2025, 3): 1})
+        self.assertEqual(arquivo.histograma()[0]['total'], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            ultimo.delete()
+        # O mês que zera some do widget
+        self.assertEqual(self.meses(), {(2025, 1): 2})
+
+    def test_mudanca_de_data_move_o_post_de_mes(self):
+        post = novo_post(self.autor, 'movido', publicado_em=self.em(2024, 12))
+        post.publicado_em = self.em(2025, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self.meses(), {(2025, 2): 1})
+
+    def test_despublicar_e_agendar_tiram_do_histograma(self):
+        post = novo_post(self.autor, 'despublicado', publicado_em=self.em(2025, 5))
+        novo_post(self.autor, 'futuro', publicado_em=timezone.now() + timedelta(days=3))
+        post.publicado_em = None
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self.meses(), {})
+
+    def test_mes_usa_o_fuso_do_site(self):
+        # 01/03 01:00 UTC ainda é fevereiro em São Paulo
+        novo_post(self.autor, 'virada', publicado_em=datetime(2025, 3, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.meses(), {(2025, 2): 1})
+        self.assertEqual(len(arquivo.posts_do_periodo(2025, 2)[0]), 1)
+        self.assertEqual(len(arquivo.posts_do_periodo(2025, 3)[0]), 0)
+
+    def test_reconstruir_bate_com_o_incremental(self):
+        for i, mes in enumerate([1, 1, 4, 7]):
+            novo_post(self.autor, f'post-{i}', publicado_em=self.em(2023, mes))
+        incremental = self.meses()
+        self.assertEqual(arquivo.reconstruir(), 3)
+        self.assertEqual(self.meses(), incremental)
+
+
+class PublicacaoAgendadaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.autor = User.objects.create_user('autor')
+
+    def setUp(self):
+        cache.clear()
+        self.post = novo_post(self.autor, 'agendado', publicado_em=timezone.now() + timedelta(hours=1))
+
+    def vencer(self):
+        # Simula a passagem do tempo sem passar pelos sinais
+        Post.objects.filter(pk=self.post.pk).update(publicado_em=timezone.now() - timedelta(minutes=1))
+
+    def test_agendado_fica_fora_do_ar_ate_vencer(self):
+        self.assertFalse(self.post.publicacao_processada)
+        self.assertFalse(NewPost.objects.filter(post=self.post).exists())
+        self.assertFalse(ArquivoMensal.objects.exists())
+        self.assertEqual(self.client.get(self.post.get_absolute_url()).status_code, 404)
+        self.assertEqual(agendamento.publicar_vencidos(), [])
+
+    def test_publicar_vencidos_aplica_os_efeitos_uma_vez(self):
+        self.vencer()
+        publicados = agendamento.publicar_vencidos()
+        self.assertEqual([post.pk for post in publicados], [self.post.pk])
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.publicacao_processada)
+        self.assertTrue(NewPost.objects.filter(post=self.post).exists())
+        self.assertEqual(ArquivoMensal.objects.get().total, 1)
+        self.assertEqual(self.client.get(self.post.get_absolute_url()).status_code, 200)
+        # Uma segunda rodada não encontra nada a publicar
+        self.assertEqual(agendamento.publicar_vencidos(), [])
+        self.assertEqual(ArquivoMensal.objects.get().total, 1)
+
+    def test_respeita_o_lote_e_a_ordem(self):
+        outro = novo_post(self.autor, 'outro', publicado_em=timezone.now() + timedelta(hours=1))
+        Post.objects.filter(pk=outro.pk).update(publicado_em=timezone.now() - timedelta(minutes=5))
+        self.vencer()
+        self.assertEqual([post.pk for post in agendamento.publicar_vencidos(lote=1)], [outro.pk])
+        self.assertEqual([post.pk for post in agendamento.publicar_vencidos(lote=1)], [self.post.pk])
+
+    def test_paginas_afetadas(self):
+        self.vencer()
+        self.post.refresh_from_db()
+        ano, mes = arquivo.mes_de(self.post.publicado_em)
+        self.assertEqual(agendamento.paginas_afetadas([self.post]), sorted({
+            reverse('blog:lista_posts'),
+            self.post.get_absolute_url(),
+            self.post.categoria.get_absolute_url(),
+            reverse('blog:arquivo_ano', args=[ano]),
+            reverse('blog:arquivo_mes', args=[ano, mes]),
+        }))
+
+    def test_comando_publica_e_aquece(self):
+        self.vencer()
+        saida = StringIO()
+        # O comando regenera feeds e sitemaps pendentes em disco
+        with tempfile.TemporaryDirectory() as raiz, override_settings(SYNDICATION_ROOT=raiz):
+            call_command('publicar_agendados', stdout=saida)
+        self.assertIn('1 post(s) publicado(s)', saida.getvalue())
+        self.assertTrue(Post.objects.get(pk=self.post.pk).publicacao_processada)
+
+
+class BlobsMidiaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.autor = User.objects.create_user('autor')
+
+    def setUp(self):
+        raiz = tempfile.TemporaryDirectory()
+        self.addCleanup(raiz.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=raiz.name, MEDIA_ORPHAN_GRACE=0)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def com_imagem(self, slug, conteudo=b'mesma imagem', nome='foto.PNG'):
+        return novo_post(self.autor, slug, imagem=ContentFile(conteudo, name=nome))
+
+    def existe(self, nome):
+        return armazenamento.armazenamento_midia().exists(nome)
+
+    def test_conteudo_igual_vira_um_blob_com_duas_referencias(self):
+        primeiro = self.com_imagem('primeiro')
+        segundo = self.com_imagem('segundo', nome='outra.png')
+        self.assertEqual(primeiro.imagem.name, segundo.imagem.name)
+        digest = hashlib.sha256(b'mesma imagem').hexdigest()
+        self.assertEqual(primeiro.imagem.name, armazenamento.nome_do_blob(digest, '.png'))
+        blob = BlobMidia.objects.get()
+        self.assertEqual((blob.referencias, blob.tamanho), (2, len(b'mesma imagem')))
+
+    def test_blob_so_some_sem_referencias(self):
+        primeiro = self.com_imagem('primeiro')
+        segundo = self.com_imagem('segundo')
+        nome = primeiro.imagem.name
+        with self.captureOnCommitCallbacks(execute=True):
+            primeiro.delete()
+        self.assertTrue(self.existe(nome))
+        self.assertEqual(BlobMidia.objects.get().referencias, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            segundo.delete()
+        self.assertFalse(self.existe(nome))
+        self.assertFalse(BlobMidia.objects.exists())
+
+    def test_trocar_imagem_solta_a_anterior(self):
+        post = self.com_imagem('trocado', b'antiga')
+        antiga = post.imagem.name
+        post.imagem = ContentFile(b'nova', name='nova.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertFalse(self.existe(antiga))
+        self.assertEqual(BlobMidia.objects.get().referencias, 1)
+
+    def test_upload_recente_sobrevive_sem_referencias(self):
+        post = self.com_imagem('recente')
+        nome = post.imagem.name
+        with override_settings(MEDIA_ORPHAN_GRACE=3600), self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        # Um autor pode estar prestes a salvar um post com o mesmo arquivo
+        self.assertTrue(self.existe(nome))
+        self.assertEqual(BlobMidia.objects.get().referencias, 0)
+
+    def test_arquivos_fora_de_blobs_sao_ignorados(self):
+        armazenamento.referenciar('posts/2020/01/01/antiga.png')
+        armazenamento.soltar('posts/2020/01/01/antiga.png')
+        self.assertFalse(BlobMidia.objects.exists())
+
+
+class ServirMidiaTests(TestCase):
+    conteudo = bytes(range(100))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.autor = User.objects.create_user('autor')
+
+    def setUp(self):
+        raiz = tempfile.TemporaryDirectory()
+        self.addCleanup(raiz.cleanup)
+        configuracao = override_settings(MEDIA_ROOT=raiz.name, MEDIA_SERVE_MODE='django')
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        for nome in ('site/video.bin', 'site/.oculto', 'posts/rascunho.png'):
+            caminho = Path(raiz.name, nome)
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            caminho.write_bytes(self.conteudo)
+        self.url = reverse('midia', args=['site/video.bin'])
+
+    def baixar(self, url=None, **cabecalhos):
+        response = self.client.get(url or self.url, headers=cabecalhos)
+        corpo = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, corpo
+
+    def test_arquivo_inteiro_com_validadores(self):
+        response, corpo = self.baixar()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(corpo, self.conteudo)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        response, _ = self.baixar(If_None_Match=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_trechos(self):
+        trechos = [('bytes=10-19', 10, 19), ('bytes=90-', 90, 99), ('bytes=-5', 95, 99), ('bytes=95-500', 95, 99)]
+        for pedido, inicio, fim in trechos:
+            with self.subTest(pedido):
+                response, corpo = self.baixar(Range=pedido)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(corpo, self.conteudo[inicio:fim + 1])
+                self.assertEqual(response['Content-Range'], f'bytes {inicio}-{fim}/100')
+                self.assertEqual(response['Content-Length'], str(fim - inicio + 1))
+
+    def test_trecho_fora_do_arquivo_e_416(self):
+        for pedido in ('bytes=100-', 'bytes=-0', 'bytes=20-10'):
+            with self.subTest(pedido):
+                response, _ = self.baixar(Range=pedido)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_varios_trechos_recebem_o_arquivo_inteiro(self):
+        response, corpo = self.baixar(Range='bytes=0-1,5-6')
+        self.assertEqual((response.status_code, corpo), (200, self.conteudo))
+
+    def test_if_range(self):
+        etag = self.baixar()[0]['ETag']
+        response, corpo = self.baixar(Range='bytes=0-9', If_Range=etag)
+        self.assertEqual((response.status_code, corpo), (206, self.conteudo[:10]))
+        # Validador de outra versão: o trecho não serve, vai o arquivo inteiro
+        response, corpo = self.baixar(Range='bytes=0-9', If_Range='"outra-versao"')
+        self.assertEqual((response.status_code, corpo), (200, self.conteudo))
+
+    def test_imagem_de_rascunho_so_para_o_autor(self):
+        novo_post(self.autor, 'rascunho', publicado_em=None, imagem='posts/rascunho.png')
+        url = reverse('midia', args=['posts/rascunho.png'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(User.objects.create_user('leitor'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.client.force_login(self.autor)
+        response, corpo = self.baixar(url)
+        self.assertEqual((response.status_code, corpo), (200, self.conteudo))
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_caminhos_invalidos_sao_404(self):
+        for nome in ('../settings.py', 'site/inexistente.bin', 'site/.oculto'):
+            with self.subTest(nome):
+                self.assertEqual(self.client.get(reverse('midia', args=[nome])).status_code, 404)
+
+    @override_settings(MEDIA_SERVE_MODE='x-accel', MEDIA_ACCEL_PREFIX='/protegido/')
+    def test_x_accel_delega_ao_proxy(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-9'})
+        self.assertEqual(response['X-Accel-Redirect'], '/protegido/site/video.bin')
+        self.assertEqual(response.content, b'')
+
+
+class DisponibilidadeEmailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user('Ana', 'Ana@Exemplo.com')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('blog:check_email')
+
+    def checar(self, dados, **extra):
+        return self.client.post(self.url, dados, content_type='application/json', **extra)
+
+    def test_compara_sem_diferenciar_caixa(self):
+        self.assertTrue(disponibilidade.email_em_uso('  ana@exemplo.COM '))
+        self.assertTrue(disponibilidade.username_em_uso('ANA'))
+        self.assertFalse(disponibilidade.email_em_uso('bia@exemplo.com'))
+
+    def test_so_a_resposta_livre_vai_para_o_cache(self):
+        with self.assertNumQueries(1):
+            self.assertFalse(disponibilidade.email_em_uso('bia@exemplo.com'))
+        with self.assertNumQueries(0):
+            self.assertFalse(disponibilidade.email_em_uso('Bia@exemplo.com'))
+        # Ocupado sempre confere no banco; o formulário ignora o cache
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.assertTrue(disponibilidade.email_em_uso('ana@exemplo.com'))
+        with self.assertNumQueries(1):
+            disponibilidade.email_em_uso('bia@exemplo.com', usar_cache=False)
+
+    def test_cadastro_apaga_o_livre_do_cache(self):
+        self.assertFalse(disponibilidade.email_em_uso('bia@exemplo.com'))
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user('bia', 'bia@exemplo.com')
+        self.assertTrue(disponibilidade.email_em_uso('bia@exemplo.com'))
+
+    def test_lote_numa_consulta(self):
+        with self.assertNumQueries(1):
+            response = self.checar({'emails': ['ana@exemplo.com', 'bia@exemplo.com', ' bia@exemplo.com']})
+        self.assertEqual(response.json(), {'resultados': {'ana@exemplo.com': True, 'bia@exemplo.com': False}})
+        with override_settings(SIGNUP_CHECK_BATCH_SIZE=1):
+            self.assertEqual(self.checar({'emails': ['a@exemplo.com', 'b@exemplo.com']}).status_code, 400)
+
+    def test_endpoint_de_um_email(self):
+        response = self.checar({'email': 'ANA@exemplo.com'})
+        self.assertEqual(response.json(), {'email': 'ANA@exemplo.com', 'exists': True})
+        self.assertEqual(self.checar({'email': ' '}).status_code, 400)
+
+    def test_limite_por_ip_antes_do_banco(self):
+        balde = BaldeTokens('disponibilidade:ip', 3)
+        with mock.patch.object(disponibilidade, 'limite_por_ip', balde):
+            self.assertEqual(self.checar({'emails': ['a@exemplo.com', 'b@exemplo.com']}).status_code, 200)
+            with self.assertNumQueries(0):
+                response = self.checar({'emails': ['c@exemplo.com', 'd@exemplo.com']})
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response)
+            # Outro IP tem o próprio balde
+            self.assertEqual(self.checar({'email': 'c@exemplo.com'}, REMOTE_ADDR='10.0.0.2').status_code, 200)
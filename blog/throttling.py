@@ -0,0 +1,60 @@
+"""Limite de taxa por chave (IP, post...) guardado no cache.
+
+Token bucket: cada chave tem até `rajada` fichas, repostas a `por_minuto`
+fichas por minuto. O estado (fichas, instante) fica no cache padrão, então
+vale entre processos quando o cache é compartilhado (Redis, Memcached). A
+leitura e a escrita não são atômicas: sob concorrência alta algumas
+requisições a mais podem passar, o que é aceitável para conter abuso.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class BaldeTokens:
+    def __init__(self, prefixo, por_minuto, rajada=None):
+        self.prefixo = prefixo
+        self.por_segundo = por_minuto / 60
+        self.rajada = rajada or max(1, int(por_minuto))
+
+    def _chave(self, chave):
+        return f'limite:{self.prefixo}:{chave}'
+
+    def consumir(self, chave, fichas=1):
+        """Tenta gastar `fichas`; retorna False se a chave estourou o limite."""
+        if not self.por_segundo:
+            return True
+        agora = time.time()
+        disponiveis, atualizado_em = cache.get(self._chave(chave), (self.rajada, agora))
+        disponiveis = min(self.rajada, disponiveis + (agora - atualizado_em) * self.por_segundo)
+        permitido = disponiveis >= fichas
+        if permitido:
+            disponiveis -= fichas
+        # Expira quando o balde estaria cheio de novo; chaves ociosas somem
+        expira = int((self.rajada - disponiveis) / self.por_segundo) + 1
+        cache.set(self._chave(chave), (disponiveis, agora), expira)
+        return permitido
+
+    def espera(self, chave):
+        """Segundos até haver uma ficha para a chave (para o Retry-After)."""
+        disponiveis, atualizado_em = cache.get(self._chave(chave), (self.rajada, time.time()))
+        disponiveis += (time.time() - atualizado_em) * self.por_segundo
+        return max(0, int((1 - disponiveis) / self.por_segundo) + 1) if self.por_segundo else 0
+
+
+def ip_do_cliente(request):
+    """IP usado nos limites por IP.
+
+    Sem proxy (`TRUSTED_PROXY_HOPS = 0`) é o REMOTE_ADDR. Atrás de N proxies
+    confiáveis, cada um acrescenta à direita do X-Forwarded-For o IP de quem
+    o chamou: o cliente é a N-ésima entrada a partir da direita. As entradas
+    mais à esquerda vêm do próprio cliente e podem ser forjadas, então não
+    são lidas.
+    """
+    saltos = settings.TRUSTED_PROXY_HOPS
+    encaminhado = request.META.get('HTTP_X_FORWARDED_FOR', '') if saltos else ''
+    entradas = [entrada.strip() for entrada in encaminhado.split(',') if entrada.strip()]
+    if entradas:
+        return entradas[-min(saltos, len(entradas))]
+    return request.META.get('REMOTE_ADDR', '')
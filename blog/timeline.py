@@ -0,0 +1,223 @@
+"""Timeline "para você" montada a partir do log de eventos `NewPost`.
+
+Publicar um post grava um único evento. Cada usuário guarda só um cursor e
+as suas assinaturas, então o armazenamento é O(posts + usuários). Na leitura,
+cada fonte (um autor ou uma categoria assinada) é uma varredura de índice
+em ordem decrescente de id, e as fontes são intercaladas com `heapq.merge`.
+
+Usuários muito ativos podem ter a timeline materializada em
+`NewPostNotification`: para eles o evento é copiado na publicação
+(fan-out na escrita), limitado aos itens mais recentes. "Muito ativo" vem de
+`leituras_recentes`, somado em lote como as visualizações: abrir a timeline
+só escreve no banco quando o cursor avança, então reler a mesma timeline não
+prende o usuário ao banco principal.
+"""
+import atexit
+import heapq
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .buffers import ContadorLocal
+from .models import Assinatura, CursorTimeline, NewPost, NewPostNotification
+
+logger = logging.getLogger(__name__)
+
+# Leituras por usuário neste processo, ainda não somadas em leituras_recentes
+_leituras = ContadorLocal(
+    intervalo=settings.VIEW_COUNTER_FLUSH_INTERVAL,
+    limite=settings.VIEW_COUNTER_FLUSH_SIZE,
+)
+
+
+def registrar_evento(post):
+    """Grava o evento de publicação do post (uma vez) e faz o fan-out materializado."""
+    evento, criado = NewPost.objects.get_or_create(
+        post=post,
+        defaults={'author_id': post.autor_id, 'category_id': post.categoria_id},
+    )
+    if not criado:
+        if evento.category_id != post.categoria_id:
+            NewPost.objects.filter(pk=evento.pk).update(category_id=post.categoria_id)
+        return evento
+    transaction.on_commit(lambda: materializar_evento(evento))
+    return evento
+
+
+def remover_eventos(post):
+    NewPost.objects.filter(post=post).delete()
+
+
+def _usuarios_materializados_interessados(evento):
+    materializados = CursorTimeline.objects.filter(materializado=True)
+    com_assinaturas = Assinatura.objects.values('user_id')
+    globais = materializados.exclude(user_id__in=com_assinaturas).values_list('user_id', flat=True)
+    filtro = Q(autor_id=evento.author_id)
+    if evento.category_id:
+        filtro |= Q(categoria_id=evento.category_id)
+    assinantes = (
+        Assinatura.objects.filter(filtro, user__cursor_timeline__materializado=True)
+        .values_list('user_id', flat=True)
+    )
+    return (set(globais) | set(assinantes)) - {evento.author_id}
+
+
+def materializar_evento(evento):
+    usuarios = _usuarios_materializados_interessados(evento)
+    NewPostNotification.objects.bulk_create(
+        [NewPostNotification(post_id=evento.post_id, user_id=user_id, event=evento) for user_id in usuarios],
+        batch_size=1000,
+    )
+
+
+def _fontes(user):
+    """Querysets de eventos que compõem a timeline do usuário."""
+    assinaturas = list(Assinatura.objects.filter(user=user).values_list('autor_id', 'categoria_id'))
+    base = NewPost.objects.exclude(author_id=user.pk)
+    if not assinaturas:
+        return [base]
+    autores = [autor_id for autor_id, _ in assinaturas if autor_id]
+    categorias = [categoria_id for _, categoria_id in assinaturas if categoria_id]
+    if len(assinaturas) > settings.TIMELINE_MAX_MERGE_SOURCES:
+        # Muitas fontes: uma consulta só com OR sai mais barata que N varreduras
+        return [base.filter(Q(author_id__in=autores) | Q(category_id__in=categorias))]
+    return [base.filter(author_id=a) for a in autores] + [base.filter(category_id=c) for c in categorias]
+
+
+def _ids_intercalados(fontes, limite, antes_de=None, depois_de=None):
+    fluxos = []
+    for fonte in fontes:
+        if antes_de:
+            fonte = fonte.filter(id__lt=antes_de)
+        if depois_de:
+            fonte = fonte.filter(id__gt=depois_de)
+        fluxos.append(fonte.order_by('-id').values_list('id', flat=True)[:limite])
+    vistos = set()
+    ids = []
+    for evento_id in heapq.merge(*fluxos, reverse=True):
+        if evento_id not in vistos:
+            vistos.add(evento_id)
+            ids.append(evento_id)
+            if len(ids) == limite:
+                break
+    return ids
+
+
+def obter_cursor(user):
+    cursor, _ = CursorTimeline.objects.get_or_create(user=user)
+    return cursor
+
+
+def ler_timeline(user, limite=None, antes_de=None):
+    """Retorna (eventos, próximo cursor de paginação) da timeline do usuário."""
+    limite = limite or settings.TIMELINE_PAGE_SIZE
+    cursor = obter_cursor(user)
+    if cursor.materializado:
+        itens = NewPostNotification.objects.filter(user=user, event__isnull=False)
+        if antes_de:
+            itens = itens.filter(event_id__lt=antes_de)
+        ids = list(itens.order_by('-event_id').values_list('event_id', flat=True)[:limite])
+    else:
+        ids = _ids_intercalados(_fontes(user), limite, antes_de=antes_de)
+    eventos = list(
+        NewPost.objects.filter(id__in=ids)
+        .select_related('post', 'post__autor', 'post__categoria')
+        .order_by('-id')
+    )
+    proximo = eventos[-1].id if len(eventos) == limite else None
+    return eventos, proximo
+
+
+def marcar_como_lida(cursor, eventos):
+    """Conta a leitura e avança o cursor até o evento mais novo exibido.
+
+    O UPDATE só acontece se há evento depois do cursor, e é condicionado ao
+    valor gravado: duas abas abertas juntas nunca fazem o cursor voltar.
+    """
+    if _leituras.adicionar(cursor.user_id):
+        descarregar_leituras()
+    if eventos and eventos[0].id > cursor.ultimo_evento_id:
+        CursorTimeline.objects.filter(pk=cursor.pk, ultimo_evento_id__lt=eventos[0].id).update(
+            ultimo_evento_id=eventos[0].id, lido_em=timezone.now(),
+        )
+
+
+def descarregar_leituras():
+    """Soma as leituras deste processo em `leituras_recentes`, um UPDATE por
+    quantidade distinta. Retorna o total de leituras gravadas."""
+    contagens = _leituras.drenar()
+    por_quantidade = defaultdict(list)
+    for user_id, n in contagens.items():
+        por_quantidade[n].append(user_id)
+    try:
+        with transaction.atomic():
+            for n, user_ids in por_quantidade.items():
+                CursorTimeline.objects.filter(user_id__in=user_ids).update(
+                    leituras_recentes=F('leituras_recentes') + n,
+                )
+    except DatabaseError:
+        logger.exception('Falha ao gravar leituras da timeline')
+        _leituras.devolver(contagens)
+        return 0
+    return sum(contagens.values())
+
+
+def assinar(user, autor=None, categoria=None):
+    Assinatura.objects.get_or_create(user=user, autor=autor, categoria=categoria)
+    _reconstruir_se_materializado(user)
+
+
+def cancelar_assinatura(user, autor=None, categoria=None):
+    Assinatura.objects.filter(user=user, autor=autor, categoria=categoria).delete()
+    _reconstruir_se_materializado(user)
+
+
+def _reconstruir_se_materializado(user):
+    if CursorTimeline.objects.filter(user=user, materializado=True).exists():
+        materializar_usuario(user)
+
+
+def materializar_usuario(user):
+    """Preenche a timeline materializada do usuário com os eventos mais recentes."""
+    maximo = settings.TIMELINE_MATERIALIZED_MAX_ITEMS
+    ids = _ids_intercalados(_fontes(user), maximo)
+    eventos = NewPost.objects.filter(id__in=ids).values_list('id', 'post_id')
+    with transaction.atomic():
+        NewPostNotification.objects.filter(user=user).delete()
+        NewPostNotification.objects.bulk_create(
+            [NewPostNotification(post_id=post_id, user=user, event_id=evento_id) for evento_id, post_id in eventos],
+            batch_size=1000,
+        )
+        CursorTimeline.objects.filter(user=user).update(materializado=True)
+
+
+def desmaterializar_usuario(user_id):
+    with transaction.atomic():
+        NewPostNotification.objects.filter(user_id=user_id).delete()
+        CursorTimeline.objects.filter(user_id=user_id).update(materializado=False)
+
+
+def podar_materializados(user_id):
+    """Mantém só os `TIMELINE_MATERIALIZED_MAX_ITEMS` itens mais recentes."""
+    maximo = settings.TIMELINE_MATERIALIZED_MAX_ITEMS
+    corte = list(
+        NewPostNotification.objects.filter(user_id=user_id)
+        .order_by('-event_id')
+        .values_list('event_id', flat=True)[maximo:maximo + 1]
+    )
+    if corte:
+        NewPostNotification.objects.filter(user_id=user_id, event_id__lte=corte[0]).delete()
+
+
+def _descarregar_ao_sair():
+    try:
+        descarregar_leituras()
+    except Exception:
+        logger.exception('Falha ao descarregar leituras da timeline no encerramento')
+
+
+atexit.register(_descarregar_ao_sair)
@@ -0,0 +1,116 @@
+"""Uploads retomáveis em blocos para imagens grandes do editor.
+
+O navegador abre uma sessão (`iniciar`), envia o arquivo em blocos com
+`Content-Range: bytes inicio-fim/total` e, se a conexão cair, pergunta quanto
+já chegou e continua dali. Cada bloco é gravado na posição indicada (repetir
+um bloco não corrompe nada) e `recebido` só avança com um UPDATE condicionado
+ao valor anterior. No último bloco o arquivo é validado como imagem e vai
+para o storage endereçado por conteúdo (blog.armazenamento); o formulário do
+post envia só o nome do blob.
+"""
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .armazenamento import armazenamento_midia
+from .models import UploadParcial
+
+EXTENSOES = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+PADRAO_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadInvalido(Exception):
+    pass
+
+
+class ForaDeOrdem(Exception):
+    def __init__(self, recebido):
+        super().__init__(recebido)
+        self.recebido = recebido
+
+
+def caminho_parcial(upload):
+    return Path(settings.MEDIA_PARTIAL_ROOT) / f'{upload.pk}.part'
+
+
+def iniciar(usuario, nome, tamanho):
+    extensao = Path(nome).suffix.lower()
+    if extensao not in EXTENSOES:
+        raise UploadInvalido('Formato de imagem não suportado')
+    if not 0 < tamanho <= settings.MEDIA_MAX_UPLOAD_SIZE:
+        raise UploadInvalido('Arquivo vazio ou grande demais')
+    upload = UploadParcial.objects.create(usuario=usuario, nome=Path(nome).name[:255], tamanho=tamanho)
+    caminho = caminho_parcial(upload)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.touch()
+    return upload
+
+
+def receber_bloco(upload, content_range, corpo):
+    """Grava o bloco lido de `corpo` (file-like) e retorna o upload atualizado.
+
+    Levanta ForaDeOrdem se o bloco não começa onde o anterior terminou.
+    """
+    encontrado = PADRAO_RANGE.match(content_range or '')
+    if not encontrado:
+        raise UploadInvalido('Content-Range inválido')
+    inicio, fim, total = (int(parte) for parte in encontrado.groups())
+    if total != upload.tamanho or fim < inicio or fim >= total:
+        raise UploadInvalido('Content-Range inválido')
+    if fim - inicio + 1 > settings.MEDIA_UPLOAD_CHUNK_SIZE:
+        raise UploadInvalido('Bloco grande demais')
+    if inicio != upload.recebido or upload.arquivo:
+        raise ForaDeOrdem(upload.recebido)
+
+    esperado = fim - inicio + 1
+    escritos = 0
+    with open(caminho_parcial(upload), 'r+b') as arquivo:
+        arquivo.seek(inicio)
+        while escritos < esperado and (bloco := corpo.read(min(64 * 1024, esperado - escritos))):
+            arquivo.write(bloco)
+            escritos += len(bloco)
+    if escritos != esperado:
+        raise UploadInvalido('Bloco incompleto')
+
+    if not UploadParcial.objects.filter(pk=upload.pk, recebido=inicio).update(
+        recebido=fim + 1, atualizado_em=timezone.now()
+    ):
+        # Outra requisição gravou o mesmo trecho antes
+        upload.refresh_from_db()
+        raise ForaDeOrdem(upload.recebido)
+    upload.recebido = fim + 1
+    if upload.recebido == upload.tamanho:
+        concluir(upload)
+    return upload
+
+
+def concluir(upload):
+    caminho = caminho_parcial(upload)
+    try:
+        with Image.open(caminho) as imagem:
+            imagem.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        caminho.unlink(missing_ok=True)
+        upload.delete()
+        raise UploadInvalido('O arquivo não é uma imagem válida')
+    upload.arquivo = armazenamento_midia().guardar_arquivo_local(caminho, Path(upload.nome).suffix.lower())
+    UploadParcial.objects.filter(pk=upload.pk).update(arquivo=upload.arquivo)
+
+
+def blob_do_usuario(usuario, arquivo):
+    """Confere que `arquivo` veio de um upload concluído deste usuário."""
+    return bool(arquivo) and UploadParcial.objects.filter(usuario=usuario, arquivo=arquivo).exists()
+
+
+def limpar_expirados(horas=24):
+    """Remove sessões paradas há mais de `horas`. Retorna quantas."""
+    limite = timezone.now() - timedelta(hours=horas)
+    expirados = list(UploadParcial.objects.filter(atualizado_em__lt=limite))
+    for upload in expirados:
+        caminho_parcial(upload).unlink(missing_ok=True)
+    UploadParcial.objects.filter(pk__in=[upload.pk for upload in expirados]).delete()
+    return len(expirados)
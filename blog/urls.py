@@ -8,9 +8,14 @@ urlpatterns = [
     path('', views.PostListView.as_view(), name='lista_posts'),
     path('post/novo/', views.new_post, name='novo_post'),
     path('post/<slug:slug>/editar/', views.edit_post, name='editar_post'),
+    path('post/<slug:slug>/revisoes/', views.revisoes_post, name='revisoes_post'),
+    path('post/<slug:slug>/revisoes/<int:de>/<int:para>/', views.diff_revisoes, name='diff_revisoes'),
     path('post/<slug:slug>/', views.PostDetailView.as_view(), name='detalhe_post'),
+    path('post/<slug:slug>/comentarios/', views.comentarios_post, name='comentarios_post'),
     path('categoria/<slug:slug>/', views.PostsPorCategoriaView.as_view(), name='posts_por_categoria'),
     path('tag/<slug:slug>/', views.PostsPorTagView.as_view(), name='posts_por_tag'),
+    path('arquivo/<int:ano>/', views.ArquivoView.as_view(), name='arquivo_ano'),
+    path('arquivo/<int:ano>/<int:mes>/', views.ArquivoView.as_view(), name='arquivo_mes'),
     path('login/', views.CustomLoginView.as_view(), name='login'),
     path('signup/', views.signup, name='signup'),
     path('logout/', views.CustomLogoutView.as_view(), name='logout'),
@@ -18,9 +23,22 @@ urlpatterns = [
     path('dashboard/', views.UsuarioView.as_view(template_name='dashboard.html'), name='dashboard'),
     path('notificacoes/', views.notificacoes, name='notificacoes'),
     path('notificacoes/marcar_lida/<int:id>/', views.marcar_lida, name='marcar_lida'),
+    path('timeline/', views.timeline, name='timeline'),
+    path('timeline/assinar/', views.assinar_timeline, name='assinar_timeline'),
     path('post/<int:pk>/delete/', views.delete_post.as_view(), name='post_delete'),
     path('comentario/<int:comment_id>/delete/', views.delete_comment, name='delete_comment'),
     path('api/criar-tag/', views.criar_tag, name='criar_tag'),
     path('api/criar-categoria/', views.criar_categoria, name='criar_categoria'),
+    path('api/rascunhos/', views.autosave_rascunho, name='criar_rascunho'),
+    path('api/rascunhos/<int:pk>/', views.autosave_rascunho, name='autosave_rascunho'),
+    path('api/uploads/', views.iniciar_upload, name='iniciar_upload'),
+    path('api/uploads/<uuid:pk>/', views.bloco_upload, name='bloco_upload'),
     path('api/check-email/', views.check_email, name='check_email'),
+    path('newsletter/sair/<str:token>/', views.descadastrar_newsletter, name='descadastrar_newsletter'),
+    path('api/metricas/banco/', views.metricas_banco, name='metricas_banco'),
+    path('sitemap.xml', views.sitemap, name='sitemap'),
+    path('sitemap-<str:secao>-<int:n>.xml', views.sitemap, name='sitemap_secao'),
+    path('feeds/site.<str:formato>', views.feed, name='feed'),
+    path('feeds/categoria/<slug:slug>.<str:formato>', views.feed, {'tipo': 'categoria'}, name='feed_categoria'),
+    path('feeds/tag/<slug:slug>.<str:formato>', views.feed, {'tipo': 'tag'}, name='feed_tag'),
 ]
\ No newline at end of file
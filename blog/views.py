@@ -1,65 +1,209 @@
+import json
+from datetime import datetime
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.generic import ListView, DetailView, TemplateView, CreateView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views.generic import ListView, DetailView, TemplateView, CreateView, DeleteView
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.views import LoginView
 from django.contrib.auth import logout, authenticate, login
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.paginator import Paginator
 from django.utils.text import slugify
+from django.template.loader import render_to_string
 from django.utils import timezone
-from django.http import Http404, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+from django.urls import reverse, reverse_lazy
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from .models import Post, Categoria, Tag, Comentario, Notification
+from .models import Post, Categoria, Tag, Comentario, Notification, Assinatura, UploadParcial
 from .forms import PostForm, UserSignUpForm
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.views.generic import DeleteView
-from django.urls import reverse_lazy
-
-
-class PostListView(ListView):
-    queryset = Post.objects.filter(publicado_em__isnull=False).order_by('-publicado_em')
+from .fragmentos import CachedShellMixin, grupo_do_post
+from .comentarios import (
+    contar_aprovados,
+    descarregar_se_vencido,
+    limite_por_ip,
+    limite_por_post,
+    motivo_rejeicao,
+    pagina_comentarios,
+    receber_comentario,
+    todos_comentarios,
+)
+from . import conexoes, disponibilidade, midia, newsletter, sindicacao, taxonomia, uploads
+from .arquivo import histograma, posts_do_periodo
+from .paginacao import decodificar_cursor
+from .relacionados import relacionados_de
+from .rascunhos import ConflitoVersao, criar_rascunho, salvar_rascunho, slug_unico
+from .revisoes import comparar, registrar_revisao
+from .throttling import ip_do_cliente
+from .timeline import assinar, cancelar_assinatura, ler_timeline, marcar_como_lida, obter_cursor
+from .visualizacoes import em_alta, mais_lidos, registrar_visualizacao
+
+
+class PostListView(CachedShellMixin, ListView):
+    queryset = Post.objects.publicados().order_by('-publicado_em')
     template_name = 'home.html'
     context_object_name = 'posts'
     paginate_by = 6
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Consultas O(k) sobre os índices de visualizações/tendência
+        context['mais_lidos'] = mais_lidos()
+        context['em_alta'] = em_alta()
+        context['arquivo'] = histograma()
+        return context
 
-class PostDetailView(DetailView):
-    model = Post
+
+class PostDetailView(CachedShellMixin, DetailView):
+    # Agendados e rascunhos são 404 para os leitores até a data de publicação
+    queryset = Post.objects.publicados()
     template_name = 'post_detail.html'
     context_object_name = 'post'
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
 
+    def get_queryset(self):
+        # O autor pode pré-visualizar os próprios posts ainda não publicados
+        if self.request.user.is_authenticated:
+            return Post.objects.filter(Q(publicado_em__lte=Now()) | Q(autor=self.request.user))
+        return super().get_queryset()
+
+    def publicado(self):
+        return self.object.publicado_em is not None and self.object.publicado_em <= timezone.now()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Evita filtros complexos no template
-        context['comentarios_aprovados'] = self.object.comentarios.filter(aprovado=True)
+        # Só a primeira página; as demais vêm de comentarios_post (keyset).
+        # O espelho estático não tem esse endpoint: leva todos de uma vez
+        if getattr(self.request, 'exportando', False):
+            comentarios, proximo = todos_comentarios(self.object.pk), None
+        else:
+            comentarios, proximo = pagina_comentarios(self.object.pk)
+        context['comentarios_aprovados'] = comentarios
+        context['proximo_cursor_comentarios'] = proximo
+        context['total_comentarios'] = contar_aprovados(self.object.pk)
+        context['relacionados'] = relacionados_de(self.object)
         return context
 
+    def get(self, request, *args, **kwargs):
+        descarregar_se_vencido()
+        return super().get(request, *args, **kwargs)
+
+    def grupo_da_casca(self):
+        return grupo_do_post(self.kwargs['slug'])
+
+    def casca_compartilhavel(self):
+        # A pré-visualização do autor não pode ir para o cache dos leitores
+        return self.publicado()
+
+    def dados_da_casca(self):
+        return self.object.pk if self.publicado() else None
+
+    def pagina_servida(self, post_id):
+        # Conta também as páginas servidas do cache; só acumula em memória.
+        # Pré-visualizações (None) não contam
+        if post_id is not None:
+            registrar_visualizacao(post_id)
+
     def post(self, request, *args, **kwargs):
-        self.object = self.get_object()
         nome = request.POST.get('nome')
         email = request.POST.get('email')
         mensagem = request.POST.get('mensagem')
+        if not (nome and email and mensagem):
+            return redirect(self.request.path)
 
-        if nome and email and mensagem:
-            Comentario.objects.create(
-                post=self.object,
-                nome=nome,
-                email=email,
-                mensagem=mensagem,
-                aprovado=True,
+        # Limites antes de qualquer consulta: um flood não chega ao banco
+        ip = ip_do_cliente(request)
+        slug = self.kwargs['slug']
+        if not limite_por_ip.consumir(ip) or not limite_por_post.consumir(slug):
+            response = HttpResponse(
+                'Muitos comentários em pouco tempo. Tente novamente em instantes.', status=429,
             )
-        
+            response['Retry-After'] = max(limite_por_ip.espera(ip), limite_por_post.espera(slug))
+            return response
+
+        # Comentários só em posts publicados, mesmo para o autor
+        self.object = self.get_object(Post.objects.publicados())
+        # Rejeitados voltam como se tivessem sido aceitos, sem dar pistas ao spammer
+        if motivo_rejeicao(self.object.pk, mensagem) is None:
+            receber_comentario(self.object.pk, nome, email, mensagem)
+
         return redirect(self.request.path)
 
 
-class PostsPorCategoriaView(ListView):
+def comentarios_post(request, slug):
+    """Próxima página de comentários aprovados, como fragmento HTML em JSON."""
+    post = get_object_or_404(Post.objects.publicados().only('id', 'slug', 'autor_id'), slug=slug)
+    depois_de = decodificar_cursor(request.GET.get('depois', ''))
+    if depois_de is None:
+        return JsonResponse({'error': 'Cursor inválido'}, status=400)
+    comentarios, proximo = pagina_comentarios(post.pk, depois_de)
+    html = render_to_string(
+        'comentarios_lista.html',
+        {'comentarios': comentarios, 'post': post},
+        request=request,
+    )
+    return JsonResponse({'html': html, 'proximo': proximo})
+
+
+# Sem CSRF: o POST de um clique (RFC 8058) vem do cliente de e-mail, e o
+# token assinado na URL já prova que o link saiu de um envio nosso
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def descadastrar_newsletter(request, token):
+    """GET pede confirmação (leitores de link não descadastram ninguém); POST descadastra."""
+    email = newsletter.email_do_token(token)
+    if email is None:
+        raise Http404
+    if request.method == 'POST':
+        newsletter.descadastrar(email)
+    return render(request, 'newsletter_descadastro.html', {
+        'email': email,
+        'descadastrado': request.method == 'POST',
+    })
+
+
+@staff_member_required
+def metricas_banco(request):
+    """Métricas das conexões/pool deste worker (ver blog/conexoes.py)."""
+    return JsonResponse(conexoes.metricas())
+
+
+def sitemap(request, secao=None, n=None):
+    if secao is None:
+        return sindicacao.servir('indice', 'sitemap.xml', 'application/xml')
+    if secao not in sindicacao.SECOES:
+        raise Http404
+    return sindicacao.servir(f'sitemap:{secao}:{n}', f'sitemap-{secao}-{n}.xml', 'application/xml')
+
+
+def feed(request, formato, tipo='site', slug=None):
+    if formato not in sindicacao.FORMATOS:
+        raise Http404
+    escopo = tipo if slug is None else f'{tipo}/{slug}'
+    return sindicacao.servir(f'feed:{escopo}', f'feeds/{escopo}.{formato}', sindicacao.FORMATOS[formato][1])
+
+
+
+@require_http_methods(["GET", "HEAD"])
+def servir_midia(request, caminho):
+    return midia.servir(request, caminho)
+
+class PostsPorCategoriaView(CachedShellMixin, ListView):
     template_name = 'home.html'
     context_object_name = 'posts'
     paginate_by = 6
 
     def get_queryset(self):
         slug = self.kwargs['slug']
-        return Post.objects.filter(categoria__slug=slug, publicado_em__isnull=False)
+        return Post.objects.publicados().filter(categoria__slug=slug)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -67,14 +211,14 @@ class PostsPorCategoriaView(ListView):
         return context
 
 
-class PostsPorTagView(ListView):
+class PostsPorTagView(CachedShellMixin, ListView):
     template_name = 'home.html'
     context_object_name = 'posts'
     paginate_by = 6
 
     def get_queryset(self):
         slug = self.kwargs['slug']
-        return Post.objects.filter(tags__slug=slug, publicado_em__isnull=False)
+        return Post.objects.publicados().filter(tags__slug=slug)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -82,6 +226,26 @@ class PostsPorTagView(ListView):
         return context
 
 
+class ArquivoView(CachedShellMixin, TemplateView):
+    template_name = 'arquivo.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        ano, mes = self.kwargs['ano'], self.kwargs.get('mes')
+        if not 1 <= ano <= 9998 or (mes is not None and not 1 <= mes <= 12):
+            raise Http404
+        # Keyset sobre (publicado_em, id): ?antes= é o último post da página anterior
+        posts, proximo = posts_do_periodo(ano, mes, decodificar_cursor(self.request.GET.get('antes')))
+        context.update({
+            'posts': posts,
+            'proximo_cursor': proximo,
+            'ano': ano,
+            'mes': mes,
+            'arquivo': histograma(),
+        })
+        return context
+
+
 class CustomLoginView(LoginView):
     template_name = 'login.html'
     redirect_authenticated_user = True
@@ -142,11 +306,56 @@ class NewPostView(LoginRequiredMixin, CreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categorias'] = Categoria.objects.all().order_by('nome')
-        context['tags'] = Tag.objects.all().order_by('nome')
+        context['categorias'] = taxonomia.categorias()
+        context['tags'] = taxonomia.tags()
+        context['tamanho_bloco_upload'] = settings.MEDIA_UPLOAD_CHUNK_SIZE
         return context
 
 
+def _aplicar_categoria_e_tags(post, request):
+    """Aplica a categoria e as tags enviadas (IDs existentes ou nomes novos)."""
+    # Processa categorias: verifica se é ID ou novo nome
+    categoria_id = request.POST.get('categoria', '').strip()
+    if categoria_id:
+        # Se for um número, é um ID existente
+        if categoria_id.isdigit():
+            categoria_obj = Categoria.objects.filter(pk=categoria_id).first()
+        else:
+            # Se não for número, criar nova categoria
+            cat_slug = slugify(categoria_id)
+            categoria_obj, _ = Categoria.objects.get_or_create(slug=cat_slug, defaults={'nome': categoria_id})
+        if categoria_obj and post.categoria_id != categoria_obj.pk:
+            post.categoria = categoria_obj
+            post.save()
+
+    # Processa tags: verifica IDs selecionados e detecta novos nomes
+    tags_ids = []
+    tags_novas = []
+    for tag_valor in request.POST.getlist('tags'):
+        tag_valor = tag_valor.strip()
+        if not tag_valor:
+            continue
+        # Se for um número, é um ID existente
+        if tag_valor.isdigit():
+            tags_ids.append(int(tag_valor))
+        else:
+            # Se não for número, criar nova tag
+            tag_slug = tag_valor.lower().replace(' ', '-')
+            tag_obj, _ = Tag.objects.get_or_create(slug=tag_slug, defaults={'nome': tag_valor})
+            tags_novas.append(tag_obj)
+    tags = list(Tag.objects.filter(pk__in=tags_ids)) + tags_novas
+    if tags:
+        # Um único add: uma consulta e um sinal m2m_changed para todas as tags
+        post.tags.add(*tags)
+
+
+
+def _aplicar_imagem_enviada(post, request):
+    """Usa a imagem enviada em blocos pelo editor, se não veio arquivo no form."""
+    enviada = request.POST.get('imagem_enviada', '')
+    if not request.FILES.get('imagem') and uploads.blob_do_usuario(request.user, enviada):
+        post.imagem = enviada
+
 
 def new_post(request):
     if request.method == 'POST':
@@ -154,16 +363,11 @@ def new_post(request):
         if form.is_valid():
             post = form.save(commit=False)
             post.autor = request.user
+            _aplicar_imagem_enviada(post, request)
 
             # gerar slug se vazio
             if not post.slug:
-                base_slug = slugify(post.titulo)
-                slug = base_slug
-                counter = 1
-                while Post.objects.filter(slug=slug).exists():
-                    slug = f"{base_slug}-{counter}"
-                    counter += 1
-                post.slug = slug
+                post.slug = slug_unico(post.titulo)
 
             # lidar com salvar como rascunho / publicar
             if 'salvar_rascunho' in request.POST:
@@ -172,46 +376,13 @@ def new_post(request):
                 if not form.cleaned_data.get('publicado_em'):
                     post.publicado_em = timezone.now()
 
-            post.save()
-            
-            # Processa categorias: verifica se é ID ou novo nome
-            categoria_id = request.POST.get('categoria', '').strip()
-            if categoria_id:
-                # Se for um número, é um ID existente
-                if categoria_id.isdigit():
-                    try:
-                        categoria_obj = Categoria.objects.get(pk=categoria_id)
-                        post.categoria = categoria_obj
-                        post.save()
-                    except Categoria.DoesNotExist:
-                        pass
-                else:
-                    # Se não for número, criar nova categoria
-                    cat_slug = slugify(categoria_id)
-                    categoria_obj, _ = Categoria.objects.get_or_create(slug=cat_slug, defaults={'nome': categoria_id})
-                    post.categoria = categoria_obj
-                    post.save()
-
-            # Processa tags: verifica IDs selecionados e detecta novos nomes
-            tags_selecionadas = request.POST.getlist('tags')
-            for tag_valor in tags_selecionadas:
-                tag_valor = tag_valor.strip()
-                if not tag_valor:
-                    continue
-                
-                # Se for um número, é um ID existente
-                if tag_valor.isdigit():
-                    try:
-                        tag_obj = Tag.objects.get(pk=tag_valor)
-                        post.tags.add(tag_obj)
-                    except Tag.DoesNotExist:
-                        pass
-                else:
-                    # Se não for número, criar nova tag
-                    tag_slug = tag_valor.lower().replace(' ', '-')
-                    tag_obj, _ = Tag.objects.get_or_create(slug=tag_slug, defaults={'nome': tag_valor})
-                    post.tags.add(tag_obj)
-            
+            # Post, categoria e tags no mesmo commit: os índices derivados
+            # (ex.: posts relacionados) são recalculados uma vez só
+            with transaction.atomic():
+                post.save()
+                _aplicar_categoria_e_tags(post, request)
+                registrar_revisao(post, request.user)
+
             return redirect('/usuario/')
     else:
         form = PostForm()
@@ -220,8 +391,9 @@ def new_post(request):
 
     context = {
         'form': form,
-        'categorias': Categoria.objects.all().order_by('nome'),
-        'tags': Tag.objects.all().order_by('nome'),
+        'categorias': taxonomia.categorias(),
+        'tags': taxonomia.tags(),
+        'tamanho_bloco_upload': settings.MEDIA_UPLOAD_CHUNK_SIZE,
     }
     return render(request, 'new_post.html', context)
 
@@ -253,6 +425,12 @@ def edit_post(request, slug):
         form = PostForm(request.POST, request.FILES, instance=post)
         if form.is_valid():
             post = form.save(commit=False)
+            _aplicar_imagem_enviada(post, request)
+            # gerar slug se vazio (como em new_post)
+            if not post.slug:
+                post.slug = slug_unico(post.titulo, exceto=post.pk)
+            # Invalida a versão que um autosave aberto em outra aba conhece
+            post.versao += 1
             
             # lidar com salvar como rascunho / publicar
             if 'salvar_rascunho' in request.POST:
@@ -261,54 +439,22 @@ def edit_post(request, slug):
                 if not form.cleaned_data.get('publicado_em'):
                     post.publicado_em = timezone.now()
             
-            post.save()
-            
-            # Processa categorias: verifica se é ID ou novo nome
-            categoria_id = request.POST.get('categoria', '').strip()
-            if categoria_id:
-                # Se for um número, é um ID existente
-                if categoria_id.isdigit():
-                    try:
-                        categoria_obj = Categoria.objects.get(pk=categoria_id)
-                        post.categoria = categoria_obj
-                        post.save()
-                    except Categoria.DoesNotExist:
-                        pass
-                else:
-                    # Se não for número, criar nova categoria
-                    cat_slug = slugify(categoria_id)
-                    categoria_obj, _ = Categoria.objects.get_or_create(slug=cat_slug, defaults={'nome': categoria_id})
-                    post.categoria = categoria_obj
-                    post.save()
-
-            # Processa tags: verifica IDs selecionados e detecta novos nomes
-            tags_selecionadas = request.POST.getlist('tags')
-            for tag_valor in tags_selecionadas:
-                tag_valor = tag_valor.strip()
-                if not tag_valor:
-                    continue
-                
-                # Se for um número, é um ID existente
-                if tag_valor.isdigit():
-                    try:
-                        tag_obj = Tag.objects.get(pk=tag_valor)
-                        post.tags.add(tag_obj)
-                    except Tag.DoesNotExist:
-                        pass
-                else:
-                    # Se não for número, criar nova tag
-                    tag_slug = tag_valor.lower().replace(' ', '-')
-                    tag_obj, _ = Tag.objects.get_or_create(slug=tag_slug, defaults={'nome': tag_valor})
-                    post.tags.add(tag_obj)
-            
+            # Post, categoria e tags no mesmo commit: os índices derivados
+            # (ex.: posts relacionados) são recalculados uma vez só
+            with transaction.atomic():
+                post.save()
+                _aplicar_categoria_e_tags(post, request)
+                registrar_revisao(post, request.user)
+
             return redirect('/usuario/')
     else:
         form = PostForm(instance=post)
     
     context = {
         'form': form,
-        'categorias': Categoria.objects.all().order_by('nome'),
-        'tags': Tag.objects.all().order_by('nome'),
+        'categorias': taxonomia.categorias(),
+        'tags': taxonomia.tags(),
+        'tamanho_bloco_upload': settings.MEDIA_UPLOAD_CHUNK_SIZE,
         'post': post,
         'is_edit': True,
     }
@@ -358,7 +504,6 @@ class UsuarioView(LoginRequiredMixin, TemplateView):
         ).count()
 
         # Estatísticas para dashboard: posts por mês (últimos 6 meses)
-        from datetime import datetime
         now = datetime.now()
         months = []
         total_last_6 = 0
@@ -391,12 +536,6 @@ class UsuarioView(LoginRequiredMixin, TemplateView):
         return context
 
 
-
-
-from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-
-
 def notificacoes(request):
     qs = Notification.objects.filter(user=request.user).order_by('-timestamp')
     paginator = Paginator(qs, 10)
@@ -422,6 +561,144 @@ def marcar_lida(request, id):
             pass
     return redirect('blog:notificacoes')
 
+@login_required
+def timeline(request):
+    antes_de = request.GET.get('antes')
+    antes_de = int(antes_de) if antes_de and antes_de.isdigit() else None
+    cursor = obter_cursor(request.user)
+    eventos, proximo = ler_timeline(request.user, antes_de=antes_de)
+    if antes_de is None:
+        marcar_como_lida(cursor, eventos)
+
+    assinaturas = Assinatura.objects.filter(user=request.user).select_related('autor', 'categoria')
+    context = {
+        'eventos': eventos,
+        'proximo': proximo,
+        'ultimo_lido': cursor.ultimo_evento_id,
+        'assinaturas': assinaturas,
+        'categorias': taxonomia.categorias(),
+    }
+    return render(request, 'timeline.html', context)
+
+
+@login_required
+@require_http_methods(["POST"])
+def assinar_timeline(request):
+    autor = categoria = None
+    if request.POST.get('autor', '').isdigit():
+        autor = get_object_or_404(User, pk=request.POST['autor'])
+    elif request.POST.get('categoria', '').isdigit():
+        categoria = get_object_or_404(Categoria, pk=request.POST['categoria'])
+    else:
+        return redirect('blog:timeline')
+
+    if request.POST.get('acao') == 'cancelar':
+        cancelar_assinatura(request.user, autor=autor, categoria=categoria)
+    else:
+        assinar(request.user, autor=autor, categoria=categoria)
+    return redirect(request.META.get('HTTP_REFERER') or 'blog:timeline')
+
+
+@login_required
+@require_http_methods(["POST"])
+def autosave_rascunho(request, pk=None):
+    """Salva só os campos alterados de um rascunho (ou cria o rascunho)."""
+    try:
+        dados = json.loads(request.body)
+        patch = dados.get('campos') or {}
+        if pk is None:
+            post = criar_rascunho(request.user, patch)
+            versao = post.versao
+        else:
+            post = get_object_or_404(
+                Post.objects.only('id', 'slug', 'titulo', 'conteudo', 'versao'),
+                pk=pk, autor=request.user, publicado_em__isnull=True,
+            )
+            versao = salvar_rascunho(post, dados.get('versao'), patch, request.user)
+    except ConflitoVersao as exc:
+        return JsonResponse(
+            {'error': 'O rascunho foi alterado em outra janela.', 'versao': exc.versao_atual}, status=409
+        )
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as exc:
+        return JsonResponse({'error': str(exc) or 'Dados inválidos'}, status=400)
+
+    return JsonResponse({
+        'id': post.pk,
+        'versao': versao,
+        'slug': post.slug,
+        'autosave_url': reverse('blog:autosave_rascunho', args=[post.pk]),
+        'editar_url': reverse('blog:editar_post', args=[post.slug]),
+        'salvo_em': timezone.localtime().strftime('%H:%M:%S'),
+    })
+
+
+def _estado_upload(upload):
+    return {
+        'id': str(upload.pk),
+        'recebido': upload.recebido,
+        'tamanho': upload.tamanho,
+        'tamanho_bloco': settings.MEDIA_UPLOAD_CHUNK_SIZE,
+        'arquivo': upload.arquivo or None,
+        'url': reverse('blog:bloco_upload', args=[upload.pk]),
+    }
+
+
+@login_required
+@require_http_methods(["POST"])
+def iniciar_upload(request):
+    """Abre um upload em blocos: {"nome", "tamanho"} -> estado da sessão."""
+    try:
+        dados = json.loads(request.body)
+        upload = uploads.iniciar(request.user, str(dados['nome']), int(dados['tamanho']))
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return JsonResponse({'error': 'Dados inválidos'}, status=400)
+    except uploads.UploadInvalido as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(_estado_upload(upload), status=201)
+
+
+@login_required
+@require_http_methods(["GET", "PUT"])
+def bloco_upload(request, pk):
+    """GET: quanto já chegou (para retomar). PUT: um bloco, com Content-Range."""
+    upload = get_object_or_404(UploadParcial, pk=pk, usuario=request.user)
+    if request.method == 'PUT':
+        try:
+            # Lê o corpo em partes direto do socket, sem montar request.body
+            upload = uploads.receber_bloco(upload, request.META.get('HTTP_CONTENT_RANGE'), request)
+        except uploads.ForaDeOrdem as exc:
+            return JsonResponse({'error': 'Bloco fora de ordem', 'recebido': exc.recebido}, status=409)
+        except uploads.UploadInvalido as exc:
+            return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse(_estado_upload(upload))
+
+
+@login_required
+def revisoes_post(request, slug):
+    post = get_object_or_404(Post, slug=slug, autor=request.user)
+    revisoes = post.revisoes.defer('dados').select_related('autor').order_by('-numero')
+    page_obj = Paginator(revisoes, 30).get_page(request.GET.get('page'))
+    return render(request, 'revisoes.html', {'post': post, 'page_obj': page_obj})
+
+
+@login_required
+def diff_revisoes(request, slug, de, para):
+    post = get_object_or_404(Post, slug=slug, autor=request.user)
+    revisoes = {
+        revisao.numero: revisao
+        for revisao in post.revisoes.filter(numero__in=[de, para]).select_related('base')
+    }
+    if de not in revisoes or para not in revisoes:
+        raise Http404
+    context = {
+        'post': post,
+        'de': revisoes[de],
+        'para': revisoes[para],
+        'linhas': comparar(revisoes[de], revisoes[para]),
+    }
+    return render(request, 'revisao_diff.html', context)
+
+
 def new_post_notification(request, post, users):
     for user in users:
         Notification.objects.create(
@@ -459,8 +736,6 @@ def delete_comment(request, comment_id):
 
 @require_http_methods(["POST"])
 def criar_tag(request):
-
-    import json
     try:
         data = json.loads(request.body)
         nome = data.get('nome', '').strip()
@@ -485,7 +760,6 @@ def criar_tag(request):
 
 @require_http_methods(["POST"])
 def criar_categoria(request):
-    import json
     try:
         data = json.loads(request.body)
         nome = data.get('nome', '').strip()
@@ -510,19 +784,37 @@ def criar_categoria(request):
 
 @require_http_methods(["POST"])
 def check_email(request):
-    import json
+    """{"email": ...} -> {"email", "exists"}; {"emails": [...]} -> {"resultados": {email: exists}}."""
     try:
         data = json.loads(request.body)
-        email = data.get('email', '').strip()
-        
-        if not email:
+        if 'emails' in data:
+            emails = data['emails']
+            if not isinstance(emails, list) or not all(isinstance(email, str) for email in emails):
+                return JsonResponse({'error': 'emails deve ser uma lista'}, status=400)
+            if len(emails) > settings.SIGNUP_CHECK_BATCH_SIZE:
+                return JsonResponse(
+                    {'error': f'No máximo {settings.SIGNUP_CHECK_BATCH_SIZE} emails por vez'}, status=400,
+                )
+        else:
+            emails = [str(data.get('email', ''))]
+        emails = [email.strip() for email in emails if email.strip()]
+
+        if not emails:
             return JsonResponse({'error': 'Email é obrigatório'}, status=400)
-        
-        exists = User.objects.filter(email=email).exists()
-        
+
+        # Limite antes do cache e do banco: quem varre e-mails não gera consultas
+        ip = ip_do_cliente(request)
+        if not disponibilidade.limite_por_ip.consumir(ip, len(emails)):
+            response = JsonResponse({'error': 'Muitas verificações. Tente novamente em instantes.'}, status=429)
+            response['Retry-After'] = disponibilidade.limite_por_ip.espera(ip)
+            return response
+
+        resultados = disponibilidade.verificar_emails(emails)
+        if 'emails' in data:
+            return JsonResponse({'resultados': resultados})
         return JsonResponse({
-            'email': email,
-            'exists': exists
+            'email': emails[0],
+            'exists': resultados[emails[0]]
         })
     except json.JSONDecodeError:
         return JsonResponse({'error': 'JSON inválido'}, status=400)
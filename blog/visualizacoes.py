@@ -0,0 +1,196 @@
+"""Contagem de visualizações em lote e ranking de posts mais lidos / em alta.
+
+Cada visualização só incrementa um contador na memória do processo. De
+tempos em tempos (`VIEW_COUNTER_FLUSH_INTERVAL` segundos ou
+`VIEW_COUNTER_FLUSH_SIZE` visualizações) o buffer vira um `LoteVisualizacao`
+e é aplicado com um único `UPDATE ... SET visualizacoes = visualizacoes + n`
+por bloco de posts.
+
+A tendência usa decaimento exponencial com época: em vez de diminuir todas
+as pontuações com o tempo, cada visualização nova vale
+2 ** (horas desde a época / TRENDING_HALF_LIFE_HOURS). A ordem relativa é a
+mesma de um decaimento real, e "em alta" vira um ORDER BY sobre um índice.
+A época fica em `EpocaTendencia` (começa em TRENDING_EPOCH); quando o
+expoente passa de `EXPOENTE_MAXIMO`, a aplicação do lote avança a época e
+reescala todas as pontuações num único UPDATE, antes de o peso estourar o
+float. Só essa reescala trava a linha da época; os lotes comuns a leem sem
+trava e conferem no fim se ela mudou no meio.
+
+O buffer vive na memória de cada worker: só o próprio worker (ao encher o
+buffer e no atexit) grava essas contagens. O comando
+`descarregar_visualizacoes` roda em outro processo e aplica apenas lotes
+já registrados no diário que ficaram pendentes.
+"""
+import atexit
+import logging
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from .buffers import ContadorLocal
+from .models import EpocaTendencia, LoteVisualizacao, Post
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_BLOCO_UPDATE = 500
+# 2 ** 512 ainda cabe folgado num float (o limite é 2 ** 1024)
+EXPOENTE_MAXIMO = 512
+
+_buffer = ContadorLocal(
+    intervalo=settings.VIEW_COUNTER_FLUSH_INTERVAL,
+    limite=settings.VIEW_COUNTER_FLUSH_SIZE,
+)
+# Lotes deste processo que foram registrados mas falharam ao aplicar
+_lotes_com_falha = set()
+
+
+def registrar_visualizacao(post_id):
+    if _buffer.adicionar(post_id):
+        descarregar_visualizacoes()
+
+
+def _expoente(momento, epoca):
+    return (momento - epoca).total_seconds() / 3600 / settings.TRENDING_HALF_LIFE_HOURS
+
+
+class EpocaMudou(Exception):
+    """Outro lote reescalou a tendência enquanto este era aplicado."""
+
+
+def _epoca(consulta):
+    epoca, _ = consulta.get_or_create(
+        pk=1,
+        defaults={'inicio': datetime.fromisoformat(settings.TRENDING_EPOCH).replace(tzinfo=dt_timezone.utc)},
+    )
+    return epoca
+
+
+def inicio_da_epoca():
+    """Época atual, sem trava (o caso comum)."""
+    return _epoca(EpocaTendencia.objects).inicio
+
+
+def epoca_travada(agora):
+    """Trava a época até o fim da transação, avançando-a se preciso.
+
+    Só é chamada quando a época precisa avançar (ou mudou durante um
+    lote): quem chega depois espera aqui e já usa a época nova.
+    """
+    epoca = _epoca(EpocaTendencia.objects.select_for_update())
+    expoente = _expoente(agora, epoca.inicio)
+    if expoente > EXPOENTE_MAXIMO:
+        # Mesma escala para todos: a ordem não muda
+        Post.objects.filter(tendencia__gt=0).update(tendencia=F('tendencia') * Value(2.0 ** -expoente))
+        epoca.inicio = agora
+        epoca.save(update_fields=['inicio'])
+    return epoca.inicio
+
+
+def peso_tendencia(momento, epoca):
+    return 2 ** _expoente(momento, epoca)
+
+
+def descarregar_visualizacoes():
+    """Grava o buffer deste processo. Retorna o total de visualizações gravadas."""
+    for lote_id in list(_lotes_com_falha):
+        _aplicar_com_seguranca(lote_id)
+
+    contagens = _buffer.drenar()
+    if not contagens:
+        return 0
+    try:
+        lote = LoteVisualizacao.objects.create(
+            contagens={str(post_id): n for post_id, n in contagens.items()}
+        )
+    except DatabaseError:
+        # Nada foi gravado: as contagens voltam para o buffer
+        logger.exception('Falha ao registrar lote de visualizações')
+        _buffer.devolver(contagens)
+        return 0
+    _aplicar_com_seguranca(lote.pk)
+    return sum(contagens.values())
+
+
+def _aplicar_com_seguranca(lote_id):
+    try:
+        aplicar_lote(lote_id)
+    except DatabaseError:
+        # O lote continua pendente no banco; reaplicá-lo é idempotente
+        logger.exception('Falha ao aplicar lote de visualizações %s', lote_id)
+        _lotes_com_falha.add(lote_id)
+    else:
+        _lotes_com_falha.discard(lote_id)
+
+
+def aplicar_lote(lote_id):
+    """Aplica um lote pendente. Lotes já aplicados são ignorados."""
+    with transaction.atomic():
+        lote = (
+            LoteVisualizacao.objects.select_for_update()
+            .filter(pk=lote_id, aplicado_em__isnull=True)
+            .first()
+        )
+        if lote is None:
+            return False
+        agora = timezone.now()
+        itens = [(int(post_id), n) for post_id, n in lote.contagens.items()]
+        epoca = inicio_da_epoca()
+        if _expoente(agora, epoca) > EXPOENTE_MAXIMO:
+            epoca = epoca_travada(agora)
+        try:
+            with transaction.atomic():
+                _somar(itens, peso_tendencia(agora, epoca))
+                # Só quem trava a linha muda a época: se mudou, o peso está
+                # na escala antiga e os UPDATEs acima são desfeitos
+                if inicio_da_epoca() != epoca:
+                    raise EpocaMudou
+        except EpocaMudou:
+            _somar(itens, peso_tendencia(agora, epoca_travada(agora)))
+        lote.aplicado_em = agora
+        lote.save(update_fields=['aplicado_em'])
+    return True
+
+
+def _somar(itens, peso):
+    for inicio in range(0, len(itens), TAMANHO_BLOCO_UPDATE):
+        bloco = itens[inicio:inicio + TAMANHO_BLOCO_UPDATE]
+        incrementos = [When(pk=post_id, then=Value(n)) for post_id, n in bloco]
+        Post.objects.filter(pk__in=[post_id for post_id, _ in bloco]).update(
+            visualizacoes=F('visualizacoes') + Case(*incrementos, default=Value(0)),
+            tendencia=F('tendencia') + Case(
+                *[When(pk=post_id, then=Value(n * peso)) for post_id, n in bloco],
+                default=Value(0.0),
+                output_field=FloatField(),
+            ),
+        )
+
+
+def aplicar_lotes_pendentes():
+    """Aplica lotes que ficaram pendentes (ex.: processo reiniciado no meio)."""
+    aplicados = 0
+    pendentes = LoteVisualizacao.objects.filter(aplicado_em__isnull=True).values_list('pk', flat=True)
+    for lote_id in list(pendentes):
+        if aplicar_lote(lote_id):
+            aplicados += 1
+    return aplicados
+
+
+def mais_lidos(k=5):
+    return Post.objects.publicados().order_by('-visualizacoes')[:k]
+
+
+def em_alta(k=5):
+    return Post.objects.publicados().filter(tendencia__gt=0).order_by('-tendencia')[:k]
+
+
+def _descarregar_ao_sair():
+    try:
+        descarregar_visualizacoes()
+    except Exception:
+        logger.exception('Falha ao descarregar visualizações no encerramento')
+
+
+atexit.register(_descarregar_ao_sair)
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'velora.settings')
+# Sem conexões persistentes por thread no ASGI (ver DATABASES em settings.py)
+os.environ.setdefault('VELORA_ASGI', 'True')
 
 application = get_asgi_application()
+
+# Compila templates, resolve URLs etc. antes da primeira requisição (ver blog/aquecimento.py)
+from blog.aquecimento import aquecer_se_configurado  # noqa: E402
+
+aquecer_se_configurado()
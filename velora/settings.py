@@ -9,7 +9,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Segurança e variáveis do .env
 SECRET_KEY = os.getenv("DJANGO_SECRET_KEY", "django-insecure-temporario-mude-isso")
-DEBUG = os.getenv("DEBUG", "True") == "True"
+# Desligado por padrão: em desenvolvimento, DEBUG=True no .env
+DEBUG = os.getenv("DEBUG", "False") == "True"
 ALLOWED_HOSTS = ["localhost", "127.0.0.1"]
 
 # Apps
@@ -26,6 +27,7 @@ INSTALLED_APPS = [
 # Middleware
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'blog.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -41,14 +43,22 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates compilados uma vez por processo (ver blog/aquecimento.py);
+            # com DEBUG o autoreload do runserver limpa o cache a cada mudança
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'blog.context_processors.notifications_unread_count',
+                'blog.context_processors.versao_estaticos',
             ],
         },
     },
@@ -65,9 +75,68 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', '123456'),
         'HOST': os.getenv('DB_HOST', '127.0.0.1'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        # Conexão reaproveitada é testada antes do uso (persistente ou do pool)
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Conexões (ver blog/conexoes.py). DB_POOL=True usa o pool do psycopg 3
+# (pip install "psycopg[binary,pool]"): um pool por worker e por banco, com
+# DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE conexões. Sem pool, cada thread mantém
+# a conexão por DB_CONN_MAX_AGE segundos; no ASGI isso vaza conexões, então
+# lá a conexão fecha ao fim de cada requisição (asgi.py define VELORA_ASGI).
+if os.getenv('DB_POOL', 'False') == 'True' and DATABASES['default']['ENGINE'].endswith('postgresql'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            # Espera máxima por uma conexão livre antes de falhar
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+            'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+        },
+    }
+elif os.getenv('VELORA_ASGI') == 'True':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+
+# Réplicas de leitura: DB_REPLICA_COUNT=N e, para cada réplica i (1..N),
+# DB_REPLICA_<i>_NAME/USER/PASSWORD/HOST/PORT. O que não for informado herda
+# do banco principal (para testar localmente com SQLite basta o NAME).
+for _i in range(1, int(os.getenv('DB_REPLICA_COUNT', '0')) + 1):
+    _replica = {**DATABASES['default'], 'OPTIONS': dict(DATABASES['default'].get('OPTIONS', {}))}
+    for _chave in ('NAME', 'USER', 'PASSWORD', 'HOST', 'PORT'):
+        _replica[_chave] = os.getenv(f'DB_REPLICA_{_i}_{_chave}', _replica[_chave])
+    if _replica['ENGINE'].endswith('postgresql'):
+        # Réplica fora do ar: falha rápido e as leituras voltam ao principal
+        _replica['OPTIONS'].setdefault('connect_timeout', int(os.getenv('DB_REPLICA_CONNECT_TIMEOUT', '2')))
+    # Nos testes a réplica espelha o banco principal
+    _replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES[f'replica_{_i}'] = _replica
+
+DATABASE_ROUTERS = ['blog.routers.PrimaryReplicaRouter']
+
+# Tempo (s) em que a sessão fica presa ao banco principal após uma escrita
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '5'))
+# Intervalo (s) entre verificações de saúde de cada réplica
+DB_REPLICA_HEALTH_CHECK_INTERVAL = int(os.getenv('DB_REPLICA_HEALTH_CHECK_INTERVAL', '10'))
+
+# Cache: LocMem (por processo) por padrão; em produção use um cache
+# compartilhado, ex. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'velora'),
+    }
+}
+
+# Páginas públicas em cache com fragmentos por usuário (ver blog/fragmentos.py);
+# PAGE_CACHE_TIMEOUT=0 desliga o cache das cascas
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '60'))
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', '30'))
+
 # Validação de senha, internacionalização
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -88,9 +157,121 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Entrega de mídia (ver blog/midia.py): 'django' (FileResponse/sendfile),
+# 'x-accel' (nginx, location interna em MEDIA_ACCEL_PREFIX) ou 'x-sendfile'
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', 'django')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/_midia/')
+MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', '86400'))
+
+# Uploads gravados em blocos calculando o hash (ver blog/armazenamento.py)
+FILE_UPLOAD_HANDLERS = ['blog.armazenamento.UploadComHash']
+# Uploads retomáveis do editor (ver blog/uploads.py)
+MEDIA_PARTIAL_ROOT = os.getenv('MEDIA_PARTIAL_ROOT', BASE_DIR / 'uploads_parciais')
+MEDIA_UPLOAD_CHUNK_SIZE = int(os.getenv('MEDIA_UPLOAD_CHUNK_SIZE', str(2 * 1024 * 1024)))
+MEDIA_MAX_UPLOAD_SIZE = int(os.getenv('MEDIA_MAX_UPLOAD_SIZE', str(50 * 1024 * 1024)))
+# Blobs sem referência só são apagados depois disso (upload feito, post ainda não salvo)
+MEDIA_ORPHAN_GRACE = int(os.getenv('MEDIA_ORPHAN_GRACE', '86400'))
+
 # Login
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/usuario/'
 LOGOUT_REDIRECT_URL = '/'
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Contador de visualizações (ver blog/visualizacoes.py)
+VIEW_COUNTER_FLUSH_INTERVAL = int(os.getenv('VIEW_COUNTER_FLUSH_INTERVAL', '30'))
+VIEW_COUNTER_FLUSH_SIZE = int(os.getenv('VIEW_COUNTER_FLUSH_SIZE', '500'))
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', '48'))
+# Época inicial do ranking "em alta"; ela avança sozinha quando os pesos
+# ficam grandes (ver blog/visualizacoes.py)
+TRENDING_EPOCH = os.getenv('TRENDING_EPOCH', '2025-01-01')
+
+# Posts relacionados (ver blog/relacionados.py)
+RELATED_POSTS_K = int(os.getenv('RELATED_POSTS_K', '5'))
+# Máximo de vizinhos recalculados a cada mudança de tags/categoria
+RELATED_POSTS_MAX_AFFECTED = int(os.getenv('RELATED_POSTS_MAX_AFFECTED', '50'))
+
+# Timeline "para você" (ver blog/timeline.py)
+TIMELINE_PAGE_SIZE = int(os.getenv('TIMELINE_PAGE_SIZE', '20'))
+# Acima disso as fontes são consultadas com um único OR em vez de intercaladas
+TIMELINE_MAX_MERGE_SOURCES = int(os.getenv('TIMELINE_MAX_MERGE_SOURCES', '20'))
+# Leituras (decaídas a cada rodada de materializar_timelines) para materializar
+TIMELINE_MATERIALIZE_MIN_READS = int(os.getenv('TIMELINE_MATERIALIZE_MIN_READS', '50'))
+TIMELINE_MATERIALIZED_MAX_ITEMS = int(os.getenv('TIMELINE_MATERIALIZED_MAX_ITEMS', '500'))
+
+# E-mail
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', BASE_DIR / 'emails')
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'Velora Blog <nao-responda@velora.local>')
+SITE_URL = os.getenv('SITE_URL', 'http://127.0.0.1:8000')
+
+# Reserva de um envio da newsletter: outro processo só assume o mesmo envio
+# depois de tanto tempo sem checkpoint. Deve cobrir o envio de um lote
+NEWSLETTER_LEASE_SECONDS = int(os.getenv('NEWSLETTER_LEASE_SECONDS', '600'))
+
+# Proxies reversos na frente da aplicação (nginx, balanceador, CDN). Com 0 os
+# limites por IP usam o REMOTE_ADDR; com N lê o X-Forwarded-For deixado pelos
+# N proxies. Só aumente se todo acesso passa por eles: sem proxy o cliente
+# escolhe o próprio IP mandando o cabeçalho.
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+
+# Checagem de e-mail/usuário livre no cadastro (ver blog/disponibilidade.py)
+SIGNUP_CHECK_CACHE_TIMEOUT = int(os.getenv('SIGNUP_CHECK_CACHE_TIMEOUT', '60'))
+# Checagens por minuto por IP (0 desliga); um lote gasta uma por e-mail
+SIGNUP_CHECK_RATE_PER_IP = float(os.getenv('SIGNUP_CHECK_RATE_PER_IP', '30'))
+SIGNUP_CHECK_BATCH_SIZE = int(os.getenv('SIGNUP_CHECK_BATCH_SIZE', '20'))
+
+# Comentários (ver blog/comentarios.py)
+COMMENTS_PAGE_SIZE = int(os.getenv('COMMENTS_PAGE_SIZE', '20'))
+COMMENTS_COUNT_CACHE_TIMEOUT = int(os.getenv('COMMENTS_COUNT_CACHE_TIMEOUT', '3600'))
+# Limites em comentários por minuto (0 desliga)
+COMMENTS_RATE_PER_IP = float(os.getenv('COMMENTS_RATE_PER_IP', '5'))
+COMMENTS_RATE_PER_POST = float(os.getenv('COMMENTS_RATE_PER_POST', '60'))
+COMMENTS_MAX_LENGTH = int(os.getenv('COMMENTS_MAX_LENGTH', '5000'))
+COMMENTS_MAX_LINKS = int(os.getenv('COMMENTS_MAX_LINKS', '2'))
+COMMENTS_BLOCKED_WORDS = [
+    palavra.strip().lower()
+    for palavra in os.getenv('COMMENTS_BLOCKED_WORDS', '').split(',')
+    if palavra.strip()
+]
+COMMENTS_DUPLICATE_WINDOW = int(os.getenv('COMMENTS_DUPLICATE_WINDOW', '3600'))
+# Com True os comentários são inseridos em lote (aparecem com alguns segundos de atraso)
+COMMENTS_BUFFERED = os.getenv('COMMENTS_BUFFERED', 'False') == 'True'
+COMMENTS_FLUSH_INTERVAL = int(os.getenv('COMMENTS_FLUSH_INTERVAL', '5'))
+COMMENTS_FLUSH_SIZE = int(os.getenv('COMMENTS_FLUSH_SIZE', '50'))
+
+# Sitemaps e feeds pré-gerados (ver blog/sindicacao.py); em produção o
+# servidor web pode servir esta pasta diretamente
+SYNDICATION_ROOT = os.getenv('SYNDICATION_ROOT', BASE_DIR / 'sindicacao')
+FEED_ITEMS = int(os.getenv('FEED_ITEMS', '20'))
+
+# Destino padrão de `manage.py exportar_site` (ver blog/exportacao.py)
+EXPORT_ROOT = os.getenv('EXPORT_ROOT', BASE_DIR / 'exportacao')
+
+# Revisões de posts (ver blog/revisoes.py)
+REVISIONS_SNAPSHOT_INTERVAL = int(os.getenv('REVISIONS_SNAPSHOT_INTERVAL', '20'))
+# Padrão de `manage.py podar_revisoes --manter`
+REVISIONS_KEEP = int(os.getenv('REVISIONS_KEEP', '50'))
+
+# Arquivo por ano/mês (ver blog/arquivo.py)
+ARCHIVE_PAGE_SIZE = int(os.getenv('ARCHIVE_PAGE_SIZE', '12'))
+ARCHIVE_CACHE_TIMEOUT = int(os.getenv('ARCHIVE_CACHE_TIMEOUT', '3600'))
+
+# Listas de categorias/tags dos formulários (ver blog/taxonomia.py). Com o
+# LocMem a invalidação só alcança o processo que gravou a categoria/tag, então
+# o padrão é curto; com um cache compartilhado a lista pode ficar uma hora
+TAXONOMY_CACHE_TIMEOUT = int(os.getenv(
+    'TAXONOMY_CACHE_TIMEOUT', '60' if CACHES['default']['BACKEND'].endswith('LocMemCache') else '3600'
+))
+
+# Aquecimento do worker ao carregar o WSGI/ASGI (ver blog/aquecimento.py)
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'True') == 'True'
+# Página pedida ao final do aquecimento ('' desliga). Desligada por padrão:
+# a requisição passa pelo banco e pelos middlewares de cada worker ao subir
+WARMUP_REQUEST_PATH = os.getenv('WARMUP_REQUEST_PATH', '')
@@ -1,12 +1,14 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from blog.views import servir_midia
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Também em produção: Range, ETag e controle de acesso (ver blog/midia.py)
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<caminho>.+)$', servir_midia, name='midia'),
     path('', include(('blog.urls', 'blog'), namespace='blog')),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'velora.settings')
 
 application = get_wsgi_application()
+
+# Compila templates, resolve URLs etc. antes da primeira requisição (ver blog/aquecimento.py)
+from blog.aquecimento import aquecer_se_configurado  # noqa: E402
+
+aquecer_se_configurado()